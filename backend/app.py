@@ -36,9 +36,51 @@ def create_app():
     frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:5173')
     # Allow both localhost and production frontend URL
     origins = [frontend_url, "http://localhost:5173", "http://localhost:5174"]
-    CORS(app, resources={r"/*": {"origins": origins}}, supports_credentials=True)
+    # X-Next-Cursor: next page of the list endpoints (utils/pagination.py)
+    CORS(app, resources={r"/*": {"origins": origins}}, supports_credentials=True, expose_headers=['X-Next-Cursor'])
     db.init_app(app)
     
+    # Geofence audit channel (silent unless GEOFENCE_AUDIT_LEVEL is INFO or DEBUG)
+    from utils import geofence_audit
+    geofence_audit.configure(
+        level=os.getenv('GEOFENCE_AUDIT_LEVEL', 'WARNING'),
+        sample_rate=float(os.getenv('GEOFENCE_AUDIT_SAMPLE_RATE', '1.0')),
+        buffer_size=int(os.getenv('GEOFENCE_AUDIT_BUFFER', '1000')),
+        log_file=os.getenv('GEOFENCE_AUDIT_FILE')
+    )
+    
+    # Live attendance events (in-process by default, EVENT_BROKER=sqlite:///path for several workers)
+    from utils import events
+    events.configure(os.getenv('EVENT_BROKER'), max_streams=int(os.getenv('SSE_MAX_STREAMS', '2')))
+    
+    # Group commit for attendance writes (0 = commit each submission directly)
+    batch_ms = int(os.getenv('ATTENDANCE_BATCH_MS', '0'))
+    if batch_ms > 0:
+        from utils.attendance_writer import AttendanceWriteBatcher
+        app.extensions['attendance_batcher'] = AttendanceWriteBatcher(
+            app,
+            max_rows=int(os.getenv('ATTENDANCE_BATCH_ROWS', '100')),
+            max_wait_ms=batch_ms
+        )
+    
+    # Async submit mode ({"async": true} on submit-attendance, 0 = always synchronous)
+    async_workers = int(os.getenv('ATTENDANCE_ASYNC_WORKERS', '4'))
+    if async_workers > 0:
+        from utils.submission_queue import SubmissionQueue
+        app.extensions['submission_queue'] = SubmissionQueue(
+            app,
+            workers=async_workers,
+            max_pending=int(os.getenv('ATTENDANCE_ASYNC_MAX_PENDING', '1000'))
+        )
+    
+    # Background report generation (bounded pool, per-call LLM timeout)
+    from utils.report_jobs import ReportJobRunner
+    app.extensions['report_jobs'] = ReportJobRunner(
+        app,
+        workers=int(os.getenv('REPORT_WORKERS', '2')),
+        timeout=float(os.getenv('REPORT_TIMEOUT_SECONDS', '60'))
+    )
+    
     # Register Blueprints
     from routes.auth import auth_bp
     from routes.teacher import teacher_bp
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Geofence micro-benchmarks.
+
+Runs fully offline against utils/geofence and prints machine-readable JSON so
+results can be diffed between commits:
+
+    python bench_geofence.py                  # full matrix, JSON on stdout
+    python bench_geofence.py --quick -o bench.json
+
+Polygons: convex (regular n-gon), concave (star) and self-touching (two lobes
+meeting at a single vertex), from 4 to 10k vertices.
+Sample sets: 12 to 10k points spread over the polygon's bounding box.
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from utils.geofence import (
+    compile_polygon, is_inside_polygon, calculate_inside_count, count_inside_batch
+)
+
+VERTEX_COUNTS = [4, 16, 64, 256, 1024, 10000]
+SAMPLE_COUNTS = [12, 100, 1000, 10000]
+QUICK_VERTEX_COUNTS = [4, 64, 1024]
+QUICK_SAMPLE_COUNTS = [12, 1000]
+
+# Pure Python per-point calls are capped to this many point x edge tests per run
+PER_POINT_BUDGET = 2_000_000
+
+CENTER = (18.7641, 73.7001)
+RADIUS = 0.0005  # ~55 m
+
+
+def convex_polygon(n):
+    return [
+        [CENTER[0] + RADIUS * math.cos(2 * math.pi * i / n),
+         CENTER[1] + RADIUS * math.sin(2 * math.pi * i / n)]
+        for i in range(n)
+    ]
+
+
+def concave_polygon(n):
+    # Star: alternate outer and inner radius
+    n = max(4, n - n % 2)
+    return [
+        [CENTER[0] + (RADIUS if i % 2 == 0 else RADIUS / 2.5) * math.cos(2 * math.pi * i / n),
+         CENTER[1] + (RADIUS if i % 2 == 0 else RADIUS / 2.5) * math.sin(2 * math.pi * i / n)]
+        for i in range(n)
+    ]
+
+
+def self_touching_polygon(n):
+    # Two lobes traced in one ring, touching only at CENTER
+    half = max(2, (n - 2) // 2)
+    ring = [list(CENTER)]
+    for sign in (1, -1):
+        for i in range(half):
+            angle = math.pi * (i + 1) / (half + 1)
+            ring.append([CENTER[0] + RADIUS * math.sin(angle) * 0.6,
+                         CENTER[1] + sign * RADIUS * (1 - math.cos(angle))])
+        ring.append(list(CENTER))
+    return ring[:-1]
+
+
+SHAPES = {
+    'convex': convex_polygon,
+    'concave': concave_polygon,
+    'self_touching': self_touching_polygon,
+}
+
+
+def make_samples(polygon, count, rng):
+    lats = [p[0] for p in polygon]
+    lngs = [p[1] for p in polygon]
+    pad_lat = (max(lats) - min(lats)) * 0.1
+    pad_lng = (max(lngs) - min(lngs)) * 0.1
+    return [
+        {
+            'latitude': rng.uniform(min(lats) - pad_lat, max(lats) + pad_lat),
+            'longitude': rng.uniform(min(lngs) - pad_lng, max(lngs) + pad_lng),
+            'accuracy': rng.choice([5.0, 12.0, 30.0, 80.0, 2500.0]),
+            'timestamp': '2025-01-01T10:00:00Z',
+        }
+        for _ in range(count)
+    ]
+
+
+def measure(fn, points, repeat):
+    """Runs fn() `repeat` times, returns timing stats normalised per point."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        fn()
+        timings.append(time.perf_counter_ns() - start)
+    best = min(timings)
+    median = statistics.median(timings)
+    return {
+        'points': points,
+        'repeat': repeat,
+        'ns_per_point': round(median / points, 1),
+        'ns_per_point_best': round(best / points, 1),
+        'points_per_sec': round(points * 1e9 / median) if median else None,
+    }
+
+
+def run(vertex_counts, sample_counts, repeat, seed):
+    rng = random.Random(seed)
+    results = []
+
+    for shape, build in SHAPES.items():
+        for vertices in vertex_counts:
+            polygon = build(vertices)
+            polygon_json = json.dumps(polygon)
+            compiled = compile_polygon(polygon_json)
+            edges = len(compiled.edges)
+
+            for sample_count in sample_counts:
+                samples = make_samples(polygon, sample_count, rng)
+                case = {'shape': shape, 'vertices': len(polygon), 'samples': sample_count}
+
+                # Per-point API, bounded so large polygons stay within the time budget
+                per_point = samples[:max(1, min(sample_count, PER_POINT_BUDGET // max(1, edges)))]
+                results.append(dict(case, benchmark='is_inside_polygon[compiled]', **measure(
+                    lambda: [compiled.contains(s['latitude'], s['longitude']) for s in per_point],
+                    len(per_point), repeat)))
+
+                per_point_json = per_point[:max(1, len(per_point) // 10)]
+                results.append(dict(case, benchmark='is_inside_polygon[geojson]', **measure(
+                    lambda: [is_inside_polygon(s['latitude'], s['longitude'], polygon_json) for s in per_point_json],
+                    len(per_point_json), repeat)))
+
+                results.append(dict(case, benchmark='calculate_inside_count', **measure(
+                    lambda: calculate_inside_count(samples, compiled),
+                    sample_count, repeat)))
+
+                # Whole-session style batch: the same points split into 12-sample students
+                sets = [samples[i:i + 12] for i in range(0, sample_count, 12)]
+                results.append(dict(case, benchmark='count_inside_batch', **measure(
+                    lambda: count_inside_batch(sets, compiled),
+                    sample_count, repeat)))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark utils/geofence and print JSON results.")
+    parser.add_argument('--quick', action='store_true', help="Smaller matrix for a fast smoke run")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('-o', '--output', help="Write JSON to this file instead of stdout")
+    args = parser.parse_args()
+
+    vertex_counts = QUICK_VERTEX_COUNTS if args.quick else VERTEX_COUNTS
+    sample_counts = QUICK_SAMPLE_COUNTS if args.quick else SAMPLE_COUNTS
+
+    started = time.time()
+    results = run(vertex_counts, sample_counts, args.repeat, args.seed)
+    report = {
+        'suite': 'geofence',
+        'created_at': started,
+        'duration_sec': round(time.time() - started, 2),
+        'environment': {
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+        },
+        'config': {
+            'vertex_counts': vertex_counts,
+            'sample_counts': sample_counts,
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,13 @@
+"""Fixtures for the pytest modules in backend/ (test_query_counts.py, test_report_jobs.py, ...)."""
+import pytest
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App on a throwaway SQLite database. Set other environment variables with monkeypatch before requesting it."""
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'attendance.db'}")
+    monkeypatch.setenv('SECRET_KEY', 'pytest-secret-key-000000000000000000000')
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
@@ -42,6 +42,20 @@ class Session(db.Model):
     end_time = db.Column(db.String(20), nullable=False, default="00:00") # HH:MM
     year = db.Column(db.String(20), nullable=False, default="Unknown") # e.g. "2024", "1st Year"
     course = db.Column(db.String(100), nullable=False, default="Unknown") # e.g. "B.Tech", "CS"
+    
+    # Bumped in the same transaction as every Attendance / ManualAttendance write (ETags)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    # Attendance per status, kept in step with every insert / re-score / manual mark
+    present_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    late_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    short_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    invalid_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    manual_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    __table_args__ = (
+        db.Index('ix_session_teacher_starts', 'teacher_id', 'starts_at', 'session_id'), # Recent-sessions pages
+    )
 
 class Attendance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -51,11 +65,18 @@ class Attendance(db.Model):
     inside_count = db.Column(db.Integer, nullable=False)
     total_samples = db.Column(db.Integer, nullable=False)
     status = db.Column(db.String(20), nullable=False) # Present, Late, Short, Invalid
-    samples_json = db.Column(db.Text, nullable=True) # Store raw samples for audit
+    samples_json = db.Column(db.Text, nullable=True) # Raw samples for audit (old rows, or samples the compact format cannot hold)
+    samples_blob = db.Column(db.LargeBinary, nullable=True) # Compact samples, see utils/sample_codec.py
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     student = db.relationship('Student', backref='attendances')
     session = db.relationship('Session', backref='attendances')
+    
+    # One attendance per student per session, submissions upsert against this
+    __table_args__ = (
+        db.Index('ix_attendance_student_session', 'student_id', 'session_id', unique=True),
+        db.Index('ix_attendance_student_timestamp', 'student_id', 'timestamp', 'id'), # History pages
+    )
 
 class InvalidAttempt(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -73,6 +94,27 @@ class ManualAttendance(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     session = db.relationship('Session', backref='manual_attendances')
+    
+    # Absentee anti-join looks marks up by session and roll number
+    __table_args__ = (
+        db.Index('ix_manual_attendance_session_roll', 'session_id', 'roll_number'),
+    )
+
+class RosterEntry(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+    course = db.Column(db.String(100), nullable=False) # Matches Session.course
+    year = db.Column(db.String(20), nullable=False) # Matches Session.year
+    branch = db.Column(db.String(100), nullable=True) # The student's branch when added
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    student = db.relationship('Student', backref='roster_entries')
+    
+    # A teacher's roster for a course/year lists each student once; absentees join on the prefix
+    __table_args__ = (
+        db.Index('ix_roster_teacher_course_year_student', 'teacher_id', 'course', 'year', 'student_id', unique=True),
+    )
 
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -82,4 +124,30 @@ class Notification(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     teacher = db.relationship('Teacher', backref='notifications')
+    
+    __table_args__ = (
+        db.Index('ix_notification_created', 'created_at', 'id'), # Notification pages
+    )
 
+
+class ReportJob(db.Model):
+    id = db.Column(db.String(36), primary_key=True) # uuid4
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id'), nullable=False)
+    session_id = db.Column(db.String(100), nullable=True) # Report filter, None = all sessions
+    engine = db.Column(db.String(20), nullable=False, default='gemini', server_default='gemini') # gemini or local
+    state = db.Column(db.String(20), nullable=False, default='queued') # queued, running, done, failed
+    result_json = db.Column(db.Text, nullable=True) # generate_attendance_report result once done
+    progress_json = db.Column(db.Text, nullable=True) # Report sections written so far while running
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    owner = db.Column(db.String(64), nullable=True) # Runner process that claimed the job
+    heartbeat_at = db.Column(db.DateTime, nullable=True) # Refreshed by the owner while running
+    active_key = db.Column(db.String(150), nullable=True) # teacher/session/engine while queued or running, else NULL
+    
+    __table_args__ = (
+        db.Index('ix_report_job_teacher_state', 'teacher_id', 'state'),
+        # One active job per teacher/session/engine; finished jobs have NULL, which never conflicts
+        db.Index('ux_report_job_active_key', 'active_key', unique=True),
+    )
@@ -0,0 +1,13 @@
+import argparse
+from app import create_app
+from utils.session_counters import rebuild_session_counters
+
+parser = argparse.ArgumentParser(description="Rebuild the per-session attendance counters from the attendance tables.")
+parser.add_argument('--session', action='append', dest='sessions', help="Session ID (can be repeated, default = all sessions)")
+args = parser.parse_args()
+
+app = create_app()
+
+with app.app_context():
+    corrected = rebuild_session_counters(args.sessions)
+    print(f"Corrected counters of {corrected} sessions.")
@@ -0,0 +1,40 @@
+import argparse
+import os
+from app import create_app
+from utils.rescore import rescore_attendance, CHUNK_SIZE, MAX_POOL_WORKERS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored attendance samples against the current session polygons.")
+    parser.add_argument('--session', action='append', dest='sessions', help="Session ID (can be repeated)")
+    parser.add_argument('--from', dest='start_date', help="First class date, YYYY-MM-DD")
+    parser.add_argument('--to', dest='end_date', help="Last class date, YYYY-MM-DD")
+    parser.add_argument('--teacher', type=int, help="Only this teacher's sessions")
+    parser.add_argument('--workers', type=int, default=min(os.cpu_count() or 1, MAX_POOL_WORKERS),
+                        help=f"Worker processes (0 = no pool, default = CPU count up to {MAX_POOL_WORKERS})")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help="Report changes without writing them")
+    args = parser.parse_args()
+
+    if not (args.sessions or args.start_date or args.end_date or args.teacher):
+        parser.error("give at least one of --session, --from/--to or --teacher")
+
+    app = create_app()
+
+    with app.app_context():
+        summary = rescore_attendance(
+            session_ids=args.sessions,
+            start_date=args.start_date,
+            end_date=args.end_date,
+            teacher_id=args.teacher,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            dry_run=args.dry_run
+        )
+        action = "would change" if args.dry_run else "updated"
+        print(f"Scanned {summary['rows_scanned']} rows across {summary['sessions']} sessions, {action} {summary['rows_updated']}.")
+
+
+# The pool uses spawn, which re-imports this module in every worker
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
 from models import Notification, Teacher, Student
+from utils.pagination import page_args, keyset_page, NEXT_CURSOR_HEADER
 from datetime import datetime
 import jwt
 import os
@@ -33,8 +34,16 @@ def get_notifications():
     if not user:
         return jsonify({'message': 'Unauthorized'}), 401
         
-    # Both students and teachers can view notifications
-    notifications = Notification.query.order_by(Notification.created_at.desc()).all()
+    try:
+        limit, after = page_args()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+        
+    # Both students and teachers can view notifications, newest first, one page at a time
+    query = db.session.query(
+        Notification.id, Notification.title, Notification.message, Notification.created_at, Teacher.name
+    ).join(Teacher, Teacher.id == Notification.teacher_id)
+    notifications, next_cursor = keyset_page(query, Notification.created_at, Notification.id, limit, after)
     
     output = []
     for notif in notifications:
@@ -42,11 +51,15 @@ def get_notifications():
             'id': notif.id,
             'title': notif.title,
             'message': notif.message,
-            'teacher_name': notif.teacher.name,
-            'created_at': notif.created_at.isoformat()
+            'teacher_name': notif.name,
+            'created_at': notif.created_at.isoformat() if notif.created_at else None
         })
-        
-    return jsonify(output), 200
+    
+    # The body stays a plain list; the next page's cursor goes in a header
+    response = jsonify(output)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response, 200
 
 @notifications_bp.route('/', methods=['POST'])
 def create_notification():
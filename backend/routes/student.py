@@ -1,14 +1,147 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
-from models import Session, Attendance, InvalidAttempt
-from utils.token import verify_token
-from utils.geofence import calculate_inside_count
+from models import Session, Attendance
+from utils.token import (verify_token, is_rotating_qr_token, verify_rotating_qr_token, generate_scoped_token,
+                         verify_scoped_token, ATTENDANCE_TOKEN_SECONDS)
+from utils.geofence import calculate_inside_count, determine_status
+from utils.spatial_index import session_index
+from utils.sample_stream import tally_store
+from utils.attendance_writer import save_attendance, SessionNotFound, WriteTimeout, RETRY_AFTER_SECONDS
+from utils.sample_codec import pack_samples
+from utils.session_cache import active_sessions
+from utils.http_cache import make_etag, not_modified, etag_json
+from utils.pagination import page_args, keyset_page
+from utils.submission_queue import POLL_AFTER_SECONDS
+from sqlalchemy.exc import IntegrityError
 import jwt
 from flask import current_app
-import json
+import datetime
 
 student_bp = Blueprint('student', __name__)
 
+def _decode_qr_token(qr_token):
+    """
+    Accepts both QR token kinds: the session JWT and the short rotating token.
+    Returns (qr_payload, None) or (None, error_response).
+    """
+    try:
+        if is_rotating_qr_token(qr_token):
+            return verify_rotating_qr_token(qr_token), None
+        return jwt.decode(qr_token, current_app.config['SECRET_KEY'], algorithms=['HS256']), None
+    except jwt.ExpiredSignatureError:
+        return None, (jsonify({'error': 'QR Code expired'}), 400)
+    except jwt.InvalidTokenError:
+        return None, (jsonify({'error': 'Invalid QR Code'}), 400)
+
+def _submission_session_id(data, student_id):
+    """
+    Session a submission or sample is for: from the attendance_token that /scan
+    issued to this student, or straight from a QR token (the session JWT, or a
+    rotating token still inside its window). Returns (session_id, None) or (None, error_response).
+    """
+    attendance_token = data.get('attendance_token')
+    if attendance_token:
+        claims = verify_scoped_token(attendance_token, 'attendance')
+        if not claims or claims.get('student_id') != student_id:
+            return None, (jsonify({'error': 'Attendance token invalid or expired, scan the QR code again'}), 400)
+        return claims['session_id'], None
+    
+    qr_payload, error = _decode_qr_token(data.get('qr_token'))
+    if error:
+        return None, error
+    return qr_payload['session_id'], None
+
+def _load_session(session_id):
+    """Returns (active_session, None) or (None, error_response)."""
+    session = active_sessions.load(session_id)
+    if not session:
+        return None, (jsonify({'error': 'Session not found'}), 404)
+    # Rotating tokens carry no session expiry of their own
+    if session.expires_at <= datetime.datetime.utcnow():
+        return None, (jsonify({'error': 'QR Code expired'}), 400)
+    return session, None
+
+def _store_attendance(student_id, teacher_id, session_id, inside_count, samples):
+    """Upserts the attendance row. Returns the JSON response for the submission."""
+    try:
+        result = save_attendance({
+            'student_id': student_id,
+            'teacher_id': teacher_id,
+            'session_id': session_id,
+            'inside_count': inside_count,
+            'total_samples': len(samples),
+            'status': determine_status(inside_count),
+            **pack_samples(samples)
+        })
+    except (SessionNotFound, IntegrityError):
+        # Session deleted (possibly by another worker) while still in our cache
+        db.session.rollback()
+        active_sessions.invalidate(session_id)
+        return jsonify({'error': 'Session not found'}), 404
+    except WriteTimeout:
+        # The row may still be committed: a retry gets it back as already submitted
+        return jsonify({
+            'error': 'Attendance is still being saved, please retry',
+            'retry_after': RETRY_AFTER_SECONDS
+        }), 503, {'Retry-After': str(RETRY_AFTER_SECONDS)}
+    
+    if not result['created']:
+        return jsonify({'message': 'Attendance already submitted', 'status': result['status']}), 200
+    
+    return jsonify({
+        'status': result['status'],
+        'inside_count': inside_count,
+        'message': 'Attendance submitted successfully'
+    })
+
+def _score_and_store(student_id, session_id, samples):
+    """Geofence check and attendance write for a whole-batch submission. Returns the JSON response."""
+    # Check if session exists and is valid (cached until the session expires)
+    session, error = _load_session(session_id)
+    if error:
+        return error
+    
+    inside_count, valid_samples = calculate_inside_count(
+        samples, session.polygon, audit_context={'session_id': session_id, 'student_id': student_id})
+    
+    # Duplicate submissions are caught by the (student_id, session_id) unique
+    # index and get the stored status back
+    return _store_attendance(student_id, session.teacher_id, session_id, inside_count, samples)
+
+@student_bp.route('/scan', methods=['POST'])
+def scan_qr():
+    """
+    Exchanges a freshly scanned QR token for an attendance token: bound to this
+    student and session, valid for ATTENDANCE_TOKEN_SECONDS. Samples, finalize and
+    submit-attendance use it, so the QR code itself only has to be current at scan time.
+    """
+    # Verify student token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'student':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.json or {}
+    qr_payload, error = _decode_qr_token(data.get('qr_token'))
+    if error:
+        return error
+    
+    session_id = qr_payload['session_id']
+    session, error = _load_session(session_id)
+    if error:
+        return error
+    
+    return jsonify({
+        'attendance_token': generate_scoped_token('attendance', ATTENDANCE_TOKEN_SECONDS,
+                                                  student_id=payload['id'], session_id=session_id),
+        'session_id': session_id,
+        'expires_in': ATTENDANCE_TOKEN_SECONDS
+    })
+
 @student_bp.route('/submit-attendance', methods=['POST'])
 def submit_attendance():
     # Verify student token
@@ -22,64 +155,192 @@ def submit_attendance():
         return jsonify({'error': 'Unauthorized'}), 401
     
     student_id = payload['id']
-    data = request.json
+    data = request.json or {}
     
-    qr_token = data.get('qr_token')
     samples = data.get('samples') # List of {lat, lng, accuracy, timestamp}
     
-    # 1. Validate QR Token
-    try:
-        qr_payload = jwt.decode(qr_token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'QR Code expired'}), 400
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid QR Code'}), 400
-        
-    session_id = qr_payload['session_id']
-    teacher_id = qr_payload['teacher_id']
+    # 1. Validate the attendance token (or QR token)
+    session_id, error = _submission_session_id(data, student_id)
+    if error:
+        return error
     
-    # 2. Check if session exists and is valid
-    session = Session.query.get(session_id)
-    if not session:
-        return jsonify({'error': 'Session not found'}), 404
+    # Async mode: answer 202 right away, a worker does the geofence check and the write
+    queue = current_app.extensions.get('submission_queue')
+    if data.get('async') and queue is not None:
+        ticket = queue.submit(student_id, _score_and_store, student_id, session_id, samples)
+        if ticket is not None: # Backlog full: fall through and process inline
+            return jsonify({
+                'ticket_id': ticket.ticket_id,
+                'state': ticket.state,
+                'message': 'Attendance queued',
+                'poll_after': POLL_AFTER_SECONDS
+            }), 202, {'Retry-After': str(POLL_AFTER_SECONDS)}
+    
+    return _score_and_store(student_id, session_id, samples)
+
+@student_bp.route('/submission/<ticket_id>', methods=['GET'])
+def get_submission_status(ticket_id):
+    """
+    Result of an async submission, answered at once: pending tickets get 202 with
+    poll_after (seconds until the next poll), finished ones the submission's own response.
+    """
+    # Verify student token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'student':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    queue = current_app.extensions.get('submission_queue')
+    ticket = queue.get(ticket_id, payload['id']) if queue is not None else None
+    if ticket is None:
+        return jsonify({'error': 'Submission not found'}), 404
+    
+    if ticket.state == 'pending':
+        return jsonify({'ticket_id': ticket.ticket_id, 'state': 'pending', 'poll_after': POLL_AFTER_SECONDS}), 202, {
+            'Retry-After': str(POLL_AFTER_SECONDS)
+        }
+    return jsonify({**ticket.body, 'ticket_id': ticket.ticket_id, 'state': 'done'}), ticket.http_status
+
+@student_bp.route('/attendance-sample', methods=['POST'])
+def submit_attendance_sample():
+    """
+    Streaming mode: one GPS sample per call while the student is in class.
+    The sample is scored on arrival and added to a running tally for (student, session).
+    """
+    # Verify student token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'student':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    student_id = payload['id']
+    data = request.json or {}
+    sample = data.get('sample') # {latitude, longitude, accuracy, timestamp}
+    if not sample or 'latitude' not in sample or 'longitude' not in sample:
+        return jsonify({'error': 'Invalid sample'}), 400
+    seq = data.get('seq', sample.get('timestamp')) # Retries of the same sample are counted once
+    
+    session_id, error = _submission_session_id(data, student_id)
+    if error:
+        return error
+    
+    # Session lookup and duplicate check only happen for the first sample
+    tally = tally_store.peek(student_id, session_id)
+    if tally is None:
+        session, error = _load_session(session_id)
+        if error:
+            return error
         
-    # 3. Check for duplicate submission
-    existing_attendance = Attendance.query.filter_by(student_id=student_id, session_id=session_id).first()
-    if existing_attendance:
-        return jsonify({'message': 'Attendance already submitted', 'status': existing_attendance.status}), 200
+        existing_attendance = Attendance.query.filter_by(student_id=student_id, session_id=session_id).first()
+        if existing_attendance:
+            return jsonify({'message': 'Attendance already submitted', 'status': existing_attendance.status}), 200
         
-    # 4. Calculate Inside Count
-    inside_count, valid_samples = calculate_inside_count(samples, session.polygon)
-    
-    # 5. Determine Status
-    status = "Invalid Attempt"
-    if inside_count >= 8:
-        status = "Present"
-    elif 5 <= inside_count <= 7:
-        status = "Late"
-    elif 2 <= inside_count <= 4:
-        status = "Short"
-    
-    # 6. Store Attendance
-    new_attendance = Attendance(
-        student_id=student_id,
-        teacher_id=teacher_id,
-        session_id=session_id,
-        inside_count=inside_count,
-        total_samples=len(samples),
-        status=status,
-        samples_json=json.dumps(samples)
-    )
-    
-    db.session.add(new_attendance)
-    db.session.commit()
+        tally = tally_store.start(student_id, session_id, session.teacher_id, session.polygon)
+    
+    inside_count, valid_samples = calculate_inside_count(
+        [sample], tally.polygon, audit_context={'session_id': session_id, 'student_id': student_id, 'seq': seq})
+    accepted = tally_store.add(tally, seq, sample, inside_count, valid_samples)
     
     return jsonify({
-        'status': status,
-        'inside_count': inside_count,
-        'message': 'Attendance submitted successfully'
+        'accepted': accepted,
+        'samples_received': len(tally.samples),
+        'inside_count': tally.inside_count
     })
 
+@student_bp.route('/finalize-attendance', methods=['POST'])
+def finalize_attendance():
+    """
+    Streaming mode: stores the attendance from the running tally, no geofence work
+    left to do. The tally lives in the process that received the samples, so the
+    client sends sample_count (how many samples it streamed): a tally that does not
+    hold all of them (restart, samples served by another worker) is never stored.
+    The answer is then 409 and the client submits every sample to submit-attendance.
+    """
+    # Verify student token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'student':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    student_id = payload['id']
+    data = request.json or {}
+    
+    session_id, error = _submission_session_id(data, student_id)
+    if error:
+        return error
+    
+    sample_count = data.get('sample_count')
+    if not isinstance(sample_count, int) or sample_count < 1:
+        return jsonify({'error': 'sample_count is required'}), 400
+    
+    tally = tally_store.pop(student_id, session_id)
+    received = len(tally.samples) if tally is not None else 0
+    if received != sample_count:
+        return jsonify({
+            'error': 'Samples incomplete, submit all samples instead',
+            'samples_received': received
+        }), 409
+    
+    return _store_attendance(student_id, tally.teacher_id, session_id, tally.inside_count, tally.samples)
+
+@student_bp.route('/detect-session', methods=['POST'])
+def detect_session():
+    # Verify student token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'student':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.json or {}
+    samples = data.get('samples') or [] # List of {latitude, longitude, accuracy, timestamp}
+    if not samples:
+        return jsonify({'error': 'No samples provided'}), 400
+    
+    # Grid index over unexpired sessions, only sessions near the samples are tested.
+    # sync() applies other workers' session changes and only reloads from the DB on its TTL
+    session_index.sync()
+    matches = session_index.candidates(samples)
+    if not matches:
+        return jsonify({'sessions': []})
+    
+    # Sessions deleted by another worker drop out here
+    sessions = Session.query.filter(Session.session_id.in_(list(matches.keys()))).all()
+    
+    results = []
+    for session in sessions:
+        inside_count, valid_samples = matches[session.session_id]
+        results.append({
+            'session_id': session.session_id,
+            'teacher_id': session.teacher_id,
+            'classroom_name': session.classroom_name,
+            'subject_name': session.subject_name,
+            'class_date': session.class_date,
+            'start_time': session.start_time,
+            'end_time': session.end_time,
+            'expires_at': session.expires_at.isoformat(),
+            'inside_count': inside_count,
+            'valid_samples': valid_samples
+        })
+    
+    results.sort(key=lambda r: r['inside_count'], reverse=True)
+    return jsonify({'sessions': results})
+
 @student_bp.route('/history', methods=['GET'])
 def get_history():
     # Verify student token
@@ -94,23 +355,39 @@ def get_history():
     
     student_id = payload['id']
     
-    # Fetch all attendance records for this student
-    attendances = Attendance.query.filter_by(student_id=student_id).order_by(Attendance.timestamp.desc()).all()
+    try:
+        limit, after = page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # One page of this student's records, newest first, with their session's names
+    query = db.session.query(
+        Attendance.id, Attendance.session_id, Attendance.status, Attendance.inside_count,
+        Attendance.total_samples, Attendance.timestamp, Session.subject_name, Session.classroom_name
+    ).outerjoin(Session, Session.session_id == Attendance.session_id).filter(Attendance.student_id == student_id)
+    attendances, next_cursor = keyset_page(query, Attendance.timestamp, Attendance.id, limit, after)
+    
+    # Fingerprint of exactly what this page shows: the page query is an index range
+    # scan of `limit` rows, and other students' submissions never change it
+    etag = make_etag('history', student_id, limit, request.args.get('cursor'), next_cursor,
+                     *[tuple(att) for att in attendances])
+    cached = not_modified(etag)
+    if cached:
+        return cached
     
     history = []
     for att in attendances:
-        session = Session.query.get(att.session_id)
         history.append({
             'id': att.id,
             'session_id': att.session_id,
-            'subject_name': session.subject_name if session else 'Unknown Subject',
-            'classroom_name': session.classroom_name if session else 'Unknown Classroom',
+            'subject_name': att.subject_name or 'Unknown Subject',
+            'classroom_name': att.classroom_name or 'Unknown Classroom',
             'status': att.status,
             'inside_count': att.inside_count,
             'total_samples': att.total_samples,
-            'timestamp': att.timestamp.isoformat(),
-            'date': att.timestamp.strftime('%B %d, %Y'),
-            'time': att.timestamp.strftime('%I:%M %p')
+            'timestamp': att.timestamp.isoformat() if att.timestamp else None,
+            'date': att.timestamp.strftime('%B %d, %Y') if att.timestamp else None,
+            'time': att.timestamp.strftime('%I:%M %p') if att.timestamp else None
         })
     
-    return jsonify({'history': history})
+    return etag_json({'history': history, 'next_cursor': next_cursor}, etag)
@@ -1,13 +1,27 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
 from extensions import db
 from models import Session, Attendance, ManualAttendance, Student
-from utils.token import generate_qr_token, verify_token
+from utils.token import (generate_qr_token, verify_token, generate_rotating_qr_token, ROTATING_QR_WINDOW_SECONDS,
+                         generate_scoped_token, verify_scoped_token, SCOPED_TOKEN_SECONDS)
+from utils.geofence import evict_polygon
+from utils.spatial_index import session_index
+from utils.sample_stream import tally_store
+from utils.session_cache import active_sessions
+from utils import events
+from utils.session_counters import MANUAL_COUNTER, COUNTER_COLUMNS, apply_session_deltas, session_stats
+from utils.http_cache import make_etag, not_modified, etag_json
+from utils.pagination import page_args, keyset_page, NEXT_CURSOR_HEADER
+import queue
+import time
 import uuid
 import datetime
 import json
 
 teacher_bp = Blueprint('teacher', __name__)
 
+# Sessions per recent-sessions page when the client sends no limit (the dashboard's list)
+RECENT_SESSIONS_PAGE_SIZE = 10
+
 @teacher_bp.route('/generate-qr', methods=['POST'])
 def generate_qr():
     # Verify teacher token (middleware logic simplified here)
@@ -32,6 +46,7 @@ def generate_qr():
     end_time = data.get('end_time', '00:00')
     year = data.get('year', 'Unknown')
     course = data.get('course', 'Unknown')
+    qr_mode = data.get('qr_mode', 'jwt') # 'rotating': short token refreshed by the teacher screen
     
     session_id = str(uuid.uuid4())
     expires_in_minutes = 10 # QR expiry, not class end time
@@ -63,12 +78,50 @@ def generate_qr():
     db.session.add(new_session)
     db.session.commit()
     
+    # Make the new session discoverable by location, in every worker
+    session_index.session_created(session_id, polygon, expires_at)
+    
+    if qr_mode == 'rotating':
+        return jsonify({
+            'qr_token': generate_rotating_qr_token(session_id),
+            'qr_mode': 'rotating',
+            'rotate_seconds': ROTATING_QR_WINDOW_SECONDS,
+            'session_id': session_id,
+            'expires_at': expires_at.isoformat()
+        })
+    
     return jsonify({
         'qr_token': qr_token,
+        'qr_mode': 'jwt',
         'session_id': session_id,
         'expires_at': expires_at.isoformat()
     })
 
+@teacher_bp.route('/session/<session_id>/qr-token', methods=['GET'])
+def get_rotating_qr_token(session_id):
+    """Current rotating QR token for a session, polled by the teacher screen every few seconds."""
+    # Verify teacher token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    session = active_sessions.load(session_id)
+    if not session or session.teacher_id != payload['id']:
+        return jsonify({'error': 'Session not found or unauthorized'}), 404
+    if session.expires_at <= datetime.datetime.utcnow():
+        return jsonify({'error': 'QR Code expired'}), 400
+    
+    return jsonify({
+        'qr_token': generate_rotating_qr_token(session_id),
+        'rotate_seconds': ROTATING_QR_WINDOW_SECONDS,
+        'expires_at': session.expires_at.isoformat()
+    })
+
 @teacher_bp.route('/manual-attendance', methods=['POST'])
 def add_manual_attendance():
     # Verify teacher token
@@ -103,8 +156,17 @@ def add_manual_attendance():
     )
     
     db.session.add(new_manual)
+    apply_session_deltas({session_id: {MANUAL_COUNTER: 1}})
     db.session.commit()
     
+    events.publish(
+        session_id, 'manual',
+        roll_number=new_manual.roll_number,
+        student_name=new_manual.student_name,
+        remarks=new_manual.remarks,
+        timestamp=new_manual.timestamp.isoformat()
+    )
+    
     return jsonify({'message': 'Manual attendance added successfully'}), 201
 
 @teacher_bp.route('/attendance/<session_id>', methods=['GET'])
@@ -119,26 +181,29 @@ def get_session_attendance(session_id):
     if not payload or payload.get('role') != 'teacher':
         return jsonify({'error': 'Unauthorized'}), 401
     
-    session = Session.query.get(session_id)
+    session = db.session.query(
+        Session.teacher_id, Session.version, *[getattr(Session, column) for column in COUNTER_COLUMNS]
+    ).filter_by(session_id=session_id).first()
     if not session:
         return jsonify({'error': 'Session not found'}), 404
         
     if session.teacher_id != payload['id']:
         return jsonify({'error': 'Unauthorized'}), 403
+    
+    # Unchanged since the client's last poll: skip the fetch and serialization
+    etag = make_etag('session-attendance', session_id, session.version)
+    cached = not_modified(etag)
+    if cached:
+        return cached
         
     attendances = Attendance.query.filter_by(session_id=session_id).all()
     manual_attendances = ManualAttendance.query.filter_by(session_id=session_id).all()
     
-    stats = {
-        'Present': 0,
-        'Late': 0,
-        'Short': 0,
-        'Invalid': 0
-    }
+    # Materialized counters: O(1) regardless of class size
+    stats = session_stats(session)
     
     student_list = []
     for att in attendances:
-        stats[att.status] = stats.get(att.status, 0) + 1
         student_list.append({
             'roll_number': att.student.roll_number,
             'student_name': att.student.name,
@@ -149,10 +214,7 @@ def get_session_attendance(session_id):
         
     manual_list = []
     for matt in manual_attendances:
-        # Manual attendance counts as Present for stats? Usually yes.
-        # Let's count them as Present in stats for now, or keep separate?
-        # User said "mark present", so we should count them as Present.
-        stats['Present'] += 1
+        # Manual attendance counts as Present in stats (see session_stats)
         manual_list.append({
             'roll_number': matt.roll_number,
             'student_name': matt.student_name,
@@ -160,15 +222,106 @@ def get_session_attendance(session_id):
             'timestamp': matt.timestamp.isoformat()
         })
         
-    return jsonify({
+    return etag_json({
         'stats': stats,
         'students': student_list,
         'manual_students': manual_list
+    }, etag)
+
+def _attendance_event(event):
+    """Shapes an attendance event like a row of get_session_attendance's student list."""
+    student = db.session.query(Student.name, Student.roll_number).filter_by(id=event['student_id']).first()
+    db.session.close() # Do not hold a connection while the stream waits
+    return {
+        'type': 'attendance',
+        'roll_number': student.roll_number if student else 'N/A',
+        'student_name': student.name if student else 'Unknown',
+        'inside_count': event['inside_count'],
+        'total_samples': event['total_samples'],
+        'status': event['status']
+    }
+
+@teacher_bp.route('/attendance/<session_id>/stream-token', methods=['POST'])
+def create_stream_token(session_id):
+    """Short-lived token for one session's live stream: EventSource cannot send headers, so it goes in the URL."""
+    # Verify teacher token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    session = Session.query.get(session_id)
+    if not session:
+        return jsonify({'error': 'Session not found'}), 404
+        
+    if session.teacher_id != payload['id']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify({
+        'token': generate_scoped_token('attendance-stream', teacher_id=payload['id'], session_id=session_id),
+        'expires_in': SCOPED_TOKEN_SECONDS
     })
 
+@teacher_bp.route('/attendance/<session_id>/stream', methods=['GET'])
+def stream_session_attendance(session_id):
+    """
+    Server-Sent Events for the live attendance view: one message per committed
+    attendance or manual mark. Authenticated by ?token= from stream-token (never
+    the login token, which would end up in access logs). Answers 503 when the
+    process already serves events.MAX_STREAMS streams; the client polls then.
+    """
+    token = request.args.get('token')
+    if not token:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    payload = verify_scoped_token(token, 'attendance-stream')
+    if not payload or payload.get('session_id') != session_id:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    release = events.try_open_stream()
+    if release is None:
+        return jsonify({'error': 'Too many live views open, poll the attendance instead'}), 503, {'Retry-After': '30'}
+    
+    def generate():
+        # Subscribed before the first byte goes out, so anything committed after
+        # the client's snapshot (taken once the stream opens) reaches it
+        subscriber = events.subscribe(session_id)
+        try:
+            yield 'retry: 3000\n\n'
+            deadline = time.monotonic() + events.STREAM_MAX_SECONDS
+            while time.monotonic() < deadline:
+                try:
+                    event = subscriber.get(timeout=events.STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                
+                if event['type'] == 'attendance':
+                    event = _attendance_event(event)
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                if event['type'] == 'deleted':
+                    return
+        finally:
+            events.unsubscribe(session_id, subscriber)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs however the response ends, even if the client left before the first byte
+    response.call_on_close(release)
+    return response
+
 @teacher_bp.route('/generate-report', methods=['POST'])
 def generate_report():
-    # ... (unchanged) ...
+    """
+    Report in one response for engine=local (computed in milliseconds). Other
+    engines answer 202 with a queued report job to poll.
+    """
     # Verify teacher token
     auth_header = request.headers.get('Authorization')
     if not auth_header:
@@ -182,14 +335,20 @@ def generate_report():
     teacher_id = payload['id']
     data = request.json or {}
     session_id = data.get('session_id')  # Optional: filter by session
-    
-    # Fetch attendance records
-    if session_id:
-        attendances = Attendance.query.filter_by(session_id=session_id, teacher_id=teacher_id).all()
-    else:
-        attendances = Attendance.query.filter_by(teacher_id=teacher_id).all()
-    
-    if not attendances:
+    engine = data.get('engine', 'gemini')
+    
+    from utils.report_jobs import get_report, job_to_dict, REPORT_ENGINES
+    if engine not in REPORT_ENGINES:
+        return jsonify({'error': f"engine must be one of: {', '.join(REPORT_ENGINES)}"}), 400
+    if engine != 'local':
+        # LLM calls never run on a request thread: queue a job, poll /report-jobs/<job_id>/result
+        job = current_app.extensions['report_jobs'].submit(teacher_id, session_id or None, engine)
+        response = jsonify(job_to_dict(job))
+        response.headers['Retry-After'] = '1'
+        return response, 202
+    result, cached = get_report(teacher_id, session_id)
+    
+    if result is None:
         return jsonify({
             'error': 'No attendance records found',
             'report': {
@@ -199,30 +358,13 @@ def generate_report():
             }
         }), 404
     
-    # Format attendance data for Gemini
-    attendance_data = []
-    for att in attendances:
-        student = Student.query.get(att.student_id)
-        attendance_data.append({
-            'student_name': student.name if student else 'Unknown',
-            'roll_number': student.roll_number if student else 'N/A',
-            'status': att.status,
-            'inside_count': att.inside_count,
-            'total_samples': att.total_samples,
-            'date': att.timestamp.strftime('%B %d, %Y'),
-            'time': att.timestamp.strftime('%I:%M %p'),
-            'session_id': att.session_id
-        })
-    
-    # Generate report using Gemini AI
-    from utils.gemini_service import generate_attendance_report
-    result = generate_attendance_report(attendance_data)
-    
     if result['success']:
         return jsonify({
             'success': True,
             'report': result['report'],
-            'records_analyzed': len(attendance_data)
+            'records_analyzed': result['records_analyzed'],
+            'engine': engine,
+            'cached': cached
         })
     else:
         return jsonify({
@@ -231,6 +373,130 @@ def generate_report():
             'report': result['report']
         }), 500
 
+@teacher_bp.route('/generate-report/stream', methods=['POST'])
+def generate_report_stream():
+    """
+    generate-report as newline-delimited JSON events, each section sent as soon as
+    Gemini writes it. The report runs as a background job on the bounded report
+    pool; this request only relays the job's events from the event broker. When
+    every stream slot is taken it answers 202 with the job to poll instead.
+    """
+    # Verify teacher token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.json or {}
+    session_id = data.get('session_id') or None  # Optional: filter by session
+    engine = data.get('engine', 'gemini')
+    
+    from utils.report_jobs import relay_job, job_to_dict, REPORT_ENGINES
+    if engine not in REPORT_ENGINES:
+        return jsonify({'error': f"engine must be one of: {', '.join(REPORT_ENGINES)}"}), 400
+    job = current_app.extensions['report_jobs'].submit(payload['id'], session_id, engine)
+    
+    release = events.try_open_stream()
+    if release is None:
+        response = jsonify(job_to_dict(job))
+        response.headers['Retry-After'] = '1'
+        return response, 202
+    job_id = job.id
+    
+    def generate():
+        for event in relay_job(job_id):
+            yield json.dumps(event) + '\n'
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    response.call_on_close(release)
+    return response
+
+@teacher_bp.route('/report-jobs', methods=['POST'])
+def create_report_job():
+    """Queues report generation in the background, answers 202 with the job to poll."""
+    # Verify teacher token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.json or {}
+    session_id = data.get('session_id') or None  # Optional: filter by session
+    engine = data.get('engine', 'gemini')
+    
+    from utils.report_jobs import job_to_dict, REPORT_ENGINES
+    if engine not in REPORT_ENGINES:
+        return jsonify({'error': f"engine must be one of: {', '.join(REPORT_ENGINES)}"}), 400
+    job = current_app.extensions['report_jobs'].submit(payload['id'], session_id, engine)
+    return jsonify(job_to_dict(job)), 202
+
+@teacher_bp.route('/report-jobs/<job_id>', methods=['GET'])
+def get_report_job(job_id):
+    # Verify teacher token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    from utils.report_jobs import job_to_dict
+    job = current_app.extensions['report_jobs'].get(job_id, payload['id'])
+    if not job:
+        return jsonify({'error': 'Report job not found'}), 404
+    return jsonify(job_to_dict(job))
+
+@teacher_bp.route('/report-jobs/<job_id>/result', methods=['GET'])
+def get_report_job_result(job_id):
+    """The finished report in the generate-report response format; 202 while the job is still running."""
+    # Verify teacher token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    from utils.report_jobs import job_to_dict, ACTIVE_STATES
+    job = current_app.extensions['report_jobs'].get(job_id, payload['id'])
+    if not job:
+        return jsonify({'error': 'Report job not found'}), 404
+    if job.state in ACTIVE_STATES:
+        return jsonify(job_to_dict(job)), 202
+    
+    result = job_to_dict(job, include_result=True).get('result')
+    if job.state == 'done':
+        return jsonify({
+            'success': True,
+            'report': result['report'],
+            'records_analyzed': result['records_analyzed'],
+            'engine': job.engine
+        })
+    return jsonify({
+        'success': False,
+        'error': job.error,
+        'report': result['report'] if result else {
+            'summary': 'Failed to generate AI report.',
+            'insights': [job.error],
+            'recommendations': ['Please try again later.']
+        }
+    }), 404 if job.error == 'No attendance records found' else 500
+
 @teacher_bp.route('/recent-sessions', methods=['GET'])
 def get_recent_sessions():
     # Verify teacher token
@@ -245,24 +511,44 @@ def get_recent_sessions():
     
     teacher_id = payload['id']
     
-    # Fetch recent 10 sessions
-    sessions = Session.query.filter_by(teacher_id=teacher_id).order_by(Session.starts_at.desc()).limit(10).all()
-
+    try:
+        limit, after = page_args(default_limit=RECENT_SESSIONS_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # One page of the latest sessions (only the columns the dashboard shows)
+    query = db.session.query(
+        Session.session_id, Session.classroom_name, Session.subject_name, Session.class_date,
+        Session.start_time, Session.end_time, Session.year, Session.course, Session.expires_at, Session.version,
+        Session.starts_at
+    ).filter(Session.teacher_id == teacher_id)
+    sessions, next_cursor = keyset_page(query, Session.starts_at, Session.session_id, limit, after)
+    
+    etag = make_etag('recent-sessions', teacher_id, next_cursor,
+                     *[(session.session_id, session.version) for session in sessions])
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    # One joined query for the attendance of all of them, grouped in Python
+    students_by_session = {session.session_id: [] for session in sessions}
+    if sessions:
+        rows = db.session.query(
+            Attendance.session_id, Attendance.status, Attendance.timestamp, Student.name, Student.roll_number
+        ).join(Student, Student.id == Attendance.student_id).filter(
+            Attendance.session_id.in_(list(students_by_session.keys()))
+        ).order_by(Attendance.id).all()
+        
+        for row in rows:
+            students_by_session[row.session_id].append({
+                'name': row.name,
+                'roll_number': row.roll_number,
+                'status': row.status,
+                'time': row.timestamp.strftime('%I:%M %p')
+            })
     
     results = []
     for session in sessions:
-        # Fetch attendance for this session
-        attendances = Attendance.query.filter_by(session_id=session.session_id).all()
-        student_list = []
-        for att in attendances:
-            student = Student.query.get(att.student_id)
-            student_list.append({
-                'name': student.name,
-                'roll_number': student.roll_number,
-                'status': att.status,
-                'time': att.timestamp.strftime('%I:%M %p')
-            })
-            
         results.append({
             'session_id': session.session_id,
             'classroom': session.classroom_name,
@@ -272,11 +558,228 @@ def get_recent_sessions():
             'end_time': session.end_time,
             'year': session.year,
             'course': session.course,
-            'students': student_list,
+            'students': students_by_session[session.session_id],
             'expires_at': session.expires_at.isoformat() if session.expires_at else None
         })
+    
+    # The body stays a plain list for older clients; the next page's cursor goes in a header
+    response = etag_json(results, etag)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
+
+@teacher_bp.route('/export-token', methods=['POST'])
+def create_export_token():
+    """Short-lived token for one download link, so the login token never goes in a URL."""
+    # Verify teacher token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify({
+        'token': generate_scoped_token('export', teacher_id=payload['id']),
+        'expires_in': SCOPED_TOKEN_SECONDS
+    })
+
+@teacher_bp.route('/export', methods=['GET'])
+def export_attendance():
+    """
+    Streams the teacher's attendance (GPS and manual) as CSV, or XLSX with
+    ?format=xlsx. Filters: course, year, start_date, end_date (YYYY-MM-DD, class
+    date) and session_id. Download links cannot send headers, so they carry a
+    ?token= from export-token instead of the login token.
+    """
+    # Verify teacher token (header) or download token (query string)
+    auth_header = request.headers.get('Authorization')
+    if auth_header:
+        payload = verify_token(auth_header.split(" ")[1])
+        teacher_id = payload['id'] if payload and payload.get('role') == 'teacher' else None
+    elif request.args.get('token'):
+        payload = verify_scoped_token(request.args['token'], 'export')
+        teacher_id = payload['teacher_id'] if payload else None
+    else:
+        return jsonify({'error': 'Missing token'}), 401
+    if teacher_id is None:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    from utils.attendance_export import iter_export_rows, iter_csv, write_xlsx, xlsx_available
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'xlsx'):
+        return jsonify({'error': 'format must be csv or xlsx'}), 400
+    if export_format == 'xlsx' and not xlsx_available():
+        return jsonify({'error': 'XLSX export is not available on this server, use format=csv'}), 400
+    
+    filters = {key: request.args.get(key) for key in ('course', 'year', 'start_date', 'end_date', 'session_id')}
+    rows = iter_export_rows(teacher_id, **filters)
+    filename = f"attendance-{datetime.date.today().isoformat()}.{export_format}"
+    
+    if export_format == 'xlsx':
+        body = write_xlsx(rows)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        body = iter_csv(rows)
+        mimetype = 'text/csv'
+    
+    # stream_with_context keeps the request's database session (and its cursors) open while the rows are sent
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Accel-Buffering': 'no'
+    })
+
+@teacher_bp.route('/roster', methods=['GET'])
+def get_roster():
+    # Verify teacher token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    from models import RosterEntry
+    query = db.session.query(
+        RosterEntry.course, RosterEntry.year, RosterEntry.branch, Student.id, Student.name, Student.roll_number
+    ).join(Student, Student.id == RosterEntry.student_id).filter(RosterEntry.teacher_id == payload['id'])
+    if request.args.get('course'):
+        query = query.filter(RosterEntry.course == request.args['course'])
+    if request.args.get('year'):
+        query = query.filter(RosterEntry.year == request.args['year'])
+    
+    roster = []
+    for course, year, branch, student_id, name, roll_number in query.order_by(
+            RosterEntry.course, RosterEntry.year, Student.roll_number):
+        roster.append({
+            'course': course,
+            'year': year,
+            'branch': branch,
+            'student_id': student_id,
+            'name': name,
+            'roll_number': roll_number
+        })
+    return jsonify({'roster': roster})
+
+@teacher_bp.route('/roster', methods=['POST'])
+def add_roster_students():
+    """Adds students by roll number to the teacher's roster for a course/year (the Session course and year)."""
+    # Verify teacher token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.json or {}
+    course = data.get('course')
+    year = data.get('year')
+    roll_numbers = [str(roll).strip() for roll in data.get('roll_numbers') or [] if str(roll).strip()]
+    if not all([course, year, roll_numbers]):
+        return jsonify({'error': 'course, year and roll_numbers are required'}), 400
+    
+    from utils.roster import add_to_roster
+    added, unknown = add_to_roster(payload['id'], course, year, roll_numbers, branch=data.get('branch'))
+    return jsonify({'added': added, 'unknown_roll_numbers': unknown})
+
+@teacher_bp.route('/roster', methods=['DELETE'])
+def remove_roster_students():
+    """Removes the listed roll numbers, or the whole course/year roster when none are given."""
+    # Verify teacher token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.json or {}
+    if not data.get('course') or not data.get('year'):
+        return jsonify({'error': 'course and year are required'}), 400
+    
+    from utils.roster import remove_from_roster
+    removed = remove_from_roster(payload['id'], data['course'], data['year'], data.get('roll_numbers'))
+    return jsonify({'removed': removed})
+
+@teacher_bp.route('/absentees', methods=['GET'])
+def get_absentees():
+    """Roster students missing from a session (?session_id=) or from each of a day's sessions (?date=YYYY-MM-DD)."""
+    # Verify teacher token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    session_id = request.args.get('session_id')
+    class_date = request.args.get('date')
+    if not session_id and not class_date:
+        return jsonify({'error': 'Provide a session_id or a date'}), 400
+    
+    from utils.roster import session_absentees
+    sessions = session_absentees(payload['id'], session_id=session_id, class_date=class_date)
+    if session_id and not sessions:
+        return jsonify({'error': 'Session not found or unauthorized'}), 404
+    return jsonify({'sessions': sessions})
+
+@teacher_bp.route('/rescore', methods=['POST'])
+def rescore():
+    # Verify teacher token
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Missing token'}), 401
+    
+    token = auth_header.split(" ")[1]
+    payload = verify_token(token)
+    if not payload or payload.get('role') != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    teacher_id = payload['id']
+    data = request.json or {}
+    session_id = data.get('session_id')
+    start_date = data.get('start_date') # YYYY-MM-DD, compared to the session's class date
+    end_date = data.get('end_date')
+    
+    if not session_id and not (start_date or end_date):
+        return jsonify({'error': 'Provide a session_id or a start_date/end_date range'}), 400
+    
+    if session_id:
+        session = Session.query.filter_by(session_id=session_id, teacher_id=teacher_id).first()
+        if not session:
+            return jsonify({'error': 'Session not found or unauthorized'}), 404
         
-    return jsonify(results)
+        # Optionally correct the classroom polygon before re-scoring
+        if data.get('polygon'):
+            session.polygon = json.dumps(data.get('polygon'))
+            db.session.commit()
+            evict_polygon(session_id)
+            active_sessions.invalidate(session_id)
+            session_index.session_created(session_id, session.polygon, session.expires_at)
+    
+    from utils.rescore import rescore_attendance
+    summary = rescore_attendance(
+        session_ids=[session_id] if session_id else None,
+        start_date=start_date,
+        end_date=end_date,
+        teacher_id=teacher_id
+    )
+    
+    if session_id and summary['rows_updated']:
+        events.publish(session_id, 'reset') # Statuses changed, live views reload
+    
+    return jsonify({'message': 'Attendance re-scored successfully', **summary})
 
 @teacher_bp.route('/session/<session_id>', methods=['DELETE'])
 def delete_session(session_id):
@@ -299,9 +802,16 @@ def delete_session(session_id):
         
     # Delete associated attendance records first (if cascading delete is not set up in models)
     Attendance.query.filter_by(session_id=session_id).delete()
+    ManualAttendance.query.filter_by(session_id=session_id).delete()
     
     # Delete the session
     db.session.delete(session)
     db.session.commit()
     
+    evict_polygon(session_id)
+    active_sessions.invalidate(session_id)
+    session_index.session_ended(session_id)
+    tally_store.discard_session(session_id)
+    events.publish(session_id, 'deleted')
+    
     return jsonify({'message': 'Session deleted successfully'})
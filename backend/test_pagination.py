@@ -0,0 +1,62 @@
+"""
+Keyset pagination over nullable timestamps: run with `python -m pytest test_pagination.py` from backend/.
+"""
+import datetime
+import uuid
+
+import pytest
+
+
+@pytest.fixture
+def history(app):
+    """A student with dated and undated attendance rows; returns (client, auth headers, row ids newest first)."""
+    from extensions import db
+    from models import Student, Teacher, Attendance
+    from utils.token import generate_token
+
+    with app.app_context():
+        teacher = Teacher(name='Teacher', email='teacher@test.com', password_hash='x')
+        student = Student(name='Student', roll_number='R1', password_hash='x')
+        db.session.add_all([teacher, student])
+        db.session.commit()
+
+        now = datetime.datetime.utcnow()
+        timestamps = [now, now, now - datetime.timedelta(minutes=1), None, None, None, now - datetime.timedelta(minutes=2)]
+        rows = [Attendance(student_id=student.id, teacher_id=teacher.id, session_id=str(uuid.uuid4()),
+                           inside_count=1, total_samples=1, status='Present') for _ in timestamps]
+        db.session.add_all(rows)
+        db.session.flush()
+        for row, timestamp in zip(rows, timestamps):
+            row.timestamp = timestamp
+        db.session.commit()
+
+        dated = sorted((row for row in rows if row.timestamp), key=lambda row: (row.timestamp, row.id), reverse=True)
+        undated = sorted((row for row in rows if not row.timestamp), key=lambda row: row.id, reverse=True)
+        expected = [row.id for row in dated + undated]
+        token = generate_token({'id': student.id, 'role': 'student', 'name': student.name})
+        return app.test_client(), {'Authorization': f'Bearer {token}'}, expected
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 4])
+def test_history_pages_cover_null_timestamps(history, limit):
+    client, headers, expected = history
+    seen, cursor = [], None
+    for _ in range(len(expected) + 1):
+        url = f'/api/student/history?limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        body = response.get_json()
+        seen += [entry['id'] for entry in body['history']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == expected
+
+
+def test_cursor_round_trips_a_null_timestamp():
+    from utils.pagination import encode_cursor, decode_cursor
+
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+    stamp = datetime.datetime(2025, 1, 1, 10, 0, 0)
+    assert decode_cursor(encode_cursor(stamp, 'abc')) == (stamp, 'abc')
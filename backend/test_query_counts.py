@@ -0,0 +1,73 @@
+"""
+Query-count regression checks: run with `python -m pytest test_query_counts.py` from backend/.
+Uses the app fixture from conftest.py (throwaway SQLite database, no running server needed).
+"""
+import datetime
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+
+@contextmanager
+def count_queries(engine):
+    """Collects every SQL statement the engine sends while the block runs."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def seed_sessions(teacher_id, student_ids, count):
+    from extensions import db
+    from models import Session, Attendance
+
+    now = datetime.datetime.utcnow()
+    for i in range(count):
+        session_id = str(uuid.uuid4())
+        db.session.add(Session(
+            session_id=session_id, teacher_id=teacher_id, polygon='[[0,0],[0,1],[1,1]]', token='x',
+            starts_at=now - datetime.timedelta(minutes=i), expires_at=now + datetime.timedelta(minutes=5),
+            classroom_name='Room', subject_name='Subject', class_date='2025-01-01',
+            start_time='10:00', end_time='11:00', year='2024', course='CS'
+        ))
+        db.session.add_all([
+            Attendance(student_id=student_id, teacher_id=teacher_id, session_id=session_id,
+                       inside_count=1, total_samples=1, status='Present')
+            for student_id in student_ids
+        ])
+    db.session.commit()
+
+
+@pytest.mark.parametrize('sessions', [1, 10])
+def test_recent_sessions_uses_two_queries(app, sessions):
+    """One page of sessions, then one joined query for all their attendance, whatever the page size."""
+    from extensions import db
+    from models import Teacher, Student
+    from utils.token import generate_token
+
+    with app.app_context():
+        teacher = Teacher(name='Teacher', email='teacher@test.com', password_hash='x')
+        students = [Student(name=f'Student {i}', roll_number=f'R{i}', password_hash='x') for i in range(3)]
+        db.session.add(teacher)
+        db.session.add_all(students)
+        db.session.commit()
+        seed_sessions(teacher.id, [student.id for student in students], sessions)
+        token = generate_token({'id': teacher.id, 'role': 'teacher', 'name': teacher.name})
+
+        client = app.test_client()
+        with count_queries(db.engine) as statements:
+            response = client.get('/api/teacher/recent-sessions', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body) == sessions
+    assert all(len(session['students']) == 3 for session in body)
+    assert len(statements) == 2, statements
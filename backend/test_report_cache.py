@@ -0,0 +1,90 @@
+"""
+ReportCache with a stub loader and a fake clock: run with `python -m pytest test_report_cache.py` from backend/.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.report_cache import ReportCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubLoader:
+    """Counts its calls; optionally blocks until released so callers pile up on one key."""
+
+    def __init__(self, blocking=False):
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not blocking:
+            self.release.set()
+
+    def __call__(self, value='report'):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return {'success': True, 'value': value}
+
+
+def test_concurrent_callers_share_one_load():
+    cache = ReportCache(clock=FakeClock())
+    loader = StubLoader(blocking=True)
+    callers = 8
+
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        leader = pool.submit(cache.get_or_compute, 'key', loader)
+        assert loader.started.wait(5)
+        followers = [pool.submit(cache.get_or_compute, 'key', loader) for _ in range(callers - 1)]
+        loader.release.set()
+        results = [leader.result(5)] + [future.result(5) for future in followers]
+
+    assert loader.calls == 1
+    assert results[0] == ({'success': True, 'value': 'report'}, False)
+    assert all(result == ({'success': True, 'value': 'report'}, True) for result in results[1:])
+
+
+def test_entry_expires_after_ttl():
+    clock = FakeClock()
+    cache = ReportCache(ttl=60, clock=clock)
+    loader = StubLoader()
+
+    assert cache.get_or_compute('key', loader) == ({'success': True, 'value': 'report'}, False)
+    clock.now += 60
+    assert cache.get_or_compute('key', loader)[1] is True
+    assert loader.calls == 1
+
+    clock.now += 0.001
+    assert cache.get('key') is None
+    assert cache.get_or_compute('key', loader)[1] is False
+    assert loader.calls == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ReportCache(max_size=2, clock=FakeClock())
+    loader = StubLoader()
+
+    cache.get_or_compute('a', lambda: loader('a'))
+    cache.get_or_compute('b', lambda: loader('b'))
+    cache.get('a')  # 'b' is now the least recently used
+    cache.get_or_compute('c', lambda: loader('c'))
+
+    assert cache.get('b') is None
+    assert cache.get('a') == {'success': True, 'value': 'a'}
+    assert cache.get('c') == {'success': True, 'value': 'c'}
+    assert loader.calls == 3
+
+
+def test_uncacheable_results_are_not_stored():
+    cache = ReportCache(clock=FakeClock())
+    loader = StubLoader()
+
+    cache.get_or_compute('key', loader, cacheable=lambda result: False)
+    cache.get_or_compute('key', loader, cacheable=lambda result: False)
+
+    assert loader.calls == 2
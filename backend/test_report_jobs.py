@@ -0,0 +1,154 @@
+"""
+Report jobs end to end against the local fake LLM (REPORT_LLM=fake): run with
+`python -m pytest test_report_jobs.py` from backend/.
+"""
+import datetime
+import time
+import uuid
+
+import pytest
+
+import utils.report_jobs as report_jobs
+
+WAIT_SECONDS = 10
+
+
+@pytest.fixture(autouse=True)
+def fake_llm(monkeypatch):
+    """Fake LLM, quick heartbeats and an empty report cache for every test (before the app fixture)."""
+    from utils.gemini_service import _genai
+    from utils.report_cache import report_cache
+
+    monkeypatch.setenv('REPORT_LLM', 'fake')
+    monkeypatch.setattr(report_jobs, 'HEARTBEAT_SECONDS', 0.05)
+    _genai.cache_clear()
+    report_cache.clear()
+    yield
+    _genai.cache_clear()
+    report_cache.clear()
+
+
+@pytest.fixture
+def teacher(app):
+    """A teacher with one session; returns (teacher_id, auth headers, session_id)."""
+    from extensions import db
+    from models import Teacher, Session
+    from utils.token import generate_token
+
+    with app.app_context():
+        teacher = Teacher(name='Teacher', email='teacher@test.com', password_hash='x')
+        db.session.add(teacher)
+        db.session.commit()
+        now = datetime.datetime.utcnow()
+        session_id = str(uuid.uuid4())
+        db.session.add(Session(
+            session_id=session_id, teacher_id=teacher.id, polygon='[[0,0],[0,1],[1,1]]', token='x',
+            starts_at=now, expires_at=now + datetime.timedelta(minutes=5), classroom_name='Room',
+            subject_name='Subject', class_date='2025-01-01', start_time='10:00', end_time='11:00'
+        ))
+        db.session.commit()
+        token = generate_token({'id': teacher.id, 'role': 'teacher', 'name': teacher.name})
+        return teacher.id, {'Authorization': f'Bearer {token}'}, session_id
+
+
+def add_attendance(app, teacher_id, session_id, statuses):
+    from extensions import db
+    from models import Student, Attendance
+
+    with app.app_context():
+        for i, status in enumerate(statuses):
+            student = Student(name=f'Student {i}', roll_number=f'R{i}', password_hash='x')
+            db.session.add(student)
+            db.session.flush()
+            db.session.add(Attendance(student_id=student.id, teacher_id=teacher_id, session_id=session_id,
+                                      inside_count=1, total_samples=1, status=status))
+        db.session.commit()
+
+
+def read_job(app, job_id):
+    from extensions import db
+    from models import ReportJob
+
+    with app.app_context():
+        job = db.session.get(ReportJob, job_id)
+        return {column: getattr(job, column) for column in
+                ('state', 'owner', 'heartbeat_at', 'error', 'active_key', 'finished_at')}
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + WAIT_SECONDS
+    while time.monotonic() < deadline:
+        value = condition()
+        if value:
+            return value
+        time.sleep(0.02)
+    raise AssertionError('Timed out waiting for the report job')
+
+
+def wait_for_result(client, headers, job_id):
+    def finished():
+        response = client.get(f'/api/teacher/report-jobs/{job_id}/result', headers=headers)
+        return response if response.status_code != 202 else None
+    return wait_for(finished)
+
+
+def test_job_is_claimed_heartbeats_and_finishes(app, teacher, monkeypatch):
+    monkeypatch.setenv('REPORT_LLM_FAKE_DELAY', '0.5')
+    teacher_id, headers, session_id = teacher
+    add_attendance(app, teacher_id, session_id, ['Present', 'Present', 'Late'])
+    client = app.test_client()
+
+    response = client.post('/api/teacher/report-jobs', json={}, headers=headers)
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    # A second click while it runs joins the same job
+    assert client.post('/api/teacher/report-jobs', json={}, headers=headers).get_json()['job_id'] == job_id
+
+    runner = app.extensions['report_jobs']
+    claimed = wait_for(lambda: (job := read_job(app, job_id))['state'] == 'running' and job)
+    assert claimed['owner'] == runner.owner
+    assert wait_for(lambda: read_job(app, job_id)['heartbeat_at'] > claimed['heartbeat_at'])
+
+    # Another process cannot claim a job whose heartbeat is fresh
+    other = report_jobs.ReportJobRunner(app)
+    other.owner = 'other-process'
+    with app.app_context():
+        assert not other._claim(job_id)
+
+    response = wait_for_result(client, headers, job_id)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['success'] and body['records_analyzed'] == 3
+    assert 'Present: 2' in body['report']['insights']
+
+    job = read_job(app, job_id)
+    assert job['state'] == 'done' and job['active_key'] is None and job['finished_at'] is not None
+
+
+def test_job_fails_when_the_llm_times_out(app, teacher, monkeypatch):
+    monkeypatch.setenv('REPORT_LLM_FAKE_DELAY', '30')
+    monkeypatch.setattr(app.extensions['report_jobs'], 'timeout', 0.2)
+    teacher_id, headers, session_id = teacher
+    add_attendance(app, teacher_id, session_id, ['Present'])
+    client = app.test_client()
+
+    job_id = client.post('/api/teacher/report-jobs', json={}, headers=headers).get_json()['job_id']
+    response = wait_for_result(client, headers, job_id)
+
+    assert response.status_code == 500
+    assert not response.get_json()['success']
+    job = read_job(app, job_id)
+    assert job['state'] == 'failed' and 'Deadline' in job['error'] and job['active_key'] is None
+
+
+def test_job_without_attendance_reports_failed_status(app, teacher):
+    _teacher_id, headers, _session_id = teacher
+    client = app.test_client()
+
+    job_id = client.post('/api/teacher/report-jobs', json={}, headers=headers).get_json()['job_id']
+    response = wait_for_result(client, headers, job_id)
+
+    assert response.status_code == 404
+    assert response.get_json()['error'] == 'No attendance records found'
+    status = client.get(f'/api/teacher/report-jobs/{job_id}', headers=headers).get_json()
+    assert status['state'] == 'failed' and status['finished_at'] is not None
@@ -0,0 +1,150 @@
+import csv
+import heapq
+import tempfile
+
+from extensions import db
+from models import Session, Attendance, ManualAttendance, Student
+
+# Rows fetched per round trip; with yield_per Postgres uses a server-side cursor,
+# so memory depends on this, not on how many rows the export has
+EXPORT_BATCH_SIZE = 1000
+
+# CSV text buffered before it is sent as one chunk of the response
+CSV_CHUNK_BYTES = 64 * 1024
+
+EXPORT_COLUMNS = [
+    'class_date', 'start_time', 'subject', 'classroom', 'course', 'year', 'session_id',
+    'roll_number', 'student_name', 'status', 'source', 'inside_count', 'total_samples', 'remarks', 'recorded_at'
+]
+
+
+def _filtered(query, teacher_id, course=None, year=None, start_date=None, end_date=None, session_id=None):
+    query = query.filter(Session.teacher_id == teacher_id)
+    if course:
+        query = query.filter(Session.course == course)
+    if year:
+        query = query.filter(Session.year == year)
+    if start_date:
+        query = query.filter(Session.class_date >= start_date)
+    if end_date:
+        query = query.filter(Session.class_date <= end_date)
+    if session_id:
+        query = query.filter(Session.session_id == session_id)
+    return query
+
+
+def _merge_order():
+    """
+    (class_date, start_time, session_id) compared by code point, the order Python's
+    str comparison uses in heapq.merge. SQLite's default BINARY collation already
+    compares UTF-8 bytes; Postgres needs COLLATE "C" instead of the database locale.
+    """
+    columns = (Session.class_date, Session.start_time, Session.session_id)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return tuple(column.collate('C') for column in columns)
+    return columns
+
+
+def iter_export_rows(teacher_id, **filters):
+    """
+    Every Attendance and ManualAttendance row of the teacher's sessions matching
+    filters (course, year, start_date / end_date on the class date, session_id),
+    as lists in EXPORT_COLUMNS order, sorted by class date, start time and session.
+
+    Both tables are read with yield_per and merged on the fly, so only one batch
+    per table is in memory at a time. Must be consumed inside an app context.
+    """
+    session_columns = (Session.class_date, Session.start_time, Session.subject_name, Session.classroom_name,
+                       Session.course, Session.year, Session.session_id)
+    merge_order = _merge_order()
+
+    attendance = _filtered(db.session.query(
+        *session_columns, Student.roll_number, Student.name, Attendance.status,
+        Attendance.inside_count, Attendance.total_samples, Attendance.timestamp
+    ).join(Attendance, Attendance.session_id == Session.session_id).outerjoin(
+        Student, Student.id == Attendance.student_id
+    ), teacher_id, **filters).order_by(
+        *merge_order, Attendance.id
+    ).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    manual = _filtered(db.session.query(
+        *session_columns, ManualAttendance.roll_number, ManualAttendance.student_name,
+        ManualAttendance.remarks, ManualAttendance.timestamp
+    ).join(ManualAttendance, ManualAttendance.session_id == Session.session_id), teacher_id, **filters).order_by(
+        *merge_order, ManualAttendance.id
+    ).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    def attendance_rows():
+        for (*session, roll_number, name, status, inside_count, total_samples, timestamp) in attendance:
+            yield [*session, roll_number or 'N/A', name or 'Unknown', status, 'gps', inside_count, total_samples,
+                   '', timestamp.isoformat() if timestamp else '']
+
+    def manual_rows():
+        for (*session, roll_number, name, remarks, timestamp) in manual:
+            yield [*session, roll_number, name, 'Present', 'manual', '', '', remarks or '',
+                   timestamp.isoformat() if timestamp else '']
+
+    # Both inputs are already sorted by (class_date, start_time, session_id), by code point
+    return heapq.merge(attendance_rows(), manual_rows(), key=lambda row: (row[0], row[1], row[6]))
+
+
+class _LineBuffer:
+    """File-like target for csv.writer that just collects the text."""
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+
+    def take(self):
+        text = ''.join(self.parts)
+        self.parts, self.size = [], 0
+        return text
+
+
+def iter_csv(rows):
+    """CSV text of EXPORT_COLUMNS plus rows, in chunks of about CSV_CHUNK_BYTES."""
+    buffer = _LineBuffer()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.size >= CSV_CHUNK_BYTES:
+            yield buffer.take()
+    if buffer.size:
+        yield buffer.take()
+
+
+def xlsx_available():
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def write_xlsx(rows, chunk_size=CSV_CHUNK_BYTES):
+    """
+    Workbook of EXPORT_COLUMNS plus rows, as chunks of bytes. openpyxl's write-only
+    mode streams rows to a temporary file (a zip can only be sent once it is
+    complete), which is then read back in chunks: memory stays flat either way.
+    Needs openpyxl (in requirements.txt; see xlsx_available() for installs without it).
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Attendance')
+    sheet.append(EXPORT_COLUMNS)
+    for row in rows:
+        sheet.append(row)
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            chunk = output.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
@@ -0,0 +1,209 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from flask import current_app
+
+from extensions import db
+from models import Attendance, Session
+from utils import events
+from utils.session_counters import STATUS_COUNTERS, apply_session_deltas
+
+# Seconds a request waits for its row to be committed by the batcher
+WRITE_TIMEOUT_SECONDS = 30
+
+# Retry-After for a submission whose row was not committed in time
+RETRY_AFTER_SECONDS = 2
+
+
+class WriteTimeout(Exception):
+    """The batcher did not commit the row within WRITE_TIMEOUT_SECONDS. It may still commit it later."""
+
+
+class SessionNotFound(Exception):
+    """A row's session no longer exists (deleted, possibly by another worker, after it was cached)."""
+
+
+def _insert_statement(rows):
+    """INSERT ... ON CONFLICT (student_id, session_id) DO NOTHING RETURNING, for SQLite or Postgres."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return (
+        insert(Attendance)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=['student_id', 'session_id'])
+        .returning(Attendance.student_id, Attendance.session_id)
+    )
+
+
+def insert_attendance(rows):
+    """
+    Inserts attendance rows in the current transaction (the caller commits).
+    rows: List of dicts with Attendance column values.
+    Returns one result dict per row: {'status': ..., 'created': bool}. For a
+    (student_id, session_id) that already had attendance, 'status' is the stored
+    status and 'created' is False.
+
+    A single INSERT ... ON CONFLICT DO NOTHING does the work; the existing
+    status is only looked up for rows that actually conflicted.
+
+    Raises SessionNotFound if a row's session is gone. The check runs in the
+    write transaction because SQLite does not enforce the foreign key and the
+    callers' session cache may be stale in this worker.
+    """
+    # Two submissions of the same student in one batch: only the first one counts
+    unique_rows = {}
+    for row in rows:
+        unique_rows.setdefault((row['student_id'], row['session_id']), row)
+
+    session_ids = {key[1] for key in unique_rows}
+    found_sessions = db.session.query(Session.session_id).filter(Session.session_id.in_(session_ids)).all()
+    if len(found_sessions) < len(session_ids):
+        raise SessionNotFound()
+
+    statement = _insert_statement(list(unique_rows.values()))
+    inserted = {tuple(key) for key in db.session.execute(statement)}
+    
+    # Status counters and version of the affected sessions, same transaction
+    deltas = {}
+    for key in inserted:
+        counters = deltas.setdefault(key[1], {})
+        column = STATUS_COUNTERS.get(unique_rows[key]['status'])
+        if column is not None:
+            counters[column] = counters.get(column, 0) + 1
+    apply_session_deltas(deltas)
+
+    existing = {}
+    conflicts = [key for key in unique_rows if key not in inserted]
+    if conflicts:
+        found = db.session.query(Attendance.student_id, Attendance.session_id, Attendance.status).filter(
+            Attendance.student_id.in_({key[0] for key in conflicts}),
+            Attendance.session_id.in_({key[1] for key in conflicts})
+        ).all()
+        existing = {(student_id, session_id): status for student_id, session_id, status in found}
+
+    results = []
+    for row in rows:
+        key = (row['student_id'], row['session_id'])
+        if key in inserted and unique_rows[key] is row:
+            results.append({'status': row['status'], 'created': True})
+        elif key in inserted:
+            results.append({'status': unique_rows[key]['status'], 'created': False})
+        else:
+            results.append({'status': existing.get(key, row['status']), 'created': False})
+    return results
+
+
+class AttendanceWriteBatcher:
+    """
+    Group commit for attendance bursts.
+
+    Requests enqueue their row and block on a Future. A single writer thread
+    drains the queue and commits everything that arrived within max_wait_ms
+    (or max_rows rows) in one transaction, so at class start one fsync covers
+    a whole batch of students instead of one each. A Future resolves only
+    after its row is committed.
+    """
+
+    def __init__(self, app, max_rows=100, max_wait_ms=20):
+        self.app = app
+        self.max_rows = max_rows
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, row):
+        """Enqueues one attendance row. Returns a Future resolving to insert_attendance's result for it."""
+        future = Future()
+        self._ensure_started()
+        self._queue.put((row, future))
+        return future
+
+    def _ensure_started(self):
+        # Started lazily so forked gunicorn workers each get their own writer thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='attendance-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        with self.app.app_context():
+            try:
+                results = insert_attendance([row for row, _ in batch])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                # Retry row by row so one bad row does not fail everyone else in the batch
+                for row, future in batch:
+                    try:
+                        result = insert_attendance([row])[0]
+                        db.session.commit()
+                        future.set_result(result)
+                    except Exception as e:
+                        db.session.rollback()
+                        future.set_exception(e)
+                return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+def _announce(row, result):
+    if result['created']:
+        events.publish(
+            row['session_id'], 'attendance',
+            student_id=row['student_id'],
+            inside_count=row['inside_count'],
+            total_samples=row['total_samples'],
+            status=row['status']
+        )
+
+
+def save_attendance(row):
+    """
+    Writes one attendance row and returns once it is durable.
+    Goes through the group-commit batcher when ATTENDANCE_BATCH_MS is set, otherwise commits directly.
+    New rows are announced to the session's live view after the commit.
+    Raises WriteTimeout when the batcher has not committed the row in time; the
+    row is still announced if it commits later, and a retry then finds it.
+    """
+    batcher = current_app.extensions.get('attendance_batcher')
+    if batcher is None:
+        result = insert_attendance([row])[0]
+        db.session.commit()
+    else:
+        # End this request's read transaction first: it must not hold a pooled
+        # connection (or an SQLite read lock) while the writer thread commits
+        db.session.close()
+        future = batcher.submit(row)
+        try:
+            result = future.result(timeout=WRITE_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            def announce_late(done):
+                if done.exception() is None:
+                    _announce(row, done.result())
+            future.add_done_callback(announce_late)
+            raise WriteTimeout()
+
+    _announce(row, result)
+    return result
@@ -0,0 +1,182 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+# Pending events per subscriber before the slowest stream starts dropping them
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+# SSE streams send a comment this often so proxies keep the connection open
+STREAM_KEEPALIVE_SECONDS = 15
+
+# Streams end after this long; EventSource reconnects and the client resyncs
+STREAM_MAX_SECONDS = 5 * 60
+
+# Each open stream holds a gunicorn thread for up to STREAM_MAX_SECONDS: past this many
+# per process new streams are refused and the client polls the ETag'd snapshot instead
+MAX_STREAMS = 2
+
+
+def session_channel(session_id):
+    return f'session:{session_id}'
+
+
+class LocalBroker:
+    """
+    In-process pub/sub. Subscribers get a Queue of event dicts for one channel.
+    Only reaches streams served by this process (single gunicorn worker).
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def publish(self, channel, event):
+        self._deliver(channel, event)
+
+    def _deliver(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                pass  # Stalled client, it resyncs from a snapshot when it reconnects
+
+
+class SQLiteBroker(LocalBroker):
+    """
+    Pub/sub between several worker processes on one host through a shared SQLite file.
+    publish() appends to an events table; each process polls it and fans new rows
+    out to its own subscribers.
+    """
+
+    def __init__(self, path, poll_interval=0.25, retention_seconds=300):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self._local = threading.local()
+        self._poller = None
+        self._poller_lock = threading.Lock()
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS events ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, payload TEXT NOT NULL, created REAL NOT NULL)'
+        )
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def subscribe(self, channel):
+        self._ensure_poller()
+        return super().subscribe(channel)
+
+    def publish(self, channel, event):
+        try:
+            self._connection().execute(
+                'INSERT INTO events (channel, payload, created) VALUES (?, ?, ?)',
+                (channel, json.dumps(event), time.time())
+            )
+        except sqlite3.Error:
+            pass  # The write itself is committed; live views catch up on their next resync
+
+    def _ensure_poller(self):
+        # Started lazily so forked gunicorn workers each get their own poller
+        if self._poller is not None and self._poller.is_alive():
+            return
+        with self._poller_lock:
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll, name='event-broker', daemon=True)
+                self._poller.start()
+
+    def _poll(self):
+        connection = self._connection()
+        last_id = connection.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+        last_cleanup = time.monotonic()
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                rows = connection.execute(
+                    'SELECT id, channel, payload FROM events WHERE id > ? ORDER BY id', (last_id,)
+                ).fetchall()
+                for event_id, channel, payload in rows:
+                    last_id = event_id
+                    self._deliver(channel, json.loads(payload))
+
+                if time.monotonic() - last_cleanup > self.retention_seconds:
+                    connection.execute('DELETE FROM events WHERE created < ?', (time.time() - self.retention_seconds,))
+                    last_cleanup = time.monotonic()
+            except sqlite3.Error:
+                continue  # Locked or busy, try again next tick
+
+
+# Process-wide broker and stream slots, replaced by configure()
+broker = LocalBroker()
+_stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+
+def configure(url=None, max_streams=MAX_STREAMS):
+    """
+    Selects the broker: None or 'local' for in-process, 'sqlite:///path/events.db'
+    for several workers on one host. max_streams caps the open streams of this process.
+    """
+    global broker, _stream_slots
+    _stream_slots = threading.BoundedSemaphore(max_streams)
+    if url and url.startswith('sqlite:///'):
+        path = url[len('sqlite:///'):]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        broker = SQLiteBroker(path)
+    else:
+        broker = LocalBroker()
+    return broker
+
+
+def publish(session_id, event_type, **fields):
+    """Publishes one event for a session's live view. Call only after the change is committed."""
+    broker.publish(session_channel(session_id), {'type': event_type, 'session_id': session_id, **fields})
+
+
+def subscribe(session_id):
+    return broker.subscribe(session_channel(session_id))
+
+
+def unsubscribe(session_id, subscriber):
+    broker.unsubscribe(session_channel(session_id), subscriber)
+
+
+def try_open_stream():
+    """
+    Takes a stream slot without waiting. Returns a release function to call
+    exactly once when the stream closes, or None when every slot is in use.
+    """
+    slots = _stream_slots
+    if not slots.acquire(blocking=False):
+        return None
+    released = threading.Event()
+
+    def release():
+        if not released.is_set():
+            released.set()
+            slots.release()
+    return release
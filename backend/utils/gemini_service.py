@@ -1,48 +1,162 @@
-import google.generativeai as genai
 import os
+import time
+import types
+import functools
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+class _FakeResponse:
+    def __init__(self, text):
+        self.text = text
 
-def generate_attendance_report(attendance_data):
+class _FakeModel:
     """
-    Generate an intelligent report using Gemini AI based on attendance data.
-    
-    Args:
-        attendance_data: List of attendance records with student info, status, timestamps, etc.
-    
-    Returns:
-        dict: Report with summary, insights, and recommendations
+    Offline stand-in for genai.GenerativeModel (REPORT_LLM=fake): answers with a
+    fixed-format report built from the prompt's figures, after REPORT_LLM_FAKE_DELAY
+    seconds (default 0). A delay longer than the request timeout raises TimeoutError
+    once the timeout has passed, like the SDK's deadline.
     """
+    def __init__(self, model_name):
+        self.model_name = model_name
     
-    # Initialize Gemini model
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    
-    # Format attendance data for Gemini
-    data_summary = f"Total records: {len(attendance_data)}\n\n"
-    
-    # Calculate statistics
-    status_counts = {}
-    for record in attendance_data:
-        status = record.get('status', 'Unknown')
-        status_counts[status] = status_counts.get(status, 0) + 1
-    
-    data_summary += "Status Distribution:\n"
-    for status, count in status_counts.items():
-        data_summary += f"- {status}: {count}\n"
+    def generate_content(self, prompt, stream=False, request_options=None, **kwargs):
+        delay = float(os.getenv('REPORT_LLM_FAKE_DELAY', '0'))
+        timeout = (request_options or {}).get('timeout')
+        if timeout and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f'Deadline of {timeout}s exceeded')
+        time.sleep(delay)
+        
+        lines = prompt.split('\n')
+        total = next((line for line in lines if line.startswith('Total records:')), 'Total records: 0')
+        statuses = [line for line in lines if line.startswith('- ') and ':' in line and line[2:].split(':')[0] in
+                    ('Present', 'Late', 'Short', 'Invalid Attempt')]
+        text = f"## Brief Summary: Offline report. {total}.\n## Key Insights\n"
+        text += ''.join(f"{line}\n" for line in statuses) or "- No status data.\n"
+        text += "## Recommendations\n- Generated by the local fake model (REPORT_LLM=fake).\n"
+        if stream:
+            # Fixed-size chunks that split lines, like the real stream does
+            return [_FakeResponse(text[i:i + 16]) for i in range(0, len(text), 16)]
+        return _FakeResponse(text)
+
+@functools.lru_cache(maxsize=1)
+def _genai():
+    if os.getenv('REPORT_LLM') == 'fake':
+        return types.SimpleNamespace(GenerativeModel=_FakeModel)
     
-    data_summary += '\nDetailed Records:\n'
-    for i, record in enumerate(attendance_data[:50], 1):  # Limit to 50 records to avoid token limits
-        data_summary += f"{i}. Student: {record.get('student_name', 'Unknown')}, "
-        data_summary += f"Status: {record['status']}, "
-        data_summary += f"GPS Accuracy: {record['inside_count']}/{record['total_samples']} samples inside, "
-        data_summary += f"Date: {record.get('date', 'N/A')}\n"
+    # Imported on first use so the app starts without the SDK and tests can put
+    # a stub module in sys.modules['google.generativeai'] beforehand
+    import google.generativeai as genai
     
-    # Create the prompt for Gemini
-    prompt = f"""You are an intelligent attendance analysis assistant for a smart attendance system that uses GPS and QR codes.
+    # Configure Gemini API
+    genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+    return genai
+
+# Data section of the prompt, in estimated tokens. Students (worst attendance
+# first) and sessions (latest first) are listed until it is spent; the rest are
+# folded into one aggregate line each, so any history fits.
+PROMPT_TOKEN_BUDGET = 6000
+
+# Share of the budget students may take when sessions need the rest
+STUDENT_BUDGET_SHARE = 0.6
+
+# Subjects itemized in the aggregate line of sessions that were not listed
+MAX_ROLLUP_SUBJECTS = 10
+
+STATUS_KEYS = ['Present', 'Late', 'Short', 'Invalid Attempt']
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+def _fit_lines(lines, budget):
+    """The longest prefix of lines that fits in budget tokens, and the tokens it uses."""
+    used = 0
+    for count, line in enumerate(lines):
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            return lines[:count], used
+        used += cost
+    return lines, used
+
+def _status_totals(entries):
+    return ', '.join(f"{status[0]}{sum(e[status] for e in entries)}" for status in STATUS_KEYS)
+
+def _student_line(student):
+    return (f"{student['student_name']} ({student['roll_number']}): n={student['records']} "
+            f"P{student['Present']} L{student['Late']} S{student['Short']} I{student['Invalid Attempt']} "
+            f"GPS {student['inside_samples']}/{student['total_samples']}")
+
+def _student_rollup(students):
+    buckets = [0, 0, 0, 0]  # >=90%, 75-89%, 50-74%, <50% Present or Late
+    for student in students:
+        rate = (student['Present'] + student['Late']) / max(student['records'], 1)
+        buckets[0 if rate >= 0.9 else 1 if rate >= 0.75 else 2 if rate >= 0.5 else 3] += 1
+    inside = sum(s['inside_samples'] for s in students)
+    samples = sum(s['total_samples'] for s in students)
+    return (f"Other {len(students)} students (not listed): Present or Late in >=90% of sessions: {buckets[0]}, "
+            f"75-89%: {buckets[1]}, 50-74%: {buckets[2]}, <50%: {buckets[3]}; "
+            f"totals {_status_totals(students)}; GPS {inside}/{samples}")
+
+def _session_line(session):
+    return (f"{session['subject_name']} in {session['classroom_name']} on {session['class_date']} {session['start_time']}: "
+            f"n={session['records']} P{session['Present']} L{session['Late']} S{session['Short']} I{session['Invalid Attempt']}")
+
+def _session_rollup(sessions):
+    subjects = {}
+    for session in sessions:
+        subjects.setdefault(session['subject_name'], []).append(session)
+    ranked = sorted(subjects.items(), key=lambda item: -len(item[1]))
+    parts = [f"{name}: {len(group)} sessions, {_status_totals(group)}" for name, group in ranked[:MAX_ROLLUP_SUBJECTS]]
+    if len(ranked) > MAX_ROLLUP_SUBJECTS:
+        rest = [s for _, group in ranked[MAX_ROLLUP_SUBJECTS:] for s in group]
+        parts.append(f"{len(ranked) - MAX_ROLLUP_SUBJECTS} other subjects: {len(rest)} sessions, {_status_totals(rest)}")
+    return f"Other {len(sessions)} sessions (not listed): " + '; '.join(parts)
+
+def _budgeted_section(title, entries, line_for, rollup_for, budget):
+    """Section lines: as many entries as fit in budget tokens, then one aggregate line for the rest."""
+    lines = [line_for(entry) for entry in entries]
+    kept, used = _fit_lines(lines, budget)
+    if len(kept) < len(lines):
+        # Make room for the aggregate line
+        rollup = rollup_for(entries[len(kept):])
+        while kept and used + estimate_tokens(rollup) > budget:
+            used -= estimate_tokens(kept.pop())
+            rollup = rollup_for(entries[len(kept):])
+        kept = kept + [rollup]
+        used += estimate_tokens(rollup)
+    numbered = [f"{i}. {line}" for i, line in enumerate(kept, 1)]
+    return [title] + numbered, used
+
+def build_report_prompt(summary, token_budget=PROMPT_TOKEN_BUDGET):
+    """
+    Prompt for the attendance report from summarize_attendance() output. The
+    data section stays within token_budget (estimated) however long the history:
+    entries that do not fit are folded into per-section aggregates.
+    """
+    header = f"Total records: {summary['total_records']}\n"
+    if summary.get('first_date'):
+        header += f"Period: {summary['first_date']} to {summary['last_date']}\n"
+    header += "\nStatus Distribution:\n"
+    for status, count in summary['status_counts'].items():
+        header += f"- {status}: {count}\n"
+    header += "\nLegend: n = sessions/students, P/L/S/I = Present/Late/Short/Invalid Attempt, GPS = samples inside/total\n"
+
+    students, sessions = summary['students'], summary['sessions']
+    remaining = max(token_budget - estimate_tokens(header), 0)
+    session_need = sum(estimate_tokens(_session_line(s)) for s in sessions)
+    student_lines, used = _budgeted_section(
+        f"Per Student ({len(students)} students, lowest attendance first):", students, _student_line, _student_rollup,
+        remaining - min(session_need, int(remaining * (1 - STUDENT_BUDGET_SHARE)))
+    )
+    session_lines, _ = _budgeted_section(
+        f"Per Session ({len(sessions)} sessions, latest first):", sessions, _session_line, _session_rollup,
+        remaining - used
+    )
+    data_summary = header + '\n' + '\n'.join(student_lines) + '\n\n' + '\n'.join(session_lines) + '\n'
+
+    return f"""You are an intelligent attendance analysis assistant for a smart attendance system that uses GPS and QR codes.
 
 Analyze the following attendance data and provide:
 1. A brief summary (2-3 sentences)
@@ -51,83 +165,79 @@ Analyze the following attendance data and provide:
 
 Attendance Data:
 {data_summary}
-
 Note: 
 - "Present" means 8+ GPS samples were inside the geofence
 - "Late" means 5-7 samples were inside
 - "Short" means 2-4 samples were inside
 - "Invalid Attempt" means fewer than 2 samples were inside
 
-Provide your analysis in a structured format with clear sections."""
+Provide your analysis in a structured format with clear sections, in this order: Brief Summary, Key Insights, Recommendations."""
 
-    try:
-        # Generate response from Gemini
-        response = model.generate_content(prompt)
-        
-        # Parse the response
-        report_text = response.text
-        
-        # Improved parsing logic
-        sections = {
+class ReportParser:
+    """
+    Splits the model's text into summary / insights / recommendations one line
+    at a time, so sections can be relayed while the response is still streaming.
+    feed() returns (kind, text) for each piece it recognizes: kind is 'summary'
+    (text to append to the summary), 'insight' or 'recommendation'.
+    """
+    def __init__(self):
+        self.sections = {
             'summary': '',
             'insights': [],
             'recommendations': []
         }
+        self.current_section = None
+        self.lines = []
+    
+    def feed(self, line):
+        self.lines.append(line)
+        line = line.strip()
+        if not line:
+            return None
         
-        lines = report_text.split('\n')
-        current_section = None
+        # Skip markdown headers and detect sections
+        if line.startswith('###') or line.startswith('##'):
+            line = line.lstrip('#').strip()
         
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Skip markdown headers and detect sections
-            if line.startswith('###') or line.startswith('##'):
-                line = line.lstrip('#').strip()
-            
-            # Detect sections (more flexible matching)
-            lower_line = line.lower()
-            if 'brief summary' in lower_line or (current_section is None and 'summary' in lower_line and ':' in line):
-                current_section = 'summary'
-                # Extract summary if it's on the same line
-                if ':' in line:
-                    summary_text = line.split(':', 1)[1].strip()
-                    if summary_text:
-                        sections['summary'] = summary_text
-                continue
-            elif 'key insight' in lower_line or 'insights' in lower_line:
-                current_section = 'insights'
-                continue
-            elif 'recommendation' in lower_line or 'actionable' in lower_line:
-                current_section = 'recommendations'
-                continue
-            
-            # Add content to current section
-            if current_section == 'summary':
-                # Continue building summary
-                if not line.startswith('*') and not line.startswith('-') and not line[0:2].isdigit():
-                    sections['summary'] += ' ' + line
-            elif current_section == 'insights':
-                # Extract bullet points
-                if line.startswith('*') or line.startswith('-') or line.startswith('+'):
-                    clean_line = line.lstrip('*-+ ').strip()
-                    if clean_line:
-                        sections['insights'].append(clean_line)
-                elif line[0:2].replace('.', '').isdigit():  # Numbered list
-                    clean_line = line.split('.', 1)[1].strip() if '.' in line else line[2:].strip()
-                    if clean_line:
-                        sections['insights'].append(clean_line)
-            elif current_section == 'recommendations':
-                # Extract bullet points
-                if line.startswith('*') or line.startswith('-') or line.startswith('+'):
-                    clean_line = line.lstrip('*-+ ').strip()
-                    if clean_line:
-                        sections['recommendations'].append(clean_line)
-                elif line[0:2].replace('.', '').isdigit():  # Numbered list
-                    clean_line = line.split('.', 1)[1].strip() if '.' in line else line[2:].strip()
-                    if clean_line:
-                        sections['recommendations'].append(clean_line)
+        # Detect sections (more flexible matching)
+        lower_line = line.lower()
+        if 'brief summary' in lower_line or (self.current_section is None and 'summary' in lower_line and ':' in line):
+            self.current_section = 'summary'
+            # Extract summary if it's on the same line
+            if ':' in line:
+                summary_text = line.split(':', 1)[1].strip()
+                if summary_text:
+                    self.sections['summary'] = summary_text
+                    return 'summary', summary_text
+            return None
+        elif 'key insight' in lower_line or 'insights' in lower_line:
+            self.current_section = 'insights'
+            return None
+        elif 'recommendation' in lower_line or 'actionable' in lower_line:
+            self.current_section = 'recommendations'
+            return None
+        
+        # Add content to current section
+        if self.current_section == 'summary':
+            # Continue building summary
+            if not line.startswith('*') and not line.startswith('-') and not line[0:2].isdigit():
+                self.sections['summary'] += ' ' + line
+                return 'summary', ' ' + line
+        elif self.current_section in ('insights', 'recommendations'):
+            clean_line = None
+            # Extract bullet points
+            if line.startswith('*') or line.startswith('-') or line.startswith('+'):
+                clean_line = line.lstrip('*-+ ').strip()
+            elif line[0:2].replace('.', '').isdigit():  # Numbered list
+                clean_line = line.split('.', 1)[1].strip() if '.' in line else line[2:].strip()
+            if clean_line:
+                self.sections[self.current_section].append(clean_line)
+                return self.current_section[:-1], clean_line
+        return None
+    
+    def report(self):
+        """The finished report, with fallbacks for sections the model left out."""
+        sections = dict(self.sections)
         
         # Clean up summary
         sections['summary'] = sections['summary'].strip()
@@ -148,20 +258,90 @@ Provide your analysis in a structured format with clear sections."""
                 "Continue monitoring attendance patterns regularly."
             ]
         
-        sections['raw_response'] = report_text
+        sections['raw_response'] = '\n'.join(self.lines)
+        return sections
+
+def _failed(error):
+    return {
+        'success': False,
+        'error': str(error),
+        'report': {
+            'summary': 'Failed to generate AI report.',
+            'insights': ['Error occurred while processing attendance data.'],
+            'recommendations': ['Please try again later.']
+        }
+    }
+
+def generate_attendance_report(summary, timeout=None):
+    """
+    Generate an intelligent report using Gemini AI based on attendance data.
+    
+    Args:
+        summary: Pre-aggregated attendance (utils.report_data.summarize_attendance):
+                 status counts plus per-student and per-session totals
+        timeout: Seconds before the Gemini call is abandoned (None = SDK default)
+    
+    Returns:
+        dict: Report with summary, insights, and recommendations
+    """
+    prompt = build_report_prompt(summary)
+    
+    try:
+        # Initialize Gemini model
+        model = _genai().GenerativeModel('gemini-2.5-flash')
+        
+        # Generate response from Gemini
+        request_options = {'timeout': timeout} if timeout else None
+        response = model.generate_content(prompt, request_options=request_options)
+        
+        parser = ReportParser()
+        for line in response.text.split('\n'):
+            parser.feed(line)
         
         return {
             'success': True,
-            'report': sections
+            'report': parser.report()
         }
         
     except Exception as e:
-        return {
-            'success': False,
-            'error': str(e),
-            'report': {
-                'summary': 'Failed to generate AI report.',
-                'insights': ['Error occurred while processing attendance data.'],
-                'recommendations': ['Please try again later.']
-            }
-        }
+        return _failed(e)
+
+def stream_attendance_report(summary, timeout=None):
+    """
+    Same report as generate_attendance_report, streamed: Gemini is called with
+    stream=True and every section piece is yielded as soon as its line is complete.
+    
+    Yields dicts:
+        {'type': 'summary', 'text': ...}         text to append to the summary
+        {'type': 'insight' | 'recommendation', 'text': ...}
+    and finally exactly one of
+        {'type': 'done', 'result': <generate_attendance_report result>}
+        {'type': 'error', 'result': <failed result>}
+    """
+    prompt = build_report_prompt(summary)
+    parser = ReportParser()
+    
+    try:
+        model = _genai().GenerativeModel('gemini-2.5-flash')
+        request_options = {'timeout': timeout} if timeout else None
+        response = model.generate_content(prompt, stream=True, request_options=request_options)
+        
+        # Chunks end mid-line: parse only complete lines, keep the tail for the next chunk
+        pending = ''
+        for chunk in response:
+            pending += chunk.text
+            *complete, pending = pending.split('\n')
+            for line in complete:
+                piece = parser.feed(line)
+                if piece:
+                    yield {'type': piece[0], 'text': piece[1]}
+        if pending:
+            piece = parser.feed(pending)
+            if piece:
+                yield {'type': piece[0], 'text': piece[1]}
+        
+    except Exception as e:
+        yield {'type': 'error', 'result': _failed(e)}
+        return
+    
+    yield {'type': 'done', 'result': {'success': True, 'report': parser.report()}}
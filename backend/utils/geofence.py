@@ -1,67 +1,240 @@
 import json
+import threading
+from collections import OrderedDict
 
-def is_inside_polygon(lat, lng, polygon_geojson):
+import numpy as np
+
+from utils import geofence_audit
+
+# Maximum number of compiled polygons kept in memory (one per live session)
+POLYGON_CACHE_SIZE = 256
+
+# Samples reported with a worse GPS accuracy (in meters) are ignored
+MAX_ACCURACY_METERS = 2000
+
+# Upper bound on points x edges evaluated at once by the batch engine
+BATCH_CELLS = 1_000_000
+
+_polygon_cache = OrderedDict()  # session_id -> (polygon_geojson, CompiledPolygon)
+_polygon_cache_lock = threading.Lock()
+
+
+class CompiledPolygon:
     """
-    Checks if a point (lat, lng) is inside a polygon defined by GeoJSON using Ray Casting algorithm.
-    polygon_geojson: A JSON string representing a list of [lat, lng] points.
+    A polygon parsed once and prepared for repeated point-in-polygon tests.
+    Holds the vertices, per-edge ray casting data and a bounding box used to
+    reject far away points without walking the edges.
     """
-    try:
-        # Expecting polygon_geojson to be a list of coordinates [[lat, lng], ...]
-        poly = json.loads(polygon_geojson)
-        
-        # Ray casting algorithm
-        # x = lat, y = lng
-        n = len(poly)
+    __slots__ = ('vertices', 'edges', 'edge_arrays', 'min_lat', 'max_lat', 'min_lng', 'max_lng')
+
+    def __init__(self, vertices):
+        if len(vertices) < 3:
+            raise ValueError("Polygon needs at least 3 vertices")
+
+        self.vertices = [(float(lat), float(lng)) for lat, lng in vertices]
+
+        lats = [p[0] for p in self.vertices]
+        lngs = [p[1] for p in self.vertices]
+        self.min_lat, self.max_lat = min(lats), max(lats)
+        self.min_lng, self.max_lng = min(lngs), max(lngs)
+
+        # Each edge: (min_lng, max_lng, max_lat, p1_lat, p1_lng, d_lat, d_lng)
+        # The slope is kept as its two components so intersections round exactly
+        # like the original (lng - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
+        self.edges = []
+        n = len(self.vertices)
+        for i in range(n):
+            p1x, p1y = self.vertices[i]
+            p2x, p2y = self.vertices[(i + 1) % n]
+            if p1y == p2y:
+                # Horizontal edges can never satisfy min_lng < lng <= max_lng
+                continue
+            self.edges.append((min(p1y, p2y), max(p1y, p2y), max(p1x, p2x), p1x, p1y, p2x - p1x, p2y - p1y))
+
+        # Same edge table as columns, shaped (1, E) to broadcast against (N, 1) points
+        columns = np.array(self.edges, dtype=np.float64).reshape(-1, 7).T
+        self.edge_arrays = tuple(col.reshape(1, -1) for col in columns)
+
+    def contains(self, lat, lng):
+        """Ray casting test. x = lat, y = lng (same convention as is_inside_polygon)."""
+        if lat < self.min_lat or lat > self.max_lat or lng < self.min_lng or lng > self.max_lng:
+            return False
+
         inside = False
-        p1x, p1y = poly[0]
-        for i in range(n + 1):
-            p2x, p2y = poly[i % n]
-            if lng > min(p1y, p2y):
-                if lng <= max(p1y, p2y):
-                    if lat <= max(p1x, p2x):
-                        if p1y != p2y:
-                            xinters = (lng - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                        if p1x == p2x or lat <= xinters:
-                            inside = not inside
-            p1x, p1y = p2x, p2y
-            
+        for min_y, max_y, max_x, p1x, p1y, dx, dy in self.edges:
+            if min_y < lng <= max_y and lat <= max_x:
+                if dx == 0 or lat <= (lng - p1y) * dx / dy + p1x:
+                    inside = not inside
         return inside
-    except Exception as e:
-        print(f"Geofence Error: {e}")
+
+    def contains_many(self, lat, lng):
+        """
+        Vectorized ray casting for arrays of points. Returns a boolean array.
+        Every point is tested against every edge at once (in chunks to bound memory).
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        result = np.zeros(lat.shape, dtype=bool)
+
+        # Bounding box quick reject, only candidates go through the edge test
+        candidates = np.flatnonzero(
+            (lat >= self.min_lat) & (lat <= self.max_lat) &
+            (lng >= self.min_lng) & (lng <= self.max_lng)
+        )
+        if candidates.size == 0:
+            return result
+
+        min_y, max_y, max_x, p1x, p1y, dx, dy = self.edge_arrays
+        chunk = max(1, BATCH_CELLS // max(1, len(self.edges)))
+        for start in range(0, candidates.size, chunk):
+            idx = candidates[start:start + chunk]
+            x = lat[idx].reshape(-1, 1)
+            y = lng[idx].reshape(-1, 1)
+            crossings = (min_y < y) & (y <= max_y) & (x <= max_x)
+            crossings &= (dx == 0) | (x <= (y - p1y) * dx / dy + p1x)
+            result[idx] = (np.count_nonzero(crossings, axis=1) % 2) == 1
+        return result
+
+
+def compile_polygon(polygon_geojson):
+    """
+    Parses a polygon GeoJSON string (list of [lat, lng] points) into a CompiledPolygon.
+    Raises ValueError if the polygon cannot be parsed.
+    """
+    try:
+        return CompiledPolygon(json.loads(polygon_geojson))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid polygon: {e}")
+
+
+def get_compiled_polygon(session_id, polygon_geojson):
+    """
+    Returns the CompiledPolygon for a session, parsing Session.polygon only on a cache miss.
+    Entries are keyed by session_id and re-parsed if the stored polygon text changed.
+    """
+    with _polygon_cache_lock:
+        entry = _polygon_cache.get(session_id)
+        if entry is not None and entry[0] == polygon_geojson:
+            _polygon_cache.move_to_end(session_id)
+            return entry[1]
+
+    compiled = compile_polygon(polygon_geojson)
+
+    with _polygon_cache_lock:
+        _polygon_cache[session_id] = (polygon_geojson, compiled)
+        _polygon_cache.move_to_end(session_id)
+        while len(_polygon_cache) > POLYGON_CACHE_SIZE:
+            _polygon_cache.popitem(last=False)
+
+    return compiled
+
+
+def evict_polygon(session_id):
+    """Drops a session's compiled polygon from the cache (e.g. when the session is deleted)."""
+    with _polygon_cache_lock:
+        _polygon_cache.pop(session_id, None)
+
+
+def _as_compiled(polygon):
+    """Accepts either a CompiledPolygon or a GeoJSON string. Returns None if it cannot be parsed."""
+    if isinstance(polygon, CompiledPolygon):
+        return polygon
+    try:
+        return compile_polygon(polygon)
+    except ValueError as e:
+        geofence_audit.warning('geofence_invalid_polygon', error=str(e))
+        return None
+
+
+def samples_to_arrays(samples):
+    """
+    Converts a list of sample dicts into (lat, lng, accuracy) float arrays.
+    Missing accuracy defaults to 999 like the original per-sample check.
+    """
+    n = len(samples)
+    lat = np.fromiter((s['latitude'] for s in samples), dtype=np.float64, count=n)
+    lng = np.fromiter((s['longitude'] for s in samples), dtype=np.float64, count=n)
+    accuracy = np.fromiter((s.get('accuracy', 999) for s in samples), dtype=np.float64, count=n)
+    return lat, lng, accuracy
+
+
+def evaluate_samples(lat, lng, accuracy, polygon):
+    """
+    Batch geofence check for sample arrays.
+    Returns (valid_mask, inside_mask): samples failing the accuracy filter are
+    never inside, and an unparsable polygon (None) contains nothing.
+    """
+    valid = np.asarray(accuracy, dtype=np.float64) <= MAX_ACCURACY_METERS
+    inside = np.zeros(valid.shape, dtype=bool)
+    if polygon is not None and valid.any():
+        idx = np.flatnonzero(valid)
+        inside[idx] = polygon.contains_many(np.asarray(lat)[idx], np.asarray(lng)[idx])
+    return valid, inside
+
+
+def count_inside_arrays(array_sets, polygon_geojson):
+    """
+    Scores many sample sets given as (lat, lng, accuracy) arrays against one polygon in a single pass.
+    Returns a list of (inside_count, valid_samples) tuples, one per set.
+    """
+    polygon = _as_compiled(polygon_geojson)
+    sizes = np.fromiter((len(a[0]) for a in array_sets), dtype=np.int64, count=len(array_sets))
+    if sizes.sum() == 0:
+        return [(0, 0) for _ in array_sets]
+
+    lat, lng, accuracy = (np.concatenate([a[k] for a in array_sets]) for k in range(3))
+    valid, inside = evaluate_samples(lat, lng, accuracy, polygon)
+
+    # Sum the per-sample masks back into their owning sample set
+    owner = np.repeat(np.arange(len(array_sets)), sizes)
+    inside_counts = np.bincount(owner, weights=inside, minlength=len(array_sets))
+    valid_counts = np.bincount(owner, weights=valid, minlength=len(array_sets))
+    return [(int(i), int(v)) for i, v in zip(inside_counts, valid_counts)]
+
+
+def count_inside_batch(sample_sets, polygon_geojson):
+    """
+    Scores many students' sample sets against one polygon in a single pass.
+    sample_sets: List of sample lists (each a list of {latitude, longitude, accuracy, ...} dicts)
+    Returns a list of (inside_count, valid_samples) tuples, one per sample set.
+    """
+    return count_inside_arrays([samples_to_arrays(samples) for samples in sample_sets], polygon_geojson)
+
+
+def determine_status(inside_count):
+    """Maps the number of samples inside the geofence to an attendance status."""
+    if inside_count >= 8:
+        return "Present"
+    if 5 <= inside_count <= 7:
+        return "Late"
+    if 2 <= inside_count <= 4:
+        return "Short"
+    return "Invalid Attempt"
+
+
+def is_inside_polygon(lat, lng, polygon_geojson):
+    """
+    Checks if a point (lat, lng) is inside a polygon defined by GeoJSON using Ray Casting algorithm.
+    polygon_geojson: A JSON string representing a list of [lat, lng] points, or a CompiledPolygon.
+    """
+    polygon = _as_compiled(polygon_geojson)
+    if polygon is None:
         return False
+    return polygon.contains(lat, lng)
 
-def calculate_inside_count(samples, polygon_geojson):
+def calculate_inside_count(samples, polygon_geojson, audit_context=None):
     """
     Calculates how many samples are inside the polygon.
     samples: List of dicts {latitude, longitude, accuracy, timestamp}
+    polygon_geojson: GeoJSON string or a CompiledPolygon (see get_compiled_polygon)
+    audit_context: Optional dict (e.g. session_id, student_id) attached to the audit record
     """
-    inside_count = 0
-    valid_samples = 0
-    
-    print(f"\n=== GEOFENCE CHECK ===")
-    print(f"Polygon: {polygon_geojson[:100]}...")
-    print(f"Total samples received: {len(samples)}")
-    
-    for i, sample in enumerate(samples):
-        accuracy = sample.get('accuracy', 999)
-        lat = sample['latitude']
-        lng = sample['longitude']
-        
-        # Basic accuracy check (relaxed for testing)
-        if accuracy > 2000:
-            print(f"Sample {i+1}: REJECTED - Accuracy {accuracy}m > 100m")
-            continue
-            
-        valid_samples += 1
-        is_inside = is_inside_polygon(lat, lng, polygon_geojson)
-        
-        if is_inside:
-            inside_count += 1
-            print(f"Sample {i+1}: ✅ INSIDE ({lat}, {lng}) accuracy={accuracy}m")
-        else:
-            print(f"Sample {i+1}: ❌ OUTSIDE ({lat}, {lng}) accuracy={accuracy}m")
-    
-    print(f"\nRESULT: {inside_count}/{valid_samples} samples inside polygon")
-    print(f"=== END GEOFENCE CHECK ===\n")
-            
-    return inside_count, valid_samples
+    polygon = _as_compiled(polygon_geojson)
+
+    lat, lng, accuracy = samples_to_arrays(samples)
+    valid, inside = evaluate_samples(lat, lng, accuracy, polygon)
+
+    if geofence_audit.enabled():
+        geofence_audit.record_check(polygon, lat, lng, accuracy, valid, inside, audit_context)
+
+    return int(np.count_nonzero(inside)), int(np.count_nonzero(valid))
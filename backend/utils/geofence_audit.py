@@ -0,0 +1,148 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+from collections import deque
+
+# Structured audit channel for geofence checks.
+# Off by default (level WARNING): nothing is formatted or written on the
+# submission path unless GEOFENCE_AUDIT_LEVEL is lowered to INFO or DEBUG.
+#   INFO  -> one record per check (counts only)
+#   DEBUG -> one record per check including every sample and its verdict
+# Records go to a bounded in-memory ring buffer and, optionally, to a JSON
+# lines file written by a background thread (QueueHandler + QueueListener).
+
+logger = logging.getLogger('geofence.audit')
+logger.propagate = False
+logger.setLevel(logging.WARNING)
+
+_sample_rate = 1.0
+_ring = None
+_listener = None
+_config_lock = threading.Lock()
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last `capacity` audit records in memory as dicts."""
+
+    def __init__(self, capacity=1000):
+        super().__init__()
+        self.records = deque(maxlen=capacity)
+
+    def emit(self, record):
+        self.records.append(_to_event(record))
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(_to_event(record), default=str)
+
+
+def _to_event(record):
+    event = {
+        'time': record.created,
+        'level': record.levelname,
+        'event': record.getMessage(),
+    }
+    event.update(getattr(record, 'audit', {}))
+    return event
+
+
+def configure(level='WARNING', sample_rate=1.0, buffer_size=1000, log_file=None):
+    """
+    (Re)configures the audit channel.
+    level: logging level name or number
+    sample_rate: fraction (0..1) of checks recorded at INFO/DEBUG; warnings are never sampled out
+    buffer_size: capacity of the in-memory ring buffer
+    log_file: optional path, written asynchronously as JSON lines
+    """
+    global _sample_rate, _ring, _listener
+
+    with _config_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+
+        _sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        logger.setLevel(level.upper() if isinstance(level, str) else level)
+
+        _ring = RingBufferHandler(buffer_size)
+        logger.addHandler(_ring)
+
+        if log_file:
+            file_handler = logging.FileHandler(log_file)
+            file_handler.setFormatter(JsonLinesFormatter())
+            log_queue = queue.SimpleQueue()
+            logger.addHandler(logging.handlers.QueueHandler(log_queue))
+            _listener = logging.handlers.QueueListener(log_queue, file_handler)
+            _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+atexit.register(_stop_listener)
+
+
+def enabled():
+    """True if geofence checks should be recorded at all (cheap level check)."""
+    return logger.isEnabledFor(logging.INFO)
+
+
+def sampled():
+    """Per-check sampling decision so that all samples of one check are kept or dropped together."""
+    return _sample_rate >= 1.0 or random.random() < _sample_rate
+
+
+def record_check(polygon, lat, lng, accuracy, valid, inside, context=None):
+    """
+    Records one geofence check. The caller should only invoke this when enabled() is True.
+    lat/lng/accuracy/valid/inside are the per-sample arrays from geofence.evaluate_samples.
+    """
+    if not sampled():
+        return
+
+    audit = dict(context or {})
+    audit.update({
+        'total_samples': len(lat),
+        'valid_samples': int(valid.sum()),
+        'inside_count': int(inside.sum()),
+        'polygon_vertices': len(polygon.vertices) if polygon is not None else 0,
+    })
+
+    if logger.isEnabledFor(logging.DEBUG):
+        audit['samples'] = [
+            {
+                'latitude': float(lat[i]),
+                'longitude': float(lng[i]),
+                'accuracy': float(accuracy[i]),
+                'result': 'inside' if inside[i] else ('outside' if valid[i] else 'rejected'),
+            }
+            for i in range(len(lat))
+        ]
+        logger.debug('geofence_check', extra={'audit': audit})
+    else:
+        logger.info('geofence_check', extra={'audit': audit})
+
+
+def warning(event, **fields):
+    logger.warning(event, extra={'audit': fields})
+
+
+def recent_events(limit=100):
+    """Returns up to `limit` most recent audit events from the ring buffer (oldest first)."""
+    if _ring is None:
+        return []
+    events = list(_ring.records)
+    return events[-limit:] if limit else events
+
+
+configure()
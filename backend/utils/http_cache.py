@@ -0,0 +1,29 @@
+import hashlib
+
+from flask import request, make_response, jsonify
+
+# Browsers keep the body but must revalidate with If-None-Match on every request
+CACHE_CONTROL = 'private, no-cache'
+
+
+def make_etag(*parts):
+    """Strong ETag value from the parts that identify a response's content (user, versions, ...)."""
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()[:24]
+
+
+def not_modified(etag):
+    """Returns a 304 response if the client already has this ETag, else None."""
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        return response
+    return None
+
+
+def etag_json(payload, etag):
+    """jsonify(payload) with the ETag and revalidation headers set."""
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
@@ -0,0 +1,39 @@
+import os
+import sys
+
+# Run from backend/ imports: utils/token.py must not shadow the stdlib token module
+sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from app import create_app
+from extensions import db
+
+def migrate_attendance_unique():
+    """
+    Adds the (student_id, session_id) unique index on attendance.
+    Works on both SQLite and Postgres. Duplicate rows from before the index
+    existed are removed first, keeping the earliest submission.
+    """
+    app = create_app()
+
+    with app.app_context():
+        try:
+            result = db.session.execute(text(
+                "DELETE FROM attendance WHERE id NOT IN "
+                "(SELECT MIN(id) FROM attendance GROUP BY student_id, session_id)"
+            ))
+            print(f"Removed {result.rowcount} duplicate attendance rows.")
+
+            db.session.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ix_attendance_student_session "
+                "ON attendance (student_id, session_id)"
+            ))
+            db.session.commit()
+            print("Migration completed successfully.")
+
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrate_attendance_unique()
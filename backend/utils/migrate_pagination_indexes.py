@@ -0,0 +1,41 @@
+import os
+import sys
+
+# Run from backend/ imports: utils/token.py must not shadow the stdlib token module
+sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from app import create_app
+from extensions import db
+
+def migrate_pagination_indexes():
+    """
+    Adds the (timestamp, id) indexes behind the paginated history, recent-sessions
+    and notifications endpoints. Works on both SQLite and Postgres.
+    """
+    app = create_app()
+
+    with app.app_context():
+        try:
+            table = db.engine.dialect.identifier_preparer.quote('session')
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_attendance_student_timestamp "
+                "ON attendance (student_id, timestamp, id)"
+            ))
+            db.session.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_session_teacher_starts "
+                f"ON {table} (teacher_id, starts_at, session_id)"
+            ))
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_notification_created "
+                "ON notification (created_at, id)"
+            ))
+            db.session.commit()
+            print("Migration completed successfully.")
+
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrate_pagination_indexes()
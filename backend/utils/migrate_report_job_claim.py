@@ -0,0 +1,39 @@
+import os
+import sys
+
+# Run from backend/ imports: utils/token.py must not shadow the stdlib token module
+sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+from app import create_app
+from extensions import db
+
+def migrate_report_job_claim():
+    """
+    Adds report_job.owner, heartbeat_at and active_key plus the unique index on
+    active_key that report job claiming and de-duplication rely on (SQLite and Postgres).
+    Existing queued / running jobs keep a NULL active_key and are resumed as stale.
+    """
+    app = create_app()
+
+    with app.app_context():
+        try:
+            columns = [c['name'] for c in inspect(db.engine).get_columns('report_job')]
+            for name, ddl in [('owner', 'VARCHAR(64)'), ('heartbeat_at', 'TIMESTAMP'), ('active_key', 'VARCHAR(150)')]:
+                if name not in columns:
+                    print(f"Adding '{name}' column...")
+                    db.session.execute(text(f"ALTER TABLE report_job ADD COLUMN {name} {ddl}"))
+                else:
+                    print(f"'{name}' column already exists.")
+            db.session.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ux_report_job_active_key ON report_job (active_key)"
+            ))
+            db.session.commit()
+            print("Migration completed successfully.")
+
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrate_report_job_claim()
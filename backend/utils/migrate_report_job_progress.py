@@ -0,0 +1,32 @@
+import os
+import sys
+
+# Run from backend/ imports: utils/token.py must not shadow the stdlib token module
+sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+from app import create_app
+from extensions import db
+
+def migrate_report_job_progress():
+    """Adds report_job.progress_json, the report sections a running job has written so far (SQLite and Postgres)."""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            columns = [c['name'] for c in inspect(db.engine).get_columns('report_job')]
+            if 'progress_json' not in columns:
+                print("Adding 'progress_json' column...")
+                db.session.execute(text("ALTER TABLE report_job ADD COLUMN progress_json TEXT"))
+                db.session.commit()
+            else:
+                print("'progress_json' column already exists.")
+
+            print("Migration completed successfully.")
+
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrate_report_job_progress()
@@ -0,0 +1,33 @@
+import os
+import sys
+
+# Run from backend/ imports: utils/token.py must not shadow the stdlib token module
+sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from app import create_app
+from extensions import db
+
+def migrate_roster():
+    """
+    Creates the roster_entry table (create_app's create_all) and adds the
+    manual_attendance (session_id, roll_number) index the absentee query uses.
+    Works on both SQLite and Postgres.
+    """
+    app = create_app()
+
+    with app.app_context():
+        try:
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_manual_attendance_session_roll "
+                "ON manual_attendance (session_id, roll_number)"
+            ))
+            db.session.commit()
+            print("Migration completed successfully.")
+
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrate_roster()
@@ -0,0 +1,67 @@
+import os
+import sys
+
+# Run from backend/ imports: utils/token.py must not shadow the stdlib token module
+sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text, update
+from app import create_app
+from extensions import db
+from models import Attendance
+from utils.sample_codec import encode_samples
+import json
+
+CHUNK_SIZE = 1000
+
+def migrate_sample_blob(convert=False):
+    """
+    Adds attendance.samples_blob (SQLite and Postgres).
+    With convert=True, existing samples_json rows are re-encoded into the compact format.
+    Rows whose samples cannot be encoded keep their JSON.
+    """
+    app = create_app()
+
+    with app.app_context():
+        try:
+            columns = [c['name'] for c in inspect(db.engine).get_columns('attendance')]
+            if 'samples_blob' not in columns:
+                print("Adding 'samples_blob' column...")
+                column_type = db.LargeBinary().compile(dialect=db.engine.dialect)
+                db.session.execute(text(f"ALTER TABLE attendance ADD COLUMN samples_blob {column_type}"))
+                db.session.commit()
+
+            if convert:
+                converted = 0
+                last_id = 0
+                while True:
+                    rows = db.session.query(Attendance.id, Attendance.samples_json).filter(
+                        Attendance.id > last_id,
+                        Attendance.samples_blob.is_(None),
+                        Attendance.samples_json.isnot(None)
+                    ).order_by(Attendance.id).limit(CHUNK_SIZE).all()
+                    if not rows:
+                        break
+                    last_id = rows[-1][0]
+
+                    updates = []
+                    for attendance_id, samples_json in rows:
+                        try:
+                            blob = encode_samples(json.loads(samples_json))
+                        except ValueError:
+                            blob = None
+                        if blob is not None:
+                            updates.append({'id': attendance_id, 'samples_blob': blob, 'samples_json': None})
+                    if updates:
+                        db.session.execute(update(Attendance), updates)
+                        db.session.commit()
+                        converted += len(updates)
+                print(f"Converted {converted} rows to the compact sample format.")
+
+            print("Migration completed successfully.")
+
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrate_sample_blob(convert='--convert' in sys.argv)
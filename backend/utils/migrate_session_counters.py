@@ -0,0 +1,35 @@
+import os
+import sys
+
+# Run from backend/ imports: utils/token.py must not shadow the stdlib token module
+sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+from app import create_app
+from extensions import db
+from utils.session_counters import COUNTER_COLUMNS, rebuild_session_counters
+
+def migrate_session_counters():
+    """Adds the per-status counter columns to session and fills them from the existing attendance."""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            columns = [c['name'] for c in inspect(db.engine).get_columns('session')]
+            table = db.engine.dialect.identifier_preparer.quote('session')
+            for column in COUNTER_COLUMNS:
+                if column not in columns:
+                    print(f"Adding '{column}' column...")
+                    db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"))
+            db.session.commit()
+
+            corrected = rebuild_session_counters()
+            print(f"Counters filled for {corrected} sessions.")
+            print("Migration completed successfully.")
+
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrate_session_counters()
@@ -0,0 +1,33 @@
+import os
+import sys
+
+# Run from backend/ imports: utils/token.py must not shadow the stdlib token module
+sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+from app import create_app
+from extensions import db
+
+def migrate_session_version():
+    """Adds session.version, the change counter behind the attendance ETags (SQLite and Postgres)."""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            columns = [c['name'] for c in inspect(db.engine).get_columns('session')]
+            if 'version' not in columns:
+                print("Adding 'version' column...")
+                table = db.engine.dialect.identifier_preparer.quote('session')
+                db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+                db.session.commit()
+            else:
+                print("'version' column already exists.")
+
+            print("Migration completed successfully.")
+
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrate_session_version()
@@ -0,0 +1,75 @@
+import base64
+import datetime
+import json
+
+from flask import request
+from sqlalchemy import or_, and_
+
+# Page sizes when the client sends no limit, and the most it may ask for
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Response header carrying the next cursor on endpoints that return a bare JSON list
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def encode_cursor(timestamp, row_id):
+    """Opaque cursor for the position after (timestamp, row_id). timestamp may be None (a NULL row)."""
+    raw = json.dumps([timestamp.isoformat() if timestamp is not None else None, row_id],
+                     separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(timestamp, row_id) from encode_cursor(). Raises ValueError for anything else."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(timestamp) if timestamp is not None else None, row_id
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def page_args(default_limit=DEFAULT_PAGE_SIZE, max_limit=MAX_PAGE_SIZE):
+    """
+    (limit, after) from the request's ?limit= and ?cursor= arguments; after is
+    None on the first page. Raises ValueError with a client-facing message.
+    """
+    try:
+        limit = int(request.args.get('limit', default_limit))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+
+    cursor = request.args.get('cursor')
+    return min(limit, max_limit), decode_cursor(cursor) if cursor else None
+
+
+def keyset_page(query, timestamp_column, id_column, limit, after=None, key=None):
+    """
+    One page of query, newest first, by keyset on (timestamp, id): the rows
+    strictly after the `after` position, so each page is an index range scan
+    however deep it is. Rows with a NULL timestamp come last on both SQLite and
+    Postgres, ordered by id; their cursor carries None as the timestamp.
+    key(row) -> (timestamp, id) defaults to the two columns' names.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    if after is not None:
+        after_timestamp, after_id = after
+        if after_timestamp is None:
+            query = query.filter(timestamp_column.is_(None), id_column < after_id)
+        else:
+            query = query.filter(or_(
+                timestamp_column < after_timestamp,
+                and_(timestamp_column == after_timestamp, id_column < after_id),
+                timestamp_column.is_(None)
+            ))
+    rows = query.order_by(timestamp_column.desc().nulls_last(), id_column.desc()).limit(limit + 1).all()
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    if key is None:
+        key = lambda row: (getattr(row, timestamp_column.key), getattr(row, id_column.key))
+    return rows, encode_cursor(*key(rows[-1]))
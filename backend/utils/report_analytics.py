@@ -0,0 +1,232 @@
+import datetime
+
+import numpy as np
+from sqlalchemy import select
+
+from extensions import db
+from models import Session, Attendance, Student
+
+# Same status codes for every array below
+STATUSES = ['Present', 'Late', 'Short', 'Invalid Attempt']
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Below this share of sessions attended (Present or Late) a student is a chronic absentee
+CHRONIC_RATE = 0.75
+
+# A weekday / time slot is flagged when its Late+Short share is this many times the overall share
+TREND_FACTOR = 1.5
+MIN_TREND_RECORDS = 10
+
+# Sessions whose GPS pass rate is this many robust deviations from the median are anomalous
+ANOMALY_Z = 3.0
+MIN_SESSION_RECORDS = 3
+
+MAX_LISTED = 5
+
+# class_date is free text: formats tried, in order, before a session is left out of the trends
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y']
+
+
+def _parse_date(value):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime((value or '').strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_hour(value):
+    try:
+        hour = int((value or '').strip().split(':')[0])
+    except ValueError:
+        return None
+    return hour if 0 <= hour < 24 else None
+
+
+def _load(teacher_id, session_id=None):
+    """The teacher's sessions in date order, and the attendance as column arrays (one query each)."""
+    sessions = db.session.query(
+        Session.session_id, Session.class_date, Session.start_time, Session.subject_name, Session.course, Session.year
+    ).filter(Session.teacher_id == teacher_id)
+    # Core select on the table columns: plain tuples, no ORM row processing
+    table = Attendance.__table__
+    rows = select(
+        table.c.student_id, table.c.session_id, table.c.status, table.c.inside_count, table.c.total_samples
+    ).where(table.c.teacher_id == teacher_id)
+    if session_id:
+        sessions = sessions.filter(Session.session_id == session_id)
+        rows = rows.where(table.c.session_id == session_id)
+
+    # Chronological session order: a student is expected at every session of their course/year
+    # after their first one. Unparseable dates sort last, in text order
+    def order(s):
+        date = _parse_date(s.class_date)
+        return (date is None, date or datetime.date.min, s.class_date or '', s.start_time or '')
+    sessions = sorted(sessions.all(), key=order)
+    rows = db.session.execute(rows).all()
+    # Transposed to one array per column
+    return sessions, [np.array(column) for column in zip(*rows)] if rows else None
+
+
+def _weekday_and_hour(sessions):
+    """Per-session weekday (Monday = 0) and start hour arrays; -1 where the text does not parse."""
+    dates = [_parse_date(s.class_date) for s in sessions]
+    weekday = np.array([d.weekday() if d else -1 for d in dates], dtype=np.int64)
+    hours = [_parse_hour(s.start_time) for s in sessions]
+    hour = np.array([-1 if h is None else h for h in hours], dtype=np.int64)
+    return weekday, hour
+
+
+def _flag_buckets(bucket, trouble, n_buckets, overall):
+    """Buckets whose trouble share is TREND_FACTOR x the overall share. Returns [(bucket, share, records)]."""
+    # Rows of sessions whose date / time did not parse have bucket -1
+    known = bucket >= 0
+    bucket, trouble = bucket[known], trouble[known]
+    totals = np.bincount(bucket, minlength=n_buckets)
+    troubled = np.bincount(bucket, weights=trouble, minlength=n_buckets)
+    share = np.divide(troubled, totals, out=np.zeros(n_buckets), where=totals > 0)
+    flagged = np.flatnonzero((totals >= MIN_TREND_RECORDS) & (share >= TREND_FACTOR * overall) & (share > 0))
+    return [(int(b), float(share[b]), int(totals[b])) for b in flagged[np.argsort(-share[flagged])]]
+
+
+def analyze_attendance(teacher_id, session_id=None):
+    """
+    Local, deterministic report: vectorized statistics over the attendance history,
+    no network. Returns the generate_attendance_report structure
+    ({'success', 'report': {summary, insights, recommendations, details}}),
+    or None when there is nothing to analyze. Must run inside an app context.
+    """
+    sessions, columns = _load(teacher_id, session_id)
+    if columns is None or not sessions:
+        return None
+    student_col, session_col, status_col, inside, samples = columns
+
+    # Map the string columns to small integer codes through their distinct values
+    session_index = {s.session_id: i for i, s in enumerate(sessions)}
+    session_keys, session_inverse = np.unique(session_col, return_inverse=True)
+    sess = np.array([session_index.get(key, -1) for key in session_keys], dtype=np.int64)[session_inverse]
+    status_keys, status_inverse = np.unique(status_col, return_inverse=True)
+    status = np.array([STATUSES.index(key) if key in STATUSES else 3 for key in status_keys],
+                      dtype=np.int64)[status_inverse]
+
+    known = sess >= 0
+    if not known.any():
+        return None
+    student_col, sess, status = student_col[known], sess[known], status[known]
+    inside, samples = inside[known].astype(np.float64), samples[known].astype(np.float64)
+    student_ids, student_idx = np.unique(student_col, return_inverse=True)
+
+    n_rows, n_students, n_sessions = len(sess), len(student_ids), len(sessions)
+    status_counts = np.bincount(status, minlength=len(STATUSES))
+    attended = (status <= 1).astype(np.float64)  # Present or Late
+    trouble = ((status == 1) | (status == 2)).astype(np.float64)  # Late or Short
+
+    # Chronic absentees: attended share of the sessions held for the student's course/year
+    # groups since their first one in each. rank = position of a session within its group
+    _, group = np.unique([f"{s.course or ''}\x00{s.year or ''}" for s in sessions], return_inverse=True)
+    group = group.reshape(-1)
+    n_groups = int(group.max()) + 1
+    group_size = np.bincount(group, minlength=n_groups)
+    by_group = np.argsort(group, kind='stable')  # keeps chronological order inside each group
+    rank = np.empty(n_sessions, dtype=np.int64)
+    rank[by_group] = np.arange(n_sessions) - (np.cumsum(group_size) - group_size)[group[by_group]]
+    pair_keys, pair_idx = np.unique(student_idx * n_groups + group[sess], return_inverse=True)
+    first = np.full(len(pair_keys), n_sessions, dtype=np.int64)
+    np.minimum.at(first, pair_idx.reshape(-1), rank[sess])
+    expected = np.bincount(pair_keys // n_groups, weights=group_size[pair_keys % n_groups] - first,
+                           minlength=n_students).astype(np.int64)
+    good = np.bincount(student_idx, weights=attended, minlength=n_students)
+    rate = good / np.maximum(expected, 1)
+    chronic = np.flatnonzero((rate < CHRONIC_RATE) & (expected >= 2))
+    chronic = chronic[np.argsort(rate[chronic])]
+
+    # Late/Short trends per weekday and start hour
+    weekday, hour = _weekday_and_hour(sessions)
+    overall_trouble = trouble.mean()
+    weekday_flags = _flag_buckets(weekday[sess], trouble, 7, overall_trouble)
+    hour_flags = _flag_buckets(hour[sess], trouble, 24, overall_trouble)
+
+    # Sessions with anomalous GPS pass rates (robust z-score: median / MAD)
+    per_session_records = np.bincount(sess, minlength=n_sessions)
+    pass_rate = np.divide(
+        np.bincount(sess, weights=inside, minlength=n_sessions),
+        np.bincount(sess, weights=samples, minlength=n_sessions),
+        out=np.zeros(n_sessions), where=np.bincount(sess, weights=samples, minlength=n_sessions) > 0
+    )
+    eligible = np.flatnonzero(per_session_records >= MIN_SESSION_RECORDS)
+    anomalies = []
+    if len(eligible) >= 3:
+        median = np.median(pass_rate[eligible])
+        mad = np.median(np.abs(pass_rate[eligible] - median)) * 1.4826 or 1e-9
+        z = (pass_rate[eligible] - median) / mad
+        anomalies = [(int(eligible[i]), float(z[i])) for i in np.flatnonzero(np.abs(z) >= ANOMALY_Z)]
+        anomalies.sort(key=lambda item: item[1])
+
+    names = {}
+    if len(chronic):
+        flagged_ids = [int(student_ids[i]) for i in chronic[:MAX_LISTED]]
+        names = dict(db.session.query(Student.id, Student.name).filter(Student.id.in_(flagged_ids)).all())
+
+    # Text in the same shape as the Gemini report
+    shares = {s: status_counts[i] / n_rows for i, s in enumerate(STATUSES)}
+    summary = (
+        f"{n_rows} attendance records from {n_students} students across {n_sessions} sessions. "
+        f"{shares['Present']:.0%} Present, {shares['Late']:.0%} Late, {shares['Short']:.0%} Short and "
+        f"{shares['Invalid Attempt']:.0%} Invalid Attempt. "
+        f"{len(chronic)} student(s) attended fewer than {CHRONIC_RATE:.0%} of their sessions."
+    )
+
+    insights = []
+    for i in chronic[:MAX_LISTED]:
+        insights.append(
+            f"{names.get(int(student_ids[i]), 'Unknown')} attended {int(good[i])} of {int(expected[i])} sessions ({rate[i]:.0%})."
+        )
+    for day, share, total in weekday_flags[:MAX_LISTED]:
+        insights.append(f"{WEEKDAYS[day]} classes have {share:.0%} Late/Short records ({total} records) vs {overall_trouble:.0%} overall.")
+    for slot, share, total in hour_flags[:MAX_LISTED]:
+        insights.append(f"Classes starting at {slot:02d}:00 have {share:.0%} Late/Short records ({total} records) vs {overall_trouble:.0%} overall.")
+    for i, z in anomalies[:MAX_LISTED]:
+        s = sessions[i]
+        direction = 'low' if z < 0 else 'high'
+        insights.append(
+            f"{s.subject_name} on {s.class_date} {s.start_time} had an unusually {direction} GPS pass rate "
+            f"({pass_rate[i]:.0%} of samples inside)."
+        )
+    if not insights:
+        insights.append("No chronic absentees, weekday or time-slot trends, or GPS anomalies were detected.")
+
+    recommendations = []
+    if len(chronic):
+        recommendations.append(f"Contact the {len(chronic)} student(s) below {CHRONIC_RATE:.0%} attendance before they fall further behind.")
+    if weekday_flags or hour_flags:
+        recommendations.append("Review start times or reminders for the flagged days and time slots with frequent Late/Short marks.")
+    if any(z < 0 for _, z in anomalies):
+        recommendations.append("Check the classroom polygon of sessions with low GPS pass rates and re-score them if it was drawn wrong.")
+    if shares['Invalid Attempt'] > 0.1:
+        recommendations.append("Many submissions are Invalid Attempts: remind students to enable precise location and stay in class for the full minute.")
+    if not recommendations:
+        recommendations.append("Attendance looks healthy; keep monitoring it regularly.")
+
+    return {
+        'success': True,
+        'report': {
+            'summary': summary,
+            'insights': insights,
+            'recommendations': recommendations,
+            'details': {
+                'chronic_absentees': [
+                    {'student_id': int(student_ids[i]), 'student_name': names.get(int(student_ids[i]), 'Unknown'),
+                     'attended': int(good[i]), 'expected': int(expected[i])}
+                    for i in chronic[:MAX_LISTED]
+                ],
+                'weekday_trends': [{'weekday': WEEKDAYS[d], 'late_short_share': round(share, 3), 'records': t}
+                                   for d, share, t in weekday_flags],
+                'time_slot_trends': [{'hour': h, 'late_short_share': round(share, 3), 'records': t}
+                                     for h, share, t in hour_flags],
+                'gps_anomalies': [{'session_id': sessions[i].session_id, 'pass_rate': round(float(pass_rate[i]), 3),
+                                   'z_score': round(z, 2)} for i, z in anomalies]
+            }
+        },
+        'records_analyzed': n_rows
+    }
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Reports kept per process, least recently used evicted first
+REPORT_CACHE_SIZE = 128
+
+# A cached report is reused at most this long even if no attendance changed
+REPORT_CACHE_TTL_SECONDS = 30 * 60
+
+
+class ReportCache:
+    """
+    TTL + LRU cache for generated reports with single-flight: concurrent requests
+    for the same key wait on one in-flight generation instead of each calling the LLM.
+    Keys should include a data fingerprint so new attendance naturally misses.
+    """
+
+    def __init__(self, max_size=REPORT_CACHE_SIZE, ttl=REPORT_CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock  # Seconds, monotonic; tests inject a fake one
+        self._entries = OrderedDict()  # key -> (stored_at, result)
+        self._in_flight = {}  # key -> Future
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._get_locked(key, self.clock())
+
+    def _get_locked(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if now - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = (self.clock(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute, cacheable=lambda result: True):
+        """
+        Returns (result, cached). Only one caller per key runs compute(); the others
+        block until it finishes and share its result (or its exception). Results
+        for which cacheable(result) is false (e.g. failed LLM calls) are not stored.
+        """
+        with self._lock:
+            result = self._get_locked(key, self.clock())
+            if result is not None:
+                return result, True
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            if result is not None and cacheable(result):
+                self.put(key, result)
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Process-wide cache used by the report routes
+report_cache = ReportCache()
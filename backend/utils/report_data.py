@@ -0,0 +1,101 @@
+from sqlalchemy import func
+
+from extensions import db
+from models import Session, Attendance, Student
+from utils.http_cache import make_etag
+
+# Statuses in report order (determine_status values)
+STATUSES = ['Present', 'Late', 'Short', 'Invalid Attempt']
+
+
+def _filtered(query, teacher_id, session_id):
+    query = query.filter(Attendance.teacher_id == teacher_id)
+    if session_id:
+        query = query.filter(Attendance.session_id == session_id)
+    return query
+
+
+def summarize_attendance(teacher_id, session_id=None):
+    """
+    Pre-aggregated report input for a teacher (optionally one session), computed
+    with GROUP BY queries so memory and time depend on the number of students
+    and sessions, not on the number of attendance rows.
+
+    Returns a dict:
+        total_records, first_date, last_date,
+        status_counts: {status: count},
+        students: [{student_id, student_name, roll_number, records, inside_samples, total_samples, <status>: count}],
+        sessions: [{session_id, subject_name, classroom_name, class_date, start_time, records, <status>: count}]
+    Students are sorted by attendance rate (worst first), sessions by date (latest first).
+    """
+    total, first_seen, last_seen = _filtered(db.session.query(
+        func.count(Attendance.id), func.min(Attendance.timestamp), func.max(Attendance.timestamp)
+    ), teacher_id, session_id).one()
+
+    status_counts = dict(_filtered(
+        db.session.query(Attendance.status, func.count(Attendance.id)), teacher_id, session_id
+    ).group_by(Attendance.status).all())
+
+    students = {}
+    student_rows = _filtered(db.session.query(
+        Attendance.student_id, Student.name, Student.roll_number, Attendance.status,
+        func.count(Attendance.id), func.sum(Attendance.inside_count), func.sum(Attendance.total_samples)
+    ).outerjoin(Student, Student.id == Attendance.student_id), teacher_id, session_id).group_by(
+        Attendance.student_id, Student.name, Student.roll_number, Attendance.status
+    ).all()
+    for student_id, name, roll_number, status, count, inside, samples in student_rows:
+        entry = students.setdefault(student_id, {
+            'student_id': student_id,
+            'student_name': name or 'Unknown',
+            'roll_number': roll_number or 'N/A',
+            'records': 0,
+            'inside_samples': 0,
+            'total_samples': 0,
+            **{s: 0 for s in STATUSES}
+        })
+        entry[status] = entry.get(status, 0) + count
+        entry['records'] += count
+        entry['inside_samples'] += inside or 0
+        entry['total_samples'] += samples or 0
+
+    sessions = {}
+    session_rows = _filtered(db.session.query(
+        Attendance.session_id, Session.subject_name, Session.classroom_name, Session.class_date,
+        Session.start_time, Attendance.status, func.count(Attendance.id)
+    ).outerjoin(Session, Session.session_id == Attendance.session_id), teacher_id, session_id).group_by(
+        Attendance.session_id, Session.subject_name, Session.classroom_name, Session.class_date,
+        Session.start_time, Attendance.status
+    ).all()
+    for sid, subject, classroom, class_date, start_time, status, count in session_rows:
+        entry = sessions.setdefault(sid, {
+            'session_id': sid,
+            'subject_name': subject or 'Unknown Subject',
+            'classroom_name': classroom or 'Unknown Classroom',
+            'class_date': class_date or 'N/A',
+            'start_time': start_time or 'N/A',
+            'records': 0,
+            **{s: 0 for s in STATUSES}
+        })
+        entry[status] = entry.get(status, 0) + count
+        entry['records'] += count
+
+    return {
+        'total_records': total,
+        'first_date': first_seen.strftime('%B %d, %Y') if first_seen else None,
+        'last_date': last_seen.strftime('%B %d, %Y') if last_seen else None,
+        'status_counts': status_counts,
+        'students': sorted(students.values(), key=lambda s: (s['Present'] / s['records'], s['student_name'])),
+        'sessions': sorted(sessions.values(), key=lambda s: (s['class_date'], s['start_time']), reverse=True),
+    }
+
+
+def report_fingerprint(teacher_id, session_id=None):
+    """
+    Data version of a report's input: changes whenever attendance is added,
+    re-scored or marked manually (Session.version) and when sessions come or go.
+    One small query over the teacher's sessions, no attendance rows read.
+    """
+    query = db.session.query(Session.session_id, Session.version).filter(Session.teacher_id == teacher_id)
+    if session_id:
+        query = query.filter(Session.session_id == session_id)
+    return make_etag(*sorted(query.all()))
@@ -0,0 +1,388 @@
+import datetime
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import and_, or_, update
+
+from extensions import db
+from models import ReportJob
+from utils import events
+from utils.report_cache import report_cache
+from utils.report_data import summarize_attendance, report_fingerprint
+
+# Jobs still being worked on; anything else is finished
+ACTIVE_STATES = ('queued', 'running')
+
+# 'gemini' asks the LLM, 'local' computes the statistics in-process in milliseconds
+REPORT_ENGINES = ('gemini', 'local')
+
+# A running job's owner refreshes its heartbeat this often; another runner takes it over once it is stale
+HEARTBEAT_SECONDS = 15
+STALE_AFTER_SECONDS = 4 * HEARTBEAT_SECONDS
+
+# relay_job gives up after this long; the client then polls the job
+RELAY_MAX_SECONDS = 120
+
+
+def job_channel(job_id):
+    """Broker channel on which the runner publishes a job's sections and its end."""
+    return f'report-job:{job_id}'
+
+
+def job_active_key(teacher_id, session_id, engine):
+    """ReportJob.active_key: identifies a job by what it computes while it is queued or running."""
+    return f"{teacher_id}:{session_id or '*'}:{engine}"
+
+
+def _claimable(stale_before):
+    """Jobs a runner may claim: queued, or running without a heartbeat since stale_before."""
+    return or_(ReportJob.state == 'queued', and_(
+        ReportJob.state == 'running',
+        or_(ReportJob.heartbeat_at.is_(None), ReportJob.heartbeat_at < stale_before)
+    ))
+
+
+def _insert_ignore(values):
+    """INSERT ... ON CONFLICT DO NOTHING on the active_key unique index, for SQLite or Postgres."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(ReportJob).values(values).on_conflict_do_nothing(index_elements=['active_key'])
+
+
+def get_report(teacher_id, session_id=None):
+    """
+    Local statistics report for a teacher (optionally one session), from the
+    report cache when the data has not changed. Returns (result, cached); result
+    is None when there is no attendance to analyze. Must run inside an app context.
+    LLM reports only run as jobs (stream_report on the runner's pool).
+    """
+    from utils.report_analytics import analyze_attendance
+
+    # Same teacher, filter and data version: reuse the report, concurrent clicks share one computation
+    key = report_cache_key('local', teacher_id, session_id)
+    return report_cache.get_or_compute(key, lambda: analyze_attendance(teacher_id, session_id),
+                                       cacheable=lambda r: r['success'])
+
+
+def report_cache_key(engine, teacher_id, session_id=None):
+    return (engine, teacher_id, session_id or '*', report_fingerprint(teacher_id, session_id))
+
+
+def _replay(result, cached):
+    """A finished report as the events of a streamed one."""
+    report = result['report']
+    yield {'type': 'start', 'records_analyzed': result['records_analyzed'], 'cached': cached}
+    yield {'type': 'summary', 'text': report['summary']}
+    for insight in report['insights']:
+        yield {'type': 'insight', 'text': insight}
+    for recommendation in report['recommendations']:
+        yield {'type': 'recommendation', 'text': recommendation}
+    yield {'type': 'done', 'result': result}
+
+
+def stream_report(teacher_id, session_id=None, timeout=None, engine='gemini'):
+    """
+    Report as an iterator of events (gemini_service.stream_attendance_report),
+    preceded by {'type': 'start', 'records_analyzed', 'cached'}; None when there
+    is no attendance to analyze. Gemini sections are yielded as they arrive and
+    the finished report is cached; cached and local reports are replayed at once.
+    The database is read before returning, so iterating needs no app context.
+    Runs on the ReportJobRunner pool, never on a request thread.
+    """
+    from utils.gemini_service import stream_attendance_report
+
+    key = report_cache_key(engine, teacher_id, session_id)
+    result = report_cache.get(key)
+    if result is not None:
+        return _replay(result, cached=True)
+    if engine == 'local':
+        result, cached = get_report(teacher_id, session_id)
+        return _replay(result, cached) if result else None
+
+    summary = summarize_attendance(teacher_id, session_id)
+    if not summary['total_records']:
+        return None
+
+    def events():
+        yield {'type': 'start', 'records_analyzed': summary['total_records'], 'cached': False}
+        for event in stream_attendance_report(summary, timeout=timeout):
+            if event['type'] == 'done':
+                result = {**event['result'], 'records_analyzed': summary['total_records']}
+                report_cache.put(key, result)
+                event = {'type': 'done', 'result': result}
+            yield event
+
+    return events()
+
+
+def _apply_event(progress, event):
+    """Adds a streamed section event to a job's progress ({records_analyzed, summary, insights, recommendations})."""
+    if event['type'] == 'start':
+        progress['records_analyzed'] = event['records_analyzed']
+    elif event['type'] == 'summary':
+        progress['summary'] += event['text']
+    elif event['type'] == 'insight':
+        progress['insights'].append(event['text'])
+    elif event['type'] == 'recommendation':
+        progress['recommendations'].append(event['text'])
+
+
+def relay_job(job_id, max_seconds=RELAY_MAX_SECONDS):
+    """
+    Events of a report job as stream_report yields them, so the generation itself
+    stays on the runner's bounded pool. Reads the job once for what was written
+    before the call, then waits on the event broker for the runner's events (no
+    database polling, no connection held while waiting). Starts with
+    {'type': 'start', 'job_id', ...} and ends with 'done' / 'error', or
+    {'type': 'pending', 'job_id'} after max_seconds (the client then polls the job).
+    Must be consumed inside an app context.
+    """
+    channel = job_channel(job_id)
+    subscriber = events.broker.subscribe(channel)  # before the read, so no event falls in between
+    try:
+        job = db.session.get(ReportJob, job_id)
+        state, error = job.state, job.error
+        progress = json.loads(job.progress_json) if job.progress_json and state in ACTIVE_STATES else None
+        result = json.loads(job.result_json) if job.result_json and state not in ACTIVE_STATES else None
+        db.session.close()
+
+        progress = progress or {'records_analyzed': None, 'summary': '', 'insights': [], 'recommendations': []}
+        seen = progress.pop('seq', 0)
+        sent = {'summary': 0, 'insights': 0, 'recommendations': 0}
+        started = []
+
+        def unsent(sections):
+            # Sections past what was already sent; the finished result holds the full report
+            if len(sections['summary']) > sent['summary']:
+                yield {'type': 'summary', 'text': sections['summary'][sent['summary']:]}
+            for kind, section in (('insights', 'insight'), ('recommendations', 'recommendation')):
+                for text in sections[kind][sent[kind]:]:
+                    yield {'type': section, 'text': text}
+            for kind in sent:
+                sent[kind] = len(sections[kind])
+
+        def start(records):
+            if records is not None and not started:
+                started.append(records)
+                yield {'type': 'start', 'job_id': job_id, 'records_analyzed': records, 'cached': False}
+
+        def finish(state, result, error):
+            if state == 'done':
+                yield from start(result['records_analyzed'])
+                yield from unsent(result['report'])
+                yield {'type': 'done', 'result': result}
+            else:
+                yield {'type': 'error', 'result': result or {'success': False, 'error': error}}
+
+        if state not in ACTIVE_STATES:
+            yield from finish(state, result, error)
+            return
+        yield from start(progress['records_analyzed'])
+        yield from unsent(progress)
+
+        deadline = time.monotonic() + max_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                yield {'type': 'pending', 'job_id': job_id}
+                return
+            try:
+                event = subscriber.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if event['type'] == 'finished':
+                yield from finish(event['state'], event['result'], event['error'])
+                return
+            if event['seq'] <= seen:
+                continue  # Already in the progress read above
+            seen = event['seq']
+            _apply_event(progress, event)
+            yield from start(progress['records_analyzed'])
+            yield from unsent(progress)
+    finally:
+        events.broker.unsubscribe(channel, subscriber)
+
+
+def job_to_dict(job, include_result=False):
+    data = {
+        'job_id': job.id,
+        'session_id': job.session_id,
+        'engine': job.engine,
+        'state': job.state,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+    if job.state in ACTIVE_STATES and job.progress_json:
+        # Sections written so far, shown while the report is still being generated
+        data['progress'] = json.loads(job.progress_json)
+        data['progress'].pop('seq', None)
+    if include_result and job.result_json:
+        data['result'] = json.loads(job.result_json)
+    return data
+
+
+class ReportJobRunner:
+    """
+    Runs report generation off the request threads.
+
+    Jobs are ReportJob rows, so they survive a restart. A job is claimed with
+    one conditional UPDATE (queued, or running with a stale heartbeat), so of all
+    the processes that see it exactly one runs it; the owner refreshes
+    heartbeat_at while it works, and the jobs of a process that died are taken
+    over by another once their heartbeat is STALE_AFTER_SECONDS old. A small
+    bounded pool keeps a few slow LLM calls from taking the threads student
+    submissions need; each call has a timeout.
+    """
+
+    def __init__(self, app, workers=2, timeout=60):
+        self.app = app
+        self.workers = workers
+        self.timeout = timeout
+        self.owner = None
+        self._pool = None
+        self._waiting = set()  # job ids on the pool that have not started yet
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Created lazily so forked gunicorn workers each get their own threads and owner id
+        if self._pool is not None:
+            return
+        with self._lock:
+            if self._pool is not None:
+                return
+            self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='report-job')
+            threading.Thread(target=self._heartbeat, name='report-job-heartbeat', daemon=True).start()
+        self._resume()
+
+    def _queue(self, job_id):
+        with self._lock:
+            if job_id in self._waiting:
+                return
+            self._waiting.add(job_id)
+        self._pool.submit(self._run, job_id)
+
+    def _resume(self):
+        """Queues the jobs nobody is working on: queued ones, and running ones whose owner went quiet."""
+        stale = datetime.datetime.utcnow() - datetime.timedelta(seconds=STALE_AFTER_SECONDS)
+        pending = [job_id for (job_id,) in db.session.query(ReportJob.id).filter(_claimable(stale)).order_by(
+            ReportJob.created_at)]
+        for job_id in pending:
+            self._queue(job_id)
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(HEARTBEAT_SECONDS)
+            try:
+                with self.app.app_context():
+                    db.session.execute(update(ReportJob).where(
+                        ReportJob.owner == self.owner, ReportJob.state == 'running'
+                    ).values(heartbeat_at=datetime.datetime.utcnow()))
+                    db.session.commit()
+                    self._resume()
+            except Exception:
+                self.app.logger.exception('Report job heartbeat failed')
+
+    def submit(self, teacher_id, session_id=None, engine='gemini'):
+        """
+        Queues a report job and returns it. An identical job of the same teacher
+        that is still queued or running is returned instead of starting another:
+        the insert is ON CONFLICT DO NOTHING on the unique active_key, so two
+        quick clicks (or two workers) cannot both create one.
+        """
+        self._ensure_started()
+        key = job_active_key(teacher_id, session_id, engine)
+        # A conflicting job can finish (freeing the key) between the insert and the read: try again then
+        for _ in range(3):
+            job_id = str(uuid.uuid4())
+            db.session.execute(_insert_ignore({
+                'id': job_id, 'teacher_id': teacher_id, 'session_id': session_id, 'engine': engine,
+                'state': 'queued', 'active_key': key
+            }))
+            db.session.commit()
+            job = ReportJob.query.filter(ReportJob.active_key == key).first()
+            if job is not None:
+                if job.id == job_id:
+                    self._queue(job_id)
+                return job
+        raise RuntimeError('Could not queue the report job')
+
+    def get(self, job_id, teacher_id):
+        """Returns the job if it belongs to teacher_id, else None."""
+        self._ensure_started()
+        job = db.session.get(ReportJob, job_id)
+        if job is None or job.teacher_id != teacher_id:
+            return None
+        return job
+
+    def _claim(self, job_id):
+        now = datetime.datetime.utcnow()
+        claimed = db.session.execute(update(ReportJob).where(
+            ReportJob.id == job_id, _claimable(now - datetime.timedelta(seconds=STALE_AFTER_SECONDS))
+        ).values(state='running', owner=self.owner, heartbeat_at=now, started_at=now)).rowcount
+        db.session.commit()
+        return claimed == 1
+
+    def _finish(self, job_id, state, error=None, result=None):
+        # Only while still the owner: a job taken over as stale is finished by its new owner
+        finished = db.session.execute(update(ReportJob).where(
+            ReportJob.id == job_id, ReportJob.owner == self.owner
+        ).values(state=state, error=error, result_json=json.dumps(result) if result is not None else None,
+                 finished_at=datetime.datetime.utcnow(), active_key=None, progress_json=None)).rowcount
+        db.session.commit()
+        if finished:
+            events.broker.publish(job_channel(job_id), {
+                'type': 'finished', 'state': state, 'error': error, 'result': result})
+
+    def _generate(self, job):
+        """
+        Runs the report, storing each section in the job's progress and publishing
+        it for relay_job as it arrives. Returns the result or None.
+        """
+        stream = stream_report(job.teacher_id, job.session_id, timeout=self.timeout, engine=job.engine)
+        if stream is None:
+            return None
+        progress = {'records_analyzed': 0, 'summary': '', 'insights': [], 'recommendations': [], 'seq': 0}
+        for event in stream:
+            if event['type'] in ('done', 'error'):
+                return event['result']
+            _apply_event(progress, event)
+            progress['seq'] += 1
+            db.session.execute(update(ReportJob).where(
+                ReportJob.id == job.id, ReportJob.owner == self.owner
+            ).values(progress_json=json.dumps(progress)))
+            db.session.commit()
+            events.broker.publish(job_channel(job.id), {**event, 'seq': progress['seq']})
+        raise RuntimeError('Report stream ended without a result')
+
+    def _run(self, job_id):
+        with self._lock:
+            self._waiting.discard(job_id)
+        with self.app.app_context():
+            if not self._claim(job_id):
+                return
+            job = db.session.get(ReportJob, job_id)
+
+            try:
+                result = self._generate(job)
+                if result is None:
+                    self._finish(job_id, 'failed', error='No attendance records found')
+                elif not result['success']:
+                    self._finish(job_id, 'failed', error=result.get('error', 'Failed to generate report'),
+                                 result=result)
+                else:
+                    self._finish(job_id, 'done', result=result)
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.exception('Report job %s failed', job_id)
+                self._finish(job_id, 'failed', error=str(e))
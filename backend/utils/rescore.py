@@ -0,0 +1,174 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import update
+
+from extensions import db
+from models import Session, Attendance
+from utils.geofence import count_inside_arrays, samples_to_arrays, compile_polygon, determine_status
+from utils.sample_codec import load_sample_arrays
+from utils.session_counters import STATUS_COUNTERS, apply_session_deltas
+
+# Attendance rows fetched and scored per chunk
+CHUNK_SIZE = 2000
+
+# Below this many rows the pool start-up costs more than it saves
+MIN_ROWS_FOR_POOL = 2 * CHUNK_SIZE
+
+# Most worker processes a pool may use (CLI / offline runs only)
+MAX_POOL_WORKERS = 4
+
+
+def _sample_arrays(samples_blob, samples_json):
+    """(lat, lng, accuracy) arrays from either storage format; unreadable samples count as none."""
+    try:
+        return load_sample_arrays(samples_blob or samples_json)
+    except (ValueError, KeyError, TypeError):
+        return samples_to_arrays([])
+
+
+def score_chunk(rows, polygons):
+    """
+    Re-scores one chunk of attendance rows. Runs in a worker process.
+    rows: List of (attendance_id, session_id, samples_blob, samples_json)
+    polygons: {session_id: polygon_geojson}
+    Returns a list of (attendance_id, inside_count, status).
+    """
+    by_session = {}
+    for attendance_id, session_id, samples_blob, samples_json in rows:
+        by_session.setdefault(session_id, []).append((attendance_id, samples_blob, samples_json))
+
+    results = []
+    for session_id, items in by_session.items():
+        try:
+            polygon = compile_polygon(polygons[session_id])
+        except ValueError:
+            polygon = None
+
+        if polygon is None:
+            counts = [(0, 0)] * len(items)
+        else:
+            counts = count_inside_arrays([_sample_arrays(blob, text) for _, blob, text in items], polygon)
+
+        for (attendance_id, _, _), (inside_count, _) in zip(items, counts):
+            results.append((attendance_id, inside_count, determine_status(inside_count)))
+    return results
+
+
+def _attendance_query(session_ids=None, start_date=None, end_date=None, teacher_id=None):
+    query = db.session.query(
+        Attendance.id, Attendance.session_id, Attendance.samples_blob, Attendance.samples_json,
+        Attendance.inside_count, Attendance.status
+    )
+    if start_date or end_date:
+        query = query.join(Session, Session.session_id == Attendance.session_id)
+        if start_date:
+            query = query.filter(Session.class_date >= start_date)
+        if end_date:
+            query = query.filter(Session.class_date <= end_date)
+    if session_ids:
+        query = query.filter(Attendance.session_id.in_(session_ids))
+    if teacher_id is not None:
+        query = query.filter(Attendance.teacher_id == teacher_id)
+    return query
+
+
+def _iter_chunks(query, chunk_size):
+    """Keyset pagination on Attendance.id so each chunk is a short independent query."""
+    last_id = 0
+    while True:
+        rows = query.filter(Attendance.id > last_id).order_by(Attendance.id).limit(chunk_size).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def _apply(results, current, summary):
+    """Bulk UPDATE ... WHERE id = :id for every row whose score changed."""
+    changed = [
+        {'id': attendance_id, 'inside_count': inside_count, 'status': status}
+        for attendance_id, inside_count, status in results
+        if current[attendance_id][:2] != (inside_count, status)
+    ]
+    if changed:
+        db.session.execute(update(Attendance), changed)
+        # Move each changed row from its old status counter to the new one
+        deltas = {}
+        for row in changed:
+            _, old_status, session_id = current[row['id']]
+            counters = deltas.setdefault(session_id, {})
+            for status, delta in ((old_status, -1), (row['status'], 1)):
+                column = STATUS_COUNTERS.get(status)
+                if column is not None:
+                    counters[column] = counters.get(column, 0) + delta
+        apply_session_deltas(deltas)
+        db.session.commit()
+    summary['rows_updated'] += len(changed)
+
+
+def rescore_attendance(session_ids=None, start_date=None, end_date=None, teacher_id=None,
+                       chunk_size=CHUNK_SIZE, workers=0, dry_run=False):
+    """
+    Re-evaluates stored attendance samples against the sessions' current polygons.
+
+    Filters: session_ids (list), start_date / end_date (YYYY-MM-DD, compared to
+    Session.class_date) and teacher_id. Rows are streamed in chunks of chunk_size,
+    scored (vectorized) in-process and written back with bulk updates, one commit
+    per chunk. Must run inside an app context.
+
+    workers > 0 scores the chunks in a pool of that many processes (at most
+    MAX_POOL_WORKERS), started with spawn. Only for the CLI and other offline
+    runs: forking a threaded web worker could copy locks held by other threads.
+
+    Returns a summary dict: rows_scanned, rows_updated, sessions.
+    """
+    query = _attendance_query(session_ids, start_date, end_date, teacher_id)
+    summary = {'rows_scanned': 0, 'rows_updated': 0, 'sessions': 0}
+    polygons = {}
+
+    workers = min(workers or 0, MAX_POOL_WORKERS)
+    if workers and query.order_by(None).count() < MIN_ROWS_FOR_POOL:
+        workers = 0
+
+    def prepare(rows):
+        missing = {row[1] for row in rows} - polygons.keys()
+        if missing:
+            polygons.update(
+                db.session.query(Session.session_id, Session.polygon)
+                .filter(Session.session_id.in_(missing)).all()
+            )
+        summary['rows_scanned'] += len(rows)
+        current = {row[0]: (row[4], row[5], row[1]) for row in rows} # id: (inside_count, status, session_id)
+        task_rows = [(row[0], row[1], row[2], row[3]) for row in rows]
+        task_polygons = {row[1]: polygons.get(row[1]) for row in rows}
+        return current, task_rows, task_polygons
+
+    def finish(results, current):
+        if dry_run:
+            summary['rows_updated'] += sum(
+                1 for attendance_id, inside_count, status in results
+                if current[attendance_id][:2] != (inside_count, status)
+            )
+        else:
+            _apply(results, current, summary)
+
+    if not workers:
+        for rows in _iter_chunks(query, chunk_size):
+            current, task_rows, task_polygons = prepare(rows)
+            finish(score_chunk(task_rows, task_polygons), current)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            pending = []
+            for rows in _iter_chunks(query, chunk_size):
+                current, task_rows, task_polygons = prepare(rows)
+                pending.append((pool.submit(score_chunk, task_rows, task_polygons), current))
+                # Keep a bounded number of chunks in flight, write back in order
+                while len(pending) > 2 * workers:
+                    future, current = pending.pop(0)
+                    finish(future.result(), current)
+            for future, current in pending:
+                finish(future.result(), current)
+
+    summary['sessions'] = len(polygons)
+    return summary
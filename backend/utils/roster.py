@@ -0,0 +1,130 @@
+from sqlalchemy import and_, or_, exists, func, delete
+
+from extensions import db
+from models import Session, Attendance, ManualAttendance, Student, RosterEntry
+
+# Attendance rows with this status were submitted from outside the classroom: still absent
+ABSENT_STATUS = 'Invalid Attempt'
+
+
+def _insert_statement(rows):
+    """INSERT ... ON CONFLICT DO NOTHING on the roster's unique index, for SQLite or Postgres."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(RosterEntry).values(rows).on_conflict_do_nothing(
+        index_elements=['teacher_id', 'course', 'year', 'student_id']
+    )
+
+
+def add_to_roster(teacher_id, course, year, roll_numbers, branch=None):
+    """
+    Adds students (by roll number) to the teacher's roster for course/year and
+    commits. Students already on it are left alone. branch defaults to each
+    student's own branch. Returns (added, unknown_roll_numbers).
+    """
+    roll_numbers = list(dict.fromkeys(roll_numbers))
+    students = db.session.query(Student.id, Student.roll_number, Student.branch).filter(
+        Student.roll_number.in_(roll_numbers)).all()
+    found = {student.roll_number for student in students}
+
+    added = 0
+    if students:
+        result = db.session.execute(_insert_statement([
+            {'teacher_id': teacher_id, 'student_id': student.id, 'course': course, 'year': year,
+             'branch': branch or student.branch}
+            for student in students
+        ]))
+        added = result.rowcount
+        db.session.commit()
+    return added, [roll for roll in roll_numbers if roll not in found]
+
+
+def remove_from_roster(teacher_id, course, year, roll_numbers=None):
+    """Removes the listed students (or everyone) from the teacher's course/year roster and commits. Returns the count."""
+    statement = delete(RosterEntry).where(
+        RosterEntry.teacher_id == teacher_id, RosterEntry.course == course, RosterEntry.year == year)
+    if roll_numbers:
+        statement = statement.where(RosterEntry.student_id.in_(
+            db.session.query(Student.id).filter(Student.roll_number.in_(roll_numbers)).scalar_subquery()))
+    removed = db.session.execute(statement).rowcount
+    db.session.commit()
+    return removed
+
+
+def session_absentees(teacher_id, session_id=None, class_date=None):
+    """
+    Absentees of the teacher's sessions (one session, or every session on
+    class_date): students on the session's course/year roster with neither an
+    attendance row (other than an Invalid Attempt) nor a manual mark.
+
+    One query lists the sessions with their roster size, one anti-join finds
+    every absentee of all of them, whatever the roster sizes.
+    Returns a list of session dicts, each with its 'absentees'.
+    """
+    roster_join = and_(
+        RosterEntry.teacher_id == Session.teacher_id,
+        RosterEntry.course == Session.course,
+        RosterEntry.year == Session.year
+    )
+    scope = [Session.teacher_id == teacher_id]
+    if session_id:
+        scope.append(Session.session_id == session_id)
+    if class_date:
+        scope.append(Session.class_date == class_date)
+
+    sessions = db.session.query(
+        Session.session_id, Session.subject_name, Session.classroom_name, Session.course, Session.year,
+        Session.class_date, Session.start_time, Session.end_time, func.count(RosterEntry.id)
+    ).outerjoin(RosterEntry, roster_join).filter(*scope).group_by(
+        Session.session_id, Session.subject_name, Session.classroom_name, Session.course, Session.year,
+        Session.class_date, Session.start_time, Session.end_time
+    ).order_by(Session.start_time, Session.session_id).all()
+
+    results = {}
+    for sid, subject, classroom, course, year, date, start_time, end_time, roster_size in sessions:
+        results[sid] = {
+            'session_id': sid,
+            'subject': subject,
+            'classroom': classroom,
+            'course': course,
+            'year': year,
+            'date': date,
+            'start_time': start_time,
+            'end_time': end_time,
+            'roster_size': roster_size,
+            'absentees': []
+        }
+    if not results:
+        return []
+
+    # At most one attendance row per (student, session): a left join whose miss means absent
+    marked_manually = exists().where(
+        ManualAttendance.session_id == Session.session_id,
+        ManualAttendance.roll_number == Student.roll_number
+    )
+    rows = db.session.query(
+        Session.session_id, Student.id, Student.name, Student.roll_number, RosterEntry.branch, Attendance.status
+    ).select_from(Session).join(RosterEntry, roster_join).join(
+        Student, Student.id == RosterEntry.student_id
+    ).outerjoin(Attendance, and_(
+        Attendance.session_id == Session.session_id, Attendance.student_id == RosterEntry.student_id
+    )).filter(
+        *scope,
+        or_(Attendance.id.is_(None), Attendance.status == ABSENT_STATUS),
+        ~marked_manually
+    ).order_by(Session.session_id, Student.roll_number).all()
+
+    for sid, student_id, name, roll_number, branch, status in rows:
+        results[sid]['absentees'].append({
+            'student_id': student_id,
+            'name': name,
+            'roll_number': roll_number,
+            'branch': branch,
+            'invalid_attempt': status == ABSENT_STATUS
+        })
+
+    for entry in results.values():
+        entry['absent_count'] = len(entry['absentees'])
+    return list(results.values())
@@ -0,0 +1,79 @@
+import threading
+import time
+
+# A student sends at most this many samples for one session (12 over one minute)
+MAX_SAMPLES = 12
+
+# Tallies not touched for this long are dropped (abandoned scans)
+TALLY_TTL_SECONDS = 15 * 60
+
+
+class SampleTally:
+    """Running geofence result for one (student, session) while samples stream in."""
+    __slots__ = ('teacher_id', 'polygon', 'samples', 'seen', 'inside_count', 'valid_samples', 'updated_at')
+
+    def __init__(self, teacher_id, polygon):
+        self.teacher_id = teacher_id
+        self.polygon = polygon  # CompiledPolygon (or raw text if unparsable)
+        self.samples = []
+        self.seen = set()  # Sample sequence numbers already counted (retries are ignored)
+        self.inside_count = 0
+        self.valid_samples = 0
+        self.updated_at = time.monotonic()
+
+
+class SampleTallyStore:
+    """
+    In-process running tallies keyed by (student_id, session_id).
+    Each streamed sample is scored once when it arrives, so finalizing a
+    submission only reads the tally.
+    """
+
+    def __init__(self, ttl=TALLY_TTL_SECONDS):
+        self.ttl = ttl
+        self._tallies = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        stale = [key for key, tally in self._tallies.items() if now - tally.updated_at > self.ttl]
+        for key in stale:
+            del self._tallies[key]
+
+    def start(self, student_id, session_id, teacher_id, polygon):
+        """Returns the tally for (student_id, session_id), creating it if needed."""
+        with self._lock:
+            self._expire(time.monotonic())
+            return self._tallies.setdefault((student_id, session_id), SampleTally(teacher_id, polygon))
+
+    def add(self, tally, seq, sample, inside, valid):
+        """
+        Adds one scored sample. Returns False if this sequence number was already
+        counted or the tally is full.
+        """
+        with self._lock:
+            if seq in tally.seen or len(tally.samples) >= MAX_SAMPLES:
+                return False
+            tally.seen.add(seq)
+            tally.samples.append(sample)
+            tally.inside_count += inside
+            tally.valid_samples += valid
+            tally.updated_at = time.monotonic()
+            return True
+
+    def peek(self, student_id, session_id):
+        with self._lock:
+            return self._tallies.get((student_id, session_id))
+
+    def pop(self, student_id, session_id):
+        with self._lock:
+            return self._tallies.pop((student_id, session_id), None)
+
+    def discard_session(self, session_id):
+        """Drops every tally of a session (e.g. when the session is deleted)."""
+        with self._lock:
+            for key in [key for key in self._tallies if key[1] == session_id]:
+                del self._tallies[key]
+
+
+# Process-wide store used by the student routes
+tally_store = SampleTallyStore()
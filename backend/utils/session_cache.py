@@ -0,0 +1,90 @@
+import datetime
+import threading
+from collections import OrderedDict
+
+from utils.geofence import get_compiled_polygon
+
+# Upper bound on cached live sessions per process
+ACTIVE_SESSION_CACHE_SIZE = 1024
+
+
+class ActiveSession:
+    """What the submission path needs from a Session row."""
+    __slots__ = ('session_id', 'teacher_id', 'polygon', 'expires_at')
+
+    def __init__(self, session_id, teacher_id, polygon, expires_at):
+        self.session_id = session_id
+        self.teacher_id = teacher_id
+        self.polygon = polygon  # CompiledPolygon, or the raw text if it cannot be parsed
+        self.expires_at = expires_at
+
+
+class ActiveSessionCache:
+    """
+    TTL cache of live sessions keyed by session_id. Each entry expires at its
+    Session.expires_at; delete_session (and polygon corrections) invalidate it
+    in the worker that ran them. Other workers may keep a deleted session until
+    then, so insert_attendance re-checks that the session exists before writing.
+    Takes the Session read off submit_attendance during class-start bursts.
+    """
+
+    def __init__(self, max_size=ACTIVE_SESSION_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id, now=None):
+        """Returns the cached ActiveSession, or None if missing or expired."""
+        now = now or datetime.datetime.utcnow()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            if entry.expires_at <= now:
+                del self._entries[session_id]
+                return None
+            self._entries.move_to_end(session_id)
+            return entry
+
+    def put(self, entry):
+        with self._lock:
+            self._entries[entry.session_id] = entry
+            self._entries.move_to_end(entry.session_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def load(self, session_id):
+        """
+        Returns the ActiveSession for session_id, reading the Session row only on a miss.
+        Returns None if the session does not exist. Expired sessions are returned but not cached.
+        Must run inside an app context.
+        """
+        now = datetime.datetime.utcnow()
+        entry = self.get(session_id, now)
+        if entry is not None:
+            return entry
+
+        from models import Session
+        row = Session.query.with_entities(
+            Session.session_id, Session.teacher_id, Session.polygon, Session.expires_at
+        ).filter_by(session_id=session_id).first()
+        if row is None:
+            return None
+
+        try:
+            polygon = get_compiled_polygon(row.session_id, row.polygon)
+        except ValueError:
+            polygon = row.polygon  # Unparsable polygon: every sample counts as outside
+
+        entry = ActiveSession(row.session_id, row.teacher_id, polygon, row.expires_at)
+        if entry.expires_at > now:
+            self.put(entry)
+        return entry
+
+
+# Process-wide cache used by the student and teacher routes
+active_sessions = ActiveSessionCache()
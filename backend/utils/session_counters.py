@@ -0,0 +1,70 @@
+from sqlalchemy import select, update, func, or_
+
+from extensions import db
+from models import Session, Attendance, ManualAttendance
+
+# Attendance.status -> counter column on Session
+STATUS_COUNTERS = {
+    'Present': 'present_count',
+    'Late': 'late_count',
+    'Short': 'short_count',
+    'Invalid Attempt': 'invalid_count',
+}
+MANUAL_COUNTER = 'manual_count'
+COUNTER_COLUMNS = list(STATUS_COUNTERS.values()) + [MANUAL_COUNTER]
+
+
+def apply_session_deltas(deltas):
+    """
+    Applies counter deltas {session_id: {column: delta}} and bumps Session.version
+    for every listed session, in the current transaction (the caller commits).
+    Sessions are updated in a fixed order so concurrent writers cannot deadlock.
+    """
+    for session_id in sorted(deltas):
+        values = {'version': Session.version + 1}
+        for column, delta in deltas[session_id].items():
+            if delta:
+                values[column] = getattr(Session, column) + delta
+        db.session.execute(update(Session).where(Session.session_id == session_id).values(**values))
+
+
+def session_stats(session):
+    """Stats dict for the live view from a row with the counter columns. Manual marks count as Present."""
+    return {
+        'Present': session.present_count + session.manual_count,
+        'Late': session.late_count,
+        'Short': session.short_count,
+        'Invalid': session.invalid_count,
+        'Invalid Attempt': session.invalid_count  # Key older clients read
+    }
+
+
+def rebuild_session_counters(session_ids=None):
+    """
+    Recomputes the counter columns from the attendance tables and fixes the
+    sessions that drifted, bumping their version. Must run inside an app context.
+
+    The sessions are locked first (in the same order apply_session_deltas uses),
+    then one UPDATE sets every counter from correlated COUNT subqueries. A write
+    that already touched a session has committed by then and is counted; one
+    that has not waits for the lock and applies its delta on top of the rebuilt
+    value. On SQLite the single statement is atomic on its own.
+    Returns the number of sessions corrected.
+    """
+    scope = [Session.session_id.in_(session_ids)] if session_ids else []
+    db.session.query(Session.session_id).filter(*scope).order_by(Session.session_id).with_for_update().all()
+
+    def count(model, *criteria):
+        return select(func.count(model.id)).where(
+            model.session_id == Session.session_id, *criteria).correlate(Session).scalar_subquery()
+
+    targets = {column: count(Attendance, Attendance.status == status) for status, column in STATUS_COUNTERS.items()}
+    targets[MANUAL_COUNTER] = count(ManualAttendance)
+    drifted = or_(*[getattr(Session, column) != target for column, target in targets.items()])
+
+    result = db.session.execute(
+        update(Session).where(drifted, *scope).values(version=Session.version + 1, **targets),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return result.rowcount
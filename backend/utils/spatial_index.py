@@ -0,0 +1,233 @@
+import datetime
+import heapq
+import math
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from utils import events
+from utils.geofence import get_compiled_polygon, evaluate_samples, samples_to_arrays
+
+# Grid cell size in degrees (~550 m of latitude). Classrooms cover one or a few cells.
+CELL_SIZE_DEGREES = 0.005
+
+# Sessions whose bounding box spans more cells than this are kept in a small
+# "oversized" set that every query checks instead of being smeared over the grid.
+MAX_CELLS_PER_SESSION = 256
+
+# The create / end hooks keep every worker's index current; as a backstop for
+# events a worker missed, it reloads the unexpired sessions at most this often
+SYNC_TTL_SECONDS = 60
+
+# Broker channel on which the hooks reach the other worker processes
+SESSIONS_CHANNEL = 'sessions'
+
+
+class SessionIndex:
+    """
+    Uniform grid over the bounding boxes of all unexpired sessions' polygons.
+
+    Kept up to date by hooks: session_created (generate_qr, polygon corrections)
+    and session_ended (delete_session) update this process and publish the change
+    on the event broker, which every other worker applies on its next sync().
+    A worker skips its own events coming back from the broker, and reloads when
+    its subscriber queue overflowed.
+    Expired sessions are pruned lazily. sync() only queries the database on the
+    first call and then every SYNC_TTL_SECONDS.
+    """
+
+    def __init__(self, cell_size=CELL_SIZE_DEGREES):
+        self.cell_size = cell_size
+        self._cells = defaultdict(set)  # (lat_cell, lng_cell) -> {session_id}
+        self._oversized = set()
+        self._entries = {}  # session_id -> (CompiledPolygon, expires_at, cells)
+        self._expiry_heap = []  # (expires_at, session_id)
+        self._changed = {}  # session_id -> monotonic time of the last hook or event
+        self._synced_at = None  # Monotonic time of the last reload, None = reload on next sync()
+        self._broker = None
+        self._subscriber = None
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    def add(self, session_id, polygon, expires_at):
+        """Indexes a session. polygon is a CompiledPolygon, expires_at a naive UTC datetime."""
+        with self._lock:
+            self._remove_locked(session_id)
+
+            lat0, lng0 = self._cell(polygon.min_lat, polygon.min_lng)
+            lat1, lng1 = self._cell(polygon.max_lat, polygon.max_lng)
+            if (lat1 - lat0 + 1) * (lng1 - lng0 + 1) > MAX_CELLS_PER_SESSION:
+                cells = None
+                self._oversized.add(session_id)
+            else:
+                cells = [(i, j) for i in range(lat0, lat1 + 1) for j in range(lng0, lng1 + 1)]
+                for cell in cells:
+                    self._cells[cell].add(session_id)
+
+            self._entries[session_id] = (polygon, expires_at, cells)
+            heapq.heappush(self._expiry_heap, (expires_at, session_id))
+
+    def remove(self, session_id):
+        with self._lock:
+            self._remove_locked(session_id)
+
+    def _remove_locked(self, session_id):
+        entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return
+        cells = entry[2]
+        if cells is None:
+            self._oversized.discard(session_id)
+            return
+        for cell in cells:
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.discard(session_id)
+                if not bucket:
+                    del self._cells[cell]
+
+    def _prune_expired(self, now):
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, session_id = heapq.heappop(self._expiry_heap)
+            entry = self._entries.get(session_id)
+            # Skip stale heap items left behind by a re-add with a new expiry
+            if entry is not None and entry[1] == expires_at:
+                self._remove_locked(session_id)
+
+    def session_created(self, session_id, polygon_text, expires_at):
+        """Create hook, call after the commit: indexes the session here and in every other worker."""
+        self._publish({'type': 'created', 'session_id': session_id, 'polygon': polygon_text,
+                       'expires_at': expires_at.isoformat()})
+
+    def session_ended(self, session_id):
+        """End hook, call after the commit: drops the session here and in every other worker."""
+        self._publish({'type': 'ended', 'session_id': session_id})
+
+    def _publish(self, event):
+        self._apply(event)
+        # Tagged with this process: the broker delivers it back here too, already applied
+        events.broker.publish(SESSIONS_CHANNEL, {**event, 'origin': os.getpid()})
+
+    def _apply(self, event):
+        session_id = event['session_id']
+        with self._lock:
+            self._changed[session_id] = time.monotonic()
+            if event['type'] != 'created':
+                self._remove_locked(session_id)
+                return
+            try:
+                polygon = get_compiled_polygon(session_id, event['polygon'])
+            except ValueError:
+                self._remove_locked(session_id)  # Unparsable polygon, nothing can be inside it
+                return
+            self.add(session_id, polygon, datetime.datetime.fromisoformat(event['expires_at']))
+
+    def _receive(self):
+        """Applies the hooks' events published since the last call (by this or other workers)."""
+        with self._lock:
+            broker = events.broker
+            if self._broker is not broker:
+                # configure() replaced the broker: whatever it carried so far is lost
+                if self._broker is not None:
+                    self._broker.unsubscribe(SESSIONS_CHANNEL, self._subscriber)
+                self._broker, self._subscriber = broker, broker.subscribe(SESSIONS_CHANNEL)
+                self._synced_at = None
+            subscriber = self._subscriber
+            # Only sync() drains the queue: once full, the broker has been dropping
+            # events since, so reload everything rather than trust the index
+            if subscriber.full():
+                self._synced_at = None
+        while True:
+            try:
+                event = subscriber.get_nowait()
+            except queue.Empty:
+                return
+            if event.get('origin') != os.getpid():
+                self._apply(event)
+
+    def sync(self):
+        """
+        Applies pending session events, and reloads every unexpired session when the
+        index was never loaded (or the broker changed) or is older than SYNC_TTL_SECONDS.
+        Must run inside an app context.
+        """
+        self._receive()
+        if not self._stale():
+            return
+        # Only one thread reloads; the others keep serving the current index unless it is empty
+        if not self._sync_lock.acquire(blocking=self._synced_at is None):
+            return
+        try:
+            if self._stale():
+                self._reload()
+        finally:
+            self._sync_lock.release()
+
+    def _stale(self):
+        synced_at = self._synced_at
+        return synced_at is None or time.monotonic() - synced_at >= SYNC_TTL_SECONDS
+
+    def _reload(self):
+        from models import Session
+
+        started = time.monotonic()
+        now = datetime.datetime.utcnow()
+        rows = Session.query.with_entities(
+            Session.session_id, Session.polygon, Session.expires_at
+        ).filter(Session.expires_at > now).all()
+
+        with self._lock:
+            # A hook that ran during the query is newer than its row
+            self._changed = {sid: changed for sid, changed in self._changed.items() if changed >= started}
+            loaded = set()
+            for session_id, polygon_text, expires_at in rows:
+                if session_id in self._changed:
+                    continue
+                loaded.add(session_id)
+                try:
+                    polygon = get_compiled_polygon(session_id, polygon_text)
+                except ValueError:
+                    self._remove_locked(session_id)
+                    continue
+                entry = self._entries.get(session_id)
+                if entry is None or entry[0] is not polygon or entry[1] != expires_at:
+                    self.add(session_id, polygon, expires_at)
+            # Sessions deleted while an end event was missed
+            for session_id in set(self._entries) - loaded - set(self._changed):
+                self._remove_locked(session_id)
+            self._prune_expired(now)
+            self._synced_at = started
+
+    def candidates(self, samples):
+        """
+        Scores samples against every indexed session whose grid cells they touch.
+        Returns {session_id: (inside_count, valid_samples)} for sessions containing at least one sample.
+        """
+        lat, lng, accuracy = samples_to_arrays(samples)
+        now = datetime.datetime.utcnow()
+
+        with self._lock:
+            self._prune_expired(now)
+            session_ids = set(self._oversized)
+            for i in range(len(lat)):
+                session_ids.update(self._cells.get(self._cell(lat[i], lng[i]), ()))
+            polygons = {sid: self._entries[sid][0] for sid in session_ids}
+
+        results = {}
+        for session_id, polygon in polygons.items():
+            valid, inside = evaluate_samples(lat, lng, accuracy, polygon)
+            inside_count = int(np.count_nonzero(inside))
+            if inside_count:
+                results[session_id] = (inside_count, int(np.count_nonzero(valid)))
+        return results
+
+
+# Process-wide index used by the student and teacher routes
+session_index = SessionIndex()
@@ -0,0 +1,108 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Finished tickets are kept this long for the client to collect the result
+TICKET_TTL_SECONDS = 10 * 60
+
+# Seconds the client is told to wait before polling a pending ticket again. Status requests
+# never block: a request thread held per queued student would defeat the queue under load
+POLL_AFTER_SECONDS = 1
+
+
+class Ticket:
+    """One queued attendance submission."""
+    __slots__ = ('ticket_id', 'owner', 'state', 'body', 'http_status', 'finished_at')
+
+    def __init__(self, owner):
+        self.ticket_id = uuid.uuid4().hex
+        self.owner = owner  # student_id, only the owner may read the result
+        self.state = 'pending'
+        self.body = None
+        self.http_status = None
+        self.finished_at = None
+
+
+def _unpack_response(rv):
+    """(json_body, status_code) from a view-style return value: Response, (Response, status) or (Response, status, headers)."""
+    if isinstance(rv, tuple):
+        response, status = rv[:2]
+    else:
+        response, status = rv, rv.status_code
+    return response.get_json(), status
+
+
+class SubmissionQueue:
+    """
+    Accept-then-process mode for attendance submissions.
+
+    The request only validates tokens, queues the work and answers 202 with a
+    ticket id. A thread pool runs the geofence check and the DB write inside an
+    app context; the client polls the ticket (short, non-blocking requests) for the result.
+    Tickets live in this process, so like the other in-process stores this
+    assumes a single gunicorn worker (the render.yaml default).
+    """
+
+    def __init__(self, app, workers=4, max_pending=1000, ttl=TICKET_TTL_SECONDS):
+        self.app = app
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._tickets = {}
+        self._pending = 0
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _ensure_pool(self):
+        # Created lazily so forked gunicorn workers each get their own threads
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='attendance-submit')
+        return self._pool
+
+    def _expire(self, now):
+        stale = [
+            ticket_id for ticket_id, ticket in self._tickets.items()
+            if ticket.finished_at is not None and now - ticket.finished_at > self.ttl
+        ]
+        for ticket_id in stale:
+            del self._tickets[ticket_id]
+
+    def submit(self, owner, fn, *args):
+        """
+        Queues fn(*args), a function returning a view-style JSON response.
+        Returns the Ticket, or None when the backlog is full (the caller should process inline).
+        """
+        with self._lock:
+            self._expire(time.monotonic())
+            if self._pending >= self.max_pending:
+                return None
+            ticket = Ticket(owner)
+            self._tickets[ticket.ticket_id] = ticket
+            self._pending += 1
+            pool = self._ensure_pool()
+        pool.submit(self._run, ticket, fn, args)
+        return ticket
+
+    def _run(self, ticket, fn, args):
+        with self.app.app_context():
+            try:
+                body, status = _unpack_response(fn(*args))
+            except Exception:
+                self.app.logger.exception('Queued attendance submission %s failed', ticket.ticket_id)
+                body, status = {'error': 'Attendance could not be saved, please submit again'}, 500
+
+        with self._lock:
+            ticket.body = body
+            ticket.http_status = status
+            ticket.state = 'done'
+            ticket.finished_at = time.monotonic()
+            self._pending -= 1
+
+    def get(self, ticket_id, owner):
+        """Returns the ticket if it exists and belongs to owner, else None."""
+        with self._lock:
+            ticket = self._tickets.get(ticket_id)
+        if ticket is None or ticket.owner != owner:
+            return None
+        return ticket
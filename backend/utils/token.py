@@ -1,7 +1,34 @@
 import jwt
 import time
+import uuid
+import hmac
+import base64
+import hashlib
+import struct
+import functools
 from flask import current_app
 
+# Rotating QR tokens: the teacher screen shows a new token every window
+ROTATING_QR_VERSION = 1
+ROTATING_QR_WINDOW_SECONDS = 10
+
+# A rotating token is accepted in its own window and one window either side
+# (clock skew between workers, scan latency): 20-30 s, so a forwarded
+# screenshot is useless almost at once
+ROTATING_QR_PAST_WINDOWS = 1
+ROTATING_QR_FUTURE_WINDOWS = 1
+
+# Scanning a QR code gives the student an attendance token for that session,
+# used for the one-minute sampling run and the final upload
+ATTENDANCE_TOKEN_SECONDS = 5 * 60
+
+# Single-purpose tokens that may travel in a URL (EventSource, download links): they
+# expire quickly and are signed with their own key, so one is never accepted as a login
+SCOPED_TOKEN_SECONDS = 60
+
+_ROTATING_QR_LAYOUT = struct.Struct('>B16sI')  # version, session uuid, time window
+_ROTATING_QR_MAC_BYTES = 10
+
 def generate_token(payload, expires_in_minutes=60):
     payload['exp'] = int(time.time() + (expires_in_minutes * 60))
     return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
@@ -15,6 +42,23 @@ def verify_token(token):
     except jwt.InvalidTokenError:
         return None
 
+@functools.lru_cache(maxsize=4)
+def _scoped_token_key(secret):
+    return hmac.new(secret.encode(), b'scoped-token', hashlib.sha256).digest()
+
+def generate_scoped_token(purpose, expires_in_seconds=SCOPED_TOKEN_SECONDS, **claims):
+    """Token good for one purpose only (e.g. 'attendance-stream'), carrying claims such as teacher_id."""
+    payload = {**claims, 'purpose': purpose, 'exp': int(time.time() + expires_in_seconds)}
+    return jwt.encode(payload, _scoped_token_key(current_app.config['SECRET_KEY']), algorithm='HS256')
+
+def verify_scoped_token(token, purpose):
+    """Claims of a generate_scoped_token() token issued for purpose, or None (expired, forged, other purpose)."""
+    try:
+        payload = jwt.decode(token, _scoped_token_key(current_app.config['SECRET_KEY']), algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return None
+    return payload if payload.get('purpose') == purpose else None
+
 def generate_qr_token(teacher_id, session_id, expires_at):
     payload = {
         'teacher_id': teacher_id,
@@ -22,3 +66,55 @@ def generate_qr_token(teacher_id, session_id, expires_at):
         'exp': expires_at
     }
     return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
+
+@functools.lru_cache(maxsize=4)
+def _rotating_qr_key(secret):
+    # Separate key so a rotating token MAC can never be replayed as anything else
+    return hmac.new(secret.encode(), b'rotating-qr', hashlib.sha256).digest()
+
+def _rotating_qr_mac(body):
+    key = _rotating_qr_key(current_app.config['SECRET_KEY'])
+    return hmac.new(key, body, hashlib.sha256).digest()[:_ROTATING_QR_MAC_BYTES]
+
+def is_rotating_qr_token(qr_token):
+    # JWTs always contain dots, the base32 alphabet has none
+    return isinstance(qr_token, str) and '.' not in qr_token
+
+def generate_rotating_qr_token(session_id, now=None):
+    """
+    Short QR token for the current time window: base32(version, session uuid, window, HMAC).
+    50 uppercase characters, so the QR code uses alphanumeric mode and stays small.
+    """
+    window = int((now if now is not None else time.time()) // ROTATING_QR_WINDOW_SECONDS)
+    body = _ROTATING_QR_LAYOUT.pack(ROTATING_QR_VERSION, uuid.UUID(session_id).bytes, window)
+    return base64.b32encode(body + _rotating_qr_mac(body)).decode().rstrip('=')
+
+def verify_rotating_qr_token(qr_token, now=None):
+    """
+    Checks a rotating QR token with a single HMAC, no database access.
+    Returns {'session_id': ..., 'window': ...}. Raises jwt.InvalidTokenError for
+    malformed or forged tokens and jwt.ExpiredSignatureError for stale ones, the
+    same errors jwt.decode raises for the JWT QR tokens.
+    """
+    try:
+        raw = base64.b32decode(qr_token.upper() + '=' * (-len(qr_token) % 8))
+    except (ValueError, TypeError, AttributeError):
+        raise jwt.InvalidTokenError('Malformed QR token')
+    if len(raw) != _ROTATING_QR_LAYOUT.size + _ROTATING_QR_MAC_BYTES:
+        raise jwt.InvalidTokenError('Malformed QR token')
+
+    body, mac = raw[:_ROTATING_QR_LAYOUT.size], raw[_ROTATING_QR_LAYOUT.size:]
+    if not hmac.compare_digest(mac, _rotating_qr_mac(body)):
+        raise jwt.InvalidTokenError('Bad QR token signature')
+
+    version, session_bytes, window = _ROTATING_QR_LAYOUT.unpack(body)
+    if version != ROTATING_QR_VERSION:
+        raise jwt.InvalidTokenError('Unsupported QR token version')
+
+    current = int((now if now is not None else time.time()) // ROTATING_QR_WINDOW_SECONDS)
+    if window > current + ROTATING_QR_FUTURE_WINDOWS:
+        raise jwt.InvalidTokenError('QR token from the future')
+    if window < current - ROTATING_QR_PAST_WINDOWS:
+        raise jwt.ExpiredSignatureError('QR token expired')
+
+    return {'session_id': str(uuid.UUID(bytes=session_bytes)), 'window': window}
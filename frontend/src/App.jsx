@@ -9,6 +9,7 @@ import TeacherDashboard from './pages/Teacher/Dashboard';
 import GenerateQR from './pages/Teacher/GenerateQR';
 import ViewAttendance from './pages/Teacher/ViewAttendance';
 import ViewReports from './pages/Teacher/ViewReports';
+import ManageRoster from './pages/Teacher/ManageRoster';
 import Notifications from './pages/Notifications';
 import ScanQR from './pages/Student/ScanQR';
 import Sidebar from './components/Sidebar';
@@ -34,6 +35,7 @@ const AppRoutes = () => {
             <Route path="/teacher/generate-qr" element={<GenerateQR />} />
             <Route path="/teacher/view-attendance/:sessionId" element={<ViewAttendance />} />
             <Route path="/teacher/reports" element={<ViewReports />} />
+            <Route path="/teacher/roster" element={<ManageRoster />} />
             <Route path="/teacher/notifications" element={<Notifications />} />
         </Routes>
     );
@@ -208,6 +208,9 @@ const Sidebar = () => {
                                 <Link to="/teacher/reports" style={linkStyle('/teacher/reports')}>
                                     📈 Reports
                                 </Link>
+                                <Link to="/teacher/roster" style={linkStyle('/teacher/roster')}>
+                                    👥 Roster
+                                </Link>
                                 <Link to="/teacher/notifications" style={linkStyle('/teacher/notifications')}>
                                     🔔 Notifications
                                 </Link>
@@ -9,6 +9,7 @@ const Notifications = () => {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [success, setSuccess] = useState(null);
+    const [nextCursor, setNextCursor] = useState(null);
 
     const user = JSON.parse(localStorage.getItem('user'));
     const isTeacher = user && user.role === 'teacher';
@@ -24,6 +25,7 @@ const Notifications = () => {
                 headers: { Authorization: `Bearer ${token}` }
             });
             setNotifications(response.data);
+            setNextCursor(response.headers['x-next-cursor'] || null);
             setLoading(false);
         } catch (err) {
             setError('Failed to fetch notifications');
@@ -31,6 +33,20 @@ const Notifications = () => {
         }
     };
 
+    const loadMore = async () => {
+        try {
+            const token = localStorage.getItem('token');
+            const response = await axios.get(`${config.API_URL}/api/notifications/`, {
+                headers: { Authorization: `Bearer ${token}` },
+                params: { cursor: nextCursor }
+            });
+            setNotifications(prev => [...prev, ...response.data]);
+            setNextCursor(response.headers['x-next-cursor'] || null);
+        } catch (err) {
+            setError('Failed to fetch notifications');
+        }
+    };
+
     const handleSubmit = async (e) => {
         e.preventDefault();
         setError(null);
@@ -109,6 +125,11 @@ const Notifications = () => {
                     ))
                 )}
             </div>
+            {nextCursor && (
+                <div className="text-center mb-4">
+                    <button className="btn btn-outline-primary" onClick={loadMore}>Load more</button>
+                </div>
+            )}
         </div>
     );
 };
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Html5QrcodeScanner } from 'html5-qrcode';
 import axios from 'axios';
 import config from '../../config';
@@ -9,8 +9,43 @@ const ScanQR = () => {
     const [samples, setSamples] = useState([]);
     const [status, setStatus] = useState('Verifying'); // Verifying, Scanning, Sampling, Submitting, Done
     const [message, setMessage] = useState('');
+    // Streaming mode: each sample is posted as it arrives; if any post fails we fall back to one bulk submit
+    const streamFailed = useRef(false);
+    const sampleSeq = useRef(0);
+    const pendingUploads = useRef([]);
+    // Issued by /scan for the scanned session: the rotating QR code is only valid for a few seconds
+    const attendanceToken = useRef(null);
     const navigate = useNavigate();
 
+    const startSession = async (qrToken) => {
+        setScanResult(qrToken);
+        try {
+            const response = await axios.post(`${config.API_URL}/api/student/scan`, { qr_token: qrToken }, {
+                headers: { Authorization: `Bearer ${localStorage.getItem('token')}` }
+            });
+            attendanceToken.current = response.data.attendance_token;
+            setStatus('Sampling');
+        } catch (err) {
+            setMessage(`Error: ${err.response?.data?.error || err.message}`);
+            setStatus('Done');
+        }
+    };
+
+    const streamSample = (sample, seq) => {
+        const token = localStorage.getItem('token');
+        const upload = axios.post(`${config.API_URL}/api/student/attendance-sample`, {
+            attendance_token: attendanceToken.current,
+            seq: seq,
+            sample: sample
+        }, {
+            headers: { Authorization: `Bearer ${token}` }
+        }).catch(err => {
+            console.error('Sample upload failed, will submit all samples at the end:', err);
+            streamFailed.current = true;
+        });
+        pendingUploads.current.push(upload);
+    };
+
     // Helper to convert base64url to Uint8Array
     const base64UrlToUint8Array = (base64Url) => {
         const padding = '='.repeat((4 - base64Url.length % 4) % 4);
@@ -110,9 +145,8 @@ const ScanQR = () => {
             );
 
             scanner.render((decodedText) => {
-                setScanResult(decodedText);
-                setStatus('Sampling');
                 scanner.clear();
+                startSession(decodedText);
             }, (error) => {
                 // console.warn(error);
             });
@@ -141,6 +175,11 @@ const ScanQR = () => {
                                     timestamp: new Date().toISOString()
                                 };
 
+                                if (sampleSeq.current < maxSamples) {
+                                    streamSample(newSample, sampleSeq.current);
+                                    sampleSeq.current += 1;
+                                }
+
                                 setSamples(prev => {
                                     const updated = [...prev, newSample];
                                     if (updated.length >= maxSamples) {
@@ -184,10 +223,14 @@ const ScanQR = () => {
 
             return () => clearInterval(interval);
         }
-    }, [status]);
+    }, [status, scanResult]);
 
     const handleRetry = () => {
         setSamples([]);
+        streamFailed.current = false;
+        sampleSeq.current = 0;
+        pendingUploads.current = [];
+        attendanceToken.current = null;
         setMessage('');
         setStatus('Scanning');
     };
@@ -213,6 +256,20 @@ const ScanQR = () => {
         );
     };
 
+    // 503 with retry_after: the server had not committed the row in time. Ask again;
+    // if the row made it in the meantime the retry gets its stored status back.
+    const retryWhileSaving = async (request, attempts = 3) => {
+        for (let attempt = 1; ; attempt++) {
+            try {
+                return await request();
+            } catch (err) {
+                const retryAfter = err.response?.status === 503 && err.response.data?.retry_after;
+                if (!retryAfter || attempt >= attempts) throw err;
+                await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+            }
+        }
+    };
+
     useEffect(() => {
         if (status === 'Submitting') {
             const submitAttendance = async () => {
@@ -223,13 +280,45 @@ const ScanQR = () => {
                         setStatus('Done');
                         return;
                     }
-                    console.log('Submitting attendance with token:', token);
-                    const response = await axios.post(`${config.API_URL}/api/student/submit-attendance`, {
-                        qr_token: scanResult,
-                        samples: samples
-                    }, {
-                        headers: { Authorization: `Bearer ${token}` }
-                    });
+                    // The last samples may still be uploading
+                    await Promise.allSettled(pendingUploads.current);
+                    pendingUploads.current = [];
+
+                    let response;
+                    if (!streamFailed.current) {
+                        try {
+                            // Server already scored every sample, this only reads the tally
+                            response = await retryWhileSaving(() => axios.post(`${config.API_URL}/api/student/finalize-attendance`, {
+                                attendance_token: attendanceToken.current,
+                                sample_count: sampleSeq.current
+                            }, {
+                                headers: { Authorization: `Bearer ${token}` }
+                            }));
+                        } catch (err) {
+                            // 409: the server does not hold every streamed sample, send them all below
+                            if (err.response?.status !== 409) throw err;
+                        }
+                    }
+                    if (!response) {
+                        // Async mode: the server queues the check and answers 202 with a ticket
+                        response = await retryWhileSaving(async () => {
+                            let reply = await axios.post(`${config.API_URL}/api/student/submit-attendance`, {
+                                attendance_token: attendanceToken.current,
+                                samples: samples,
+                                async: true
+                            }, {
+                                headers: { Authorization: `Bearer ${token}` }
+                            });
+                            while (reply.status === 202 && reply.data.ticket_id) {
+                                // Short polls: the server answers at once and says when to ask again
+                                await new Promise(resolve => setTimeout(resolve, (reply.data.poll_after || 1) * 1000));
+                                reply = await axios.get(`${config.API_URL}/api/student/submission/${reply.data.ticket_id}`, {
+                                    headers: { Authorization: `Bearer ${token}` }
+                                });
+                            }
+                            return reply;
+                        });
+                    }
 
                     console.log('Submission Response:', response.data);
                     const count = response.data.inside_count !== undefined ? response.data.inside_count : 'N/A';
@@ -286,8 +375,7 @@ const ScanQR = () => {
                                 placeholder="Paste QR Token here"
                                 onChange={(e) => {
                                     if (e.target.value.length > 10) {
-                                        setScanResult(e.target.value);
-                                        setStatus('Sampling');
+                                        startSession(e.target.value);
                                     }
                                 }}
                             />
@@ -6,6 +6,8 @@ const ViewHistory = () => {
     const [history, setHistory] = useState([]);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const navigate = useNavigate();
 
     useEffect(() => {
@@ -24,6 +26,7 @@ const ViewHistory = () => {
                 });
 
                 setHistory(response.data.history);
+                setNextCursor(response.data.next_cursor);
                 setLoading(false);
             } catch (err) {
                 setError(err.response?.data?.error || 'Failed to fetch history');
@@ -34,6 +37,23 @@ const ViewHistory = () => {
         fetchHistory();
     }, [navigate]);
 
+    const loadMore = async () => {
+        try {
+            setLoadingMore(true);
+            const token = localStorage.getItem('token');
+            const response = await axios.get('http://localhost:5001/api/student/history', {
+                headers: { Authorization: `Bearer ${token}` },
+                params: { cursor: nextCursor }
+            });
+            setHistory(prev => [...prev, ...response.data.history]);
+            setNextCursor(response.data.next_cursor);
+        } catch (err) {
+            setError(err.response?.data?.error || 'Failed to fetch history');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const getStatusColor = (status) => {
         switch (status) {
             case 'Present': return 'status-present';
@@ -135,6 +155,13 @@ const ViewHistory = () => {
                             </div>
                         </div>
                     ))}
+                    {nextCursor && (
+                        <div style={{ textAlign: 'center' }}>
+                            <button className="btn-neon" onClick={loadMore} disabled={loadingMore} style={{ padding: '10px 24px' }}>
+                                {loadingMore ? 'Loading...' : 'Load older records'}
+                            </button>
+                        </div>
+                    )}
                 </div>
             )}
 
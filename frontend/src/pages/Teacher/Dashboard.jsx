@@ -6,6 +6,7 @@ import config from '../../config';
 const TeacherDashboard = () => {
     const [recentSessions, setRecentSessions] = React.useState([]);
     const [loading, setLoading] = React.useState(true);
+    const [nextCursor, setNextCursor] = React.useState(null);
     const [deleteModalOpen, setDeleteModalOpen] = React.useState(false);
     const [sessionToDelete, setSessionToDelete] = React.useState(null);
     const [currentTime, setCurrentTime] = React.useState(new Date());
@@ -25,6 +26,7 @@ const TeacherDashboard = () => {
                     }
                 });
                 setRecentSessions(response.data);
+                setNextCursor(response.headers['x-next-cursor'] || null);
             } catch (error) {
                 console.error('Error fetching recent sessions:', error);
             } finally {
@@ -35,6 +37,22 @@ const TeacherDashboard = () => {
         fetchRecentSessions();
     }, []);
 
+    const loadOlderSessions = async () => {
+        try {
+            const token = localStorage.getItem('token');
+            const response = await axios.get(`${config.API_URL}/api/teacher/recent-sessions`, {
+                headers: {
+                    'Authorization': `Bearer ${token}`
+                },
+                params: { cursor: nextCursor }
+            });
+            setRecentSessions(prevSessions => [...prevSessions, ...response.data]);
+            setNextCursor(response.headers['x-next-cursor'] || null);
+        } catch (error) {
+            console.error('Error fetching older sessions:', error);
+        }
+    };
+
     const handleDeleteSession = (sessionId) => {
         setSessionToDelete(sessionId);
         setDeleteModalOpen(true);
@@ -101,7 +119,7 @@ const TeacherDashboard = () => {
             </div>
 
             <div className="glass-card">
-                <h3 style={{ color: 'var(--neon-purple)', marginBottom: '1.5rem' }}>📅 Recent 10 Sessions</h3>
+                <h3 style={{ color: 'var(--neon-purple)', marginBottom: '1.5rem' }}>📅 Recent Sessions</h3>
                 {loading ? (
                     <p style={{ color: 'var(--text-muted)' }}>Loading recent sessions...</p>
                 ) : recentSessions.length > 0 ? (
@@ -187,6 +205,11 @@ const TeacherDashboard = () => {
                                 )}
                             </div>
                         ))}
+                        {nextCursor && (
+                            <button className="btn-neon-secondary" onClick={loadOlderSessions} style={{ padding: '10px 24px', border: 'none', background: 'transparent', alignSelf: 'center' }}>
+                                Load older sessions
+                            </button>
+                        )}
                     </div>
                 ) : (
                     <p style={{ color: 'var(--text-muted)' }}>No recent sessions found.</p>
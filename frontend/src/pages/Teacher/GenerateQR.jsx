@@ -7,6 +7,7 @@ import { Link, useNavigate } from 'react-router-dom';
 const GenerateQR = () => {
     const [qrToken, setQrToken] = useState('');
     const [sessionId, setSessionId] = useState('');
+    const [rotateSeconds, setRotateSeconds] = useState(0);
     const [polygon, setPolygon] = useState('[[18.77650087426464, 73.69443644062979], [18.757928884141037, 73.66731143492491], [18.74377631173372, 73.6876308776894], [18.762875716118945, 73.7193882307322]]');
 
     // New Form State
@@ -38,6 +39,26 @@ const GenerateQR = () => {
         }
     }, [navigate]);
 
+    // Rotating QR mode: fetch a fresh short token every few seconds so screenshots go stale quickly
+    useEffect(() => {
+        if (!sessionId || !rotateSeconds) return;
+        const token = localStorage.getItem('token');
+        const interval = setInterval(async () => {
+            try {
+                const response = await axios.get(`${config.API_URL}/api/teacher/session/${sessionId}/qr-token`, {
+                    headers: { Authorization: `Bearer ${token}` }
+                });
+                setQrToken(response.data.qr_token);
+            } catch (err) {
+                console.error('QR Refresh Error:', err);
+                if (err.response?.status === 400 || err.response?.status === 404) {
+                    clearInterval(interval); // Session expired or deleted, keep the last code on screen
+                }
+            }
+        }, rotateSeconds * 1000);
+        return () => clearInterval(interval);
+    }, [sessionId, rotateSeconds]);
+
     const handleGenerate = async () => {
         // Validation
         if (!formData.classroom_name || !formData.subject_name || !formData.date || !formData.start_time || !formData.end_time || !formData.year || !formData.course) {
@@ -55,6 +76,7 @@ const GenerateQR = () => {
             }
             const response = await axios.post(`${config.API_URL}/api/teacher/generate-qr`, {
                 polygon: JSON.parse(polygon),
+                qr_mode: 'rotating',
                 ...formData
             }, {
                 headers: { Authorization: `Bearer ${token}` }
@@ -62,6 +84,7 @@ const GenerateQR = () => {
 
             setQrToken(response.data.qr_token);
             setSessionId(response.data.session_id);
+            setRotateSeconds(response.data.rotate_seconds || 0);
         } catch (err) {
             console.error('QR Generation Error:', err);
             console.error('Error response:', err.response);
@@ -171,7 +194,7 @@ const GenerateQR = () => {
                                 📊 View Live Attendance
                             </Link>
                             <button
-                                onClick={() => setQrToken('')}
+                                onClick={() => { setQrToken(''); setSessionId(''); setRotateSeconds(0); }}
                                 className="btn-neon-secondary"
                                 style={{ padding: '12px 24px', border: '1px solid var(--neon-pink)', background: 'transparent', color: 'var(--neon-pink)', cursor: 'pointer' }}
                             >
@@ -0,0 +1,142 @@
+import React, { useState, useEffect } from 'react';
+import axios from 'axios';
+import config from '../../config';
+import { useNavigate } from 'react-router-dom';
+
+const ManageRoster = () => {
+    const [roster, setRoster] = useState([]);
+    const [form, setForm] = useState({ course: '', year: '', branch: '', roll_numbers: '' });
+    const [message, setMessage] = useState('');
+    const [error, setError] = useState('');
+    const navigate = useNavigate();
+
+    const headers = () => ({ Authorization: `Bearer ${localStorage.getItem('token')}` });
+
+    const fetchRoster = async () => {
+        try {
+            const response = await axios.get(`${config.API_URL}/api/teacher/roster`, { headers: headers() });
+            setRoster(response.data.roster);
+        } catch (err) {
+            setError(err.response?.data?.error || 'Failed to load roster');
+        }
+    };
+
+    useEffect(() => {
+        const user = JSON.parse(localStorage.getItem('user'));
+        if (!localStorage.getItem('token') || user?.role !== 'teacher') {
+            navigate('/teacher/login');
+            return;
+        }
+        fetchRoster();
+    }, [navigate]);
+
+    const handleAdd = async (e) => {
+        e.preventDefault();
+        setMessage('');
+        setError('');
+        try {
+            const response = await axios.post(`${config.API_URL}/api/teacher/roster`, {
+                course: form.course,
+                year: form.year,
+                branch: form.branch || undefined,
+                // One roll number per line, or comma separated
+                roll_numbers: form.roll_numbers.split(/[\s,]+/).filter(Boolean)
+            }, { headers: headers() });
+            const { added, unknown_roll_numbers: unknown } = response.data;
+            setMessage(`Added ${added} student(s).` + (unknown.length ? ` Unknown roll numbers: ${unknown.join(', ')}` : ''));
+            setForm({ ...form, roll_numbers: '' });
+            fetchRoster();
+        } catch (err) {
+            setError(err.response?.data?.error || 'Failed to update roster');
+        }
+    };
+
+    const handleRemove = async (entry) => {
+        try {
+            await axios.delete(`${config.API_URL}/api/teacher/roster`, {
+                headers: headers(),
+                data: { course: entry.course, year: entry.year, roll_numbers: [entry.roll_number] }
+            });
+            setRoster(prev => prev.filter(item => !(item.course === entry.course && item.year === entry.year && item.student_id === entry.student_id)));
+        } catch (err) {
+            setError(err.response?.data?.error || 'Failed to update roster');
+        }
+    };
+
+    // Group by course / year for display
+    const groups = roster.reduce((acc, entry) => {
+        const key = `${entry.course} / ${entry.year}`;
+        (acc[key] = acc[key] || []).push(entry);
+        return acc;
+    }, {});
+
+    return (
+        <div style={{ padding: '2rem', maxWidth: '1200px', margin: '0 auto' }}>
+            <h2 className="text-neon" style={{ marginBottom: '2rem', fontSize: '2.5rem', textAlign: 'center' }}>
+                👥 Course Roster
+            </h2>
+
+            <div className="glass-card" style={{ marginBottom: '2rem' }}>
+                <h3 style={{ color: 'var(--neon-cyan)', marginBottom: '1rem' }}>Add Students</h3>
+                <p style={{ color: 'var(--text-muted)' }}>
+                    Course and year must match the ones you enter when generating a session QR code.
+                </p>
+                <form onSubmit={handleAdd} style={{ display: 'grid', gap: '1rem' }}>
+                    <div style={{ display: 'grid', gridTemplateColumns: 'repeat(3, 1fr)', gap: '1rem' }}>
+                        <input className="form-control" placeholder="Course (e.g. B.Tech)" value={form.course}
+                            onChange={(e) => setForm({ ...form, course: e.target.value })} required />
+                        <input className="form-control" placeholder="Year (e.g. 2024)" value={form.year}
+                            onChange={(e) => setForm({ ...form, year: e.target.value })} required />
+                        <input className="form-control" placeholder="Branch (optional)" value={form.branch}
+                            onChange={(e) => setForm({ ...form, branch: e.target.value })} />
+                    </div>
+                    <textarea className="form-control" rows="5" placeholder="Roll numbers, one per line or comma separated"
+                        value={form.roll_numbers} onChange={(e) => setForm({ ...form, roll_numbers: e.target.value })} required />
+                    <button type="submit" className="btn-neon" style={{ padding: '12px 24px', justifySelf: 'start' }}>
+                        ➕ Add to Roster
+                    </button>
+                </form>
+                {message && <p style={{ color: '#22c55e', marginTop: '1rem' }}>{message}</p>}
+                {error && <p style={{ color: '#ff4d4d', marginTop: '1rem' }}>❌ {error}</p>}
+            </div>
+
+            {Object.keys(groups).length === 0 ? (
+                <div className="glass-card" style={{ textAlign: 'center', padding: '2rem' }}>
+                    <p style={{ color: 'var(--text-muted)' }}>No roster yet. Add students above to see absentees for your sessions.</p>
+                </div>
+            ) : (
+                Object.entries(groups).map(([key, entries]) => (
+                    <div key={key} className="glass-card" style={{ marginBottom: '1.5rem' }}>
+                        <h3 style={{ color: 'var(--neon-purple)', marginBottom: '1rem' }}>{key} ({entries.length} students)</h3>
+                        <table className="table table-striped">
+                            <thead>
+                                <tr>
+                                    <th>Roll Number</th>
+                                    <th>Name</th>
+                                    <th>Branch</th>
+                                    <th></th>
+                                </tr>
+                            </thead>
+                            <tbody>
+                                {entries.map((entry) => (
+                                    <tr key={entry.student_id}>
+                                        <td>{entry.roll_number}</td>
+                                        <td>{entry.name}</td>
+                                        <td>{entry.branch || '-'}</td>
+                                        <td>
+                                            <button className="btn btn-sm btn-outline-danger" onClick={() => handleRemove(entry)}>
+                                                Remove
+                                            </button>
+                                        </td>
+                                    </tr>
+                                ))}
+                            </tbody>
+                        </table>
+                    </div>
+                ))
+            )}
+        </div>
+    );
+};
+
+export default ManageRoster;
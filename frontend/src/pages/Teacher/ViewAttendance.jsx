@@ -20,6 +20,10 @@ const ViewAttendance = () => {
     });
     const [manualLoading, setManualLoading] = useState(false);
 
+    // Roster students not marked in this session (fetched on demand)
+    const [absentees, setAbsentees] = useState(null);
+    const [absenteesError, setAbsenteesError] = useState(null);
+
     // Helper to safely get stats (handles "Invalid Attempt" key)
     const getStat = (stats, key) => {
         if (!stats) return 0;
@@ -44,6 +48,26 @@ const ViewAttendance = () => {
         }
     }, [navigate]);
 
+    // Pushed events are applied to the last snapshot; rows already in it are skipped
+    const applyAttendance = (event) => setData(prev => {
+        if (!prev || prev.students.some(s => s.roll_number === event.roll_number)) return prev;
+        const { type, ...student } = event;
+        const stats = { ...prev.stats, [student.status]: (prev.stats[student.status] || 0) + 1 };
+        if (student.status === 'Invalid Attempt') stats.Invalid = (prev.stats.Invalid || 0) + 1;
+        return { ...prev, students: [...prev.students, student], stats };
+    });
+
+    const applyManual = (event) => setData(prev => {
+        const manual = prev?.manual_students || [];
+        if (!prev || manual.some(m => m.roll_number === event.roll_number && m.timestamp === event.timestamp)) return prev;
+        const { type, session_id, ...entry } = event;
+        return {
+            ...prev,
+            manual_students: [...manual, entry],
+            stats: { ...prev.stats, Present: (prev.stats.Present || 0) + 1 }
+        };
+    });
+
     useEffect(() => {
         const fetchData = async () => {
             try {
@@ -69,9 +93,64 @@ const ViewAttendance = () => {
             }
         };
 
-        fetchData();
-        const interval = setInterval(fetchData, 5000);
-        return () => clearInterval(interval);
+        let interval = null;
+        let source = null;
+        const startPolling = () => {
+            if (interval) return;
+            fetchData();
+            interval = setInterval(fetchData, 5000);
+        };
+
+        let cancelled = false;
+        const openStream = async () => {
+            // The login token stays out of the URL: the stream gets its own short-lived token
+            let streamToken;
+            try {
+                const response = await axios.post(
+                    `${config.API_URL}/api/teacher/attendance/${sessionId}/stream-token`, {},
+                    { headers: { Authorization: `Bearer ${localStorage.getItem('token')}` } }
+                );
+                streamToken = response.data.token;
+            } catch (err) {
+                startPolling();
+                return;
+            }
+            if (cancelled) return;
+
+            // Live push: snapshot on every (re)connect, then one message per committed change
+            let opened = false;
+            source = new EventSource(`${config.API_URL}/api/teacher/attendance/${sessionId}/stream?token=${encodeURIComponent(streamToken)}`);
+            source.onopen = () => {
+                opened = true;
+                fetchData();
+            };
+            source.addEventListener('attendance', (e) => applyAttendance(JSON.parse(e.data)));
+            source.addEventListener('manual', (e) => applyManual(JSON.parse(e.data)));
+            source.addEventListener('reset', () => fetchData());
+            source.addEventListener('deleted', () => {
+                source.close();
+                fetchData();
+            });
+            source.onerror = () => {
+                if (source.readyState !== EventSource.CLOSED) return;
+                // A stream that ran and ended (its token expired) gets a fresh token; one that never
+                // opened (server busy, no SSE support on the way) falls back to polling
+                if (opened && !cancelled) openStream();
+                else startPolling();
+            };
+        };
+
+        if (localStorage.getItem('token') && window.EventSource) {
+            openStream();
+        } else {
+            startPolling();
+        }
+
+        return () => {
+            cancelled = true;
+            if (source) source.close();
+            if (interval) clearInterval(interval);
+        };
     }, [sessionId, navigate]);
 
     const handleManualSubmit = async (e) => {
@@ -91,8 +170,7 @@ const ViewAttendance = () => {
             setShowManualModal(false);
             alert('Manual attendance added successfully!');
 
-            // Refresh data immediately
-            // We can just wait for the next interval or trigger a fetch, but alert is blocking anyway
+            // The live stream (or the next poll) brings the new entry in
         } catch (err) {
             console.error('Manual attendance error:', err);
             alert(err.response?.data?.error || 'Failed to add manual attendance');
@@ -101,6 +179,32 @@ const ViewAttendance = () => {
         }
     };
 
+    const fetchAbsentees = async () => {
+        try {
+            const token = localStorage.getItem('token');
+            const response = await axios.get(`${config.API_URL}/api/teacher/absentees`, {
+                headers: { Authorization: `Bearer ${token}` },
+                params: { session_id: sessionId }
+            });
+            setAbsentees(response.data.sessions[0]);
+            setAbsenteesError(null);
+        } catch (err) {
+            setAbsenteesError(err.response?.data?.error || 'Failed to load absentees');
+        }
+    };
+
+    // Download links cannot send headers: each download gets a one-minute token of its own
+    const downloadExport = async (format) => {
+        try {
+            const response = await axios.post(`${config.API_URL}/api/teacher/export-token`, {}, {
+                headers: { Authorization: `Bearer ${localStorage.getItem('token')}` }
+            });
+            window.location.href = `${config.API_URL}/api/teacher/export?format=${format}&session_id=${encodeURIComponent(sessionId)}&token=${encodeURIComponent(response.data.token)}`;
+        } catch (err) {
+            alert(err.response?.data?.error || 'Failed to start the download');
+        }
+    };
+
     if (loading) return <div className="text-center mt-5">Loading...</div>;
     if (fetchError) {
         return (
@@ -118,13 +222,17 @@ const ViewAttendance = () => {
         <div className="container">
             <div className="d-flex justify-content-between align-items-center mb-4">
                 <h2 className="mb-0">Live Attendance Monitor</h2>
-                <button
-                    className="btn btn-primary"
-                    onClick={() => setShowManualModal(true)}
-                    style={{ background: 'var(--neon-cyan)', border: 'none' }}
-                >
-                    + Add Manual Attendance
-                </button>
+                <div className="d-flex gap-2">
+                    <button className="btn btn-outline-light" onClick={() => downloadExport('csv')}>⬇ CSV</button>
+                    <button className="btn btn-outline-light" onClick={() => downloadExport('xlsx')}>⬇ Excel</button>
+                    <button
+                        className="btn btn-primary"
+                        onClick={() => setShowManualModal(true)}
+                        style={{ background: 'var(--neon-cyan)', border: 'none' }}
+                    >
+                        + Add Manual Attendance
+                    </button>
+                </div>
             </div>
 
             <div className="row mb-4">
@@ -214,6 +322,46 @@ const ViewAttendance = () => {
                 </div>
             )}
 
+            <div className="card p-4 mt-4">
+                <div className="d-flex justify-content-between align-items-center mb-3">
+                    <h4 className="mb-0">Absentees</h4>
+                    <button className="btn btn-outline-light" onClick={fetchAbsentees}>
+                        {absentees ? 'Refresh' : 'Check against roster'}
+                    </button>
+                </div>
+                {absenteesError && <p className="text-danger">{absenteesError}</p>}
+                {absentees && absentees.roster_size === 0 && (
+                    <p className="text-muted">No roster for {absentees.course} / {absentees.year} yet. Add students under Roster.</p>
+                )}
+                {absentees && absentees.roster_size > 0 && (
+                    <>
+                        <p className="text-muted">{absentees.absent_count} of {absentees.roster_size} students on the {absentees.course} / {absentees.year} roster are absent.</p>
+                        {absentees.absentees.length > 0 && (
+                            <table className="table table-striped">
+                                <thead>
+                                    <tr>
+                                        <th>Roll Number</th>
+                                        <th>Name</th>
+                                        <th>Branch</th>
+                                        <th>Note</th>
+                                    </tr>
+                                </thead>
+                                <tbody>
+                                    {absentees.absentees.map((student) => (
+                                        <tr key={student.student_id}>
+                                            <td>{student.roll_number}</td>
+                                            <td>{student.name}</td>
+                                            <td>{student.branch || '-'}</td>
+                                            <td>{student.invalid_attempt ? 'Submitted from outside the classroom' : ''}</td>
+                                        </tr>
+                                    ))}
+                                </tbody>
+                            </table>
+                        )}
+                    </>
+                )}
+            </div>
+
             {/* Manual Attendance Modal */}
             {showManualModal && (
                 <div style={{
@@ -8,9 +8,87 @@ const ViewReports = () => {
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState('');
     const [recordsAnalyzed, setRecordsAnalyzed] = useState(0);
+    const [engine, setEngine] = useState('gemini');
+    const [streaming, setStreaming] = useState(false);
     const navigate = useNavigate();
 
-    const generateReport = async () => {
+    const showProgress = (partial) => {
+        setReport(partial);
+        setStreaming(true);
+        setLoading(false);
+    };
+
+    // Polls a background report job until it finishes; the sections Gemini has written
+    // so far come with every 202, so the report fills in while it is generated.
+    const pollJob = async (jobId, headers) => {
+        for (;;) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const response = await axios.get(`${config.API_URL}/api/teacher/report-jobs/${jobId}/result`, { headers });
+            if (response.status !== 202) return response.data;
+            const progress = response.data.progress;
+            if (progress && (progress.summary || progress.insights.length)) {
+                setRecordsAnalyzed(progress.records_analyzed);
+                showProgress(progress);
+            }
+        }
+    };
+
+    // Gemini report over the streaming endpoint: sections are shown as they are written.
+    // Falls back to polling the job when the server has no stream slot free or the stream
+    // outlives its limit. Resolves with the final result, or { error }.
+    const streamReport = async (headers) => {
+        const response = await fetch(`${config.API_URL}/api/teacher/generate-report/stream`, {
+            method: 'POST',
+            headers: { ...headers, 'Content-Type': 'application/json' },
+            body: JSON.stringify({ engine: 'gemini' })
+        });
+        if (response.status === 202) {
+            const job = await response.json();
+            return pollJob(job.job_id, headers);
+        }
+        if (!response.ok) {
+            const body = await response.json().catch(() => ({}));
+            return { error: body.error || 'Failed to generate report' };
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let partial = { summary: '', insights: [], recommendations: [] };
+        for (;;) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            for (const line of lines) {
+                if (!line) continue;
+                const event = JSON.parse(line);
+                if (event.type === 'start') {
+                    setRecordsAnalyzed(event.records_analyzed);
+                    continue;
+                }
+                if (event.type === 'done') return event.result;
+                if (event.type === 'error') return { error: event.result.error || 'Failed to generate report' };
+                if (event.type === 'pending') {
+                    reader.cancel();
+                    return pollJob(event.job_id, headers);
+                }
+
+                if (event.type === 'summary') {
+                    partial = { ...partial, summary: partial.summary + event.text };
+                } else if (event.type === 'insight') {
+                    partial = { ...partial, insights: [...partial.insights, event.text] };
+                } else if (event.type === 'recommendation') {
+                    partial = { ...partial, recommendations: [...partial.recommendations, event.text] };
+                }
+                showProgress(partial);
+            }
+        }
+        return { error: 'Report stream ended unexpectedly' };
+    };
+
+    const generateReport = async (selectedEngine = engine) => {
         try {
             const token = localStorage.getItem('token');
             const user = JSON.parse(localStorage.getItem('user'));
@@ -20,19 +98,37 @@ const ViewReports = () => {
                 return;
             }
 
+            setEngine(selectedEngine);
             setLoading(true);
+            setStreaming(false);
             setError('');
             setReport(null);
 
-            const response = await axios.post(`${config.API_URL}/api/teacher/generate-report`, {}, {
-                headers: { Authorization: `Bearer ${token}` }
-            });
+            const headers = { Authorization: `Bearer ${token}` };
+            let response;
+            if (selectedEngine === 'local') {
+                // Local statistics answer in milliseconds: no job needed
+                response = await axios.post(`${config.API_URL}/api/teacher/generate-report`, { engine: 'local' }, { headers });
+            } else {
+                const result = await streamReport(headers);
+                if (result.error) {
+                    setError(result.error);
+                    setReport(null);
+                    setStreaming(false);
+                    setLoading(false);
+                    return;
+                }
+                response = { data: result };
+            }
 
             setReport(response.data.report);
             setRecordsAnalyzed(response.data.records_analyzed);
+            setStreaming(false);
             setLoading(false);
         } catch (err) {
             setError(err.response?.data?.error || 'Failed to generate report');
+            setReport(null);
+            setStreaming(false);
             setLoading(false);
         }
     };
@@ -51,13 +147,22 @@ const ViewReports = () => {
                     <p style={{ color: 'var(--text-muted)', marginBottom: '2rem', fontSize: '1.1rem' }}>
                         Let AI analyze your attendance data and provide insights, patterns, and recommendations.
                     </p>
-                    <button
-                        className="btn-neon"
-                        onClick={generateReport}
-                        style={{ padding: '15px 30px', fontSize: '1.1rem' }}
-                    >
-                        ✨ Generate Report with Gemini AI
-                    </button>
+                    <div style={{ display: 'flex', gap: '1rem', justifyContent: 'center', flexWrap: 'wrap' }}>
+                        <button
+                            className="btn-neon"
+                            onClick={() => generateReport('gemini')}
+                            style={{ padding: '15px 30px', fontSize: '1.1rem' }}
+                        >
+                            ✨ Generate Report with Gemini AI
+                        </button>
+                        <button
+                            className="btn-neon"
+                            onClick={() => generateReport('local')}
+                            style={{ padding: '15px 30px', fontSize: '1.1rem' }}
+                        >
+                            ⚡ Quick Local Analysis
+                        </button>
+                    </div>
                 </div>
             )}
 
@@ -81,7 +186,7 @@ const ViewReports = () => {
             {error && (
                 <div className="glass-card" style={{ textAlign: 'center', padding: '2rem' }}>
                     <p style={{ color: '#ff4d4d', marginBottom: '1.5rem', fontSize: '1.1rem' }}>❌ {error}</p>
-                    <button className="btn-neon" onClick={generateReport} style={{ padding: '12px 24px', marginRight: '1rem' }}>
+                    <button className="btn-neon" onClick={() => generateReport()} style={{ padding: '12px 24px', marginRight: '1rem' }}>
                         🔄 Try Again
                     </button>
                     <button className="btn-neon-secondary" onClick={() => navigate('/teacher/dashboard')} style={{ padding: '12px 24px', border: 'none', background: 'transparent' }}>
@@ -95,10 +200,10 @@ const ViewReports = () => {
                     {/* Header Stats */}
                     <div className="glass-card" style={{ textAlign: 'center', background: 'linear-gradient(135deg, rgba(0, 243, 255, 0.1), rgba(255, 0, 255, 0.1))' }}>
                         <h3 style={{ color: 'var(--neon-cyan)', marginBottom: '0.5rem' }}>
-                            ✅ Report Generated Successfully
+                            {streaming ? '✍️ Gemini is writing your report...' : '✅ Report Generated Successfully'}
                         </h3>
                         <p style={{ color: 'var(--text-muted)', fontSize: '0.9rem' }}>
-                            Analyzed {recordsAnalyzed} attendance records using Gemini AI
+                            Analyzed {recordsAnalyzed} attendance records using {engine === 'local' ? 'local statistics' : 'Gemini AI'}
                         </p>
                     </div>
 
@@ -184,14 +289,14 @@ const ViewReports = () => {
                     )}
 
                     {/* Actions */}
-                    <div style={{ textAlign: 'center', display: 'flex', gap: '1rem', justifyContent: 'center' }}>
-                        <button className="btn-neon" onClick={generateReport} style={{ padding: '12px 24px' }}>
+                    {!streaming && <div style={{ textAlign: 'center', display: 'flex', gap: '1rem', justifyContent: 'center' }}>
+                        <button className="btn-neon" onClick={() => generateReport()} style={{ padding: '12px 24px' }}>
                             🔄 Generate New Report
                         </button>
                         <button className="btn-neon-secondary" onClick={() => navigate('/teacher/dashboard')} style={{ padding: '12px 24px', border: 'none', background: 'transparent' }}>
                             ← Back to Dashboard
                         </button>
-                    </div>
+                    </div>}
                 </div>
             )}
         </div>